@@ -1,3 +1,8 @@
+import time
+
+# When importing the backend began, for the startup profile (see startup_profile.py).
+IMPORT_STARTED = time.perf_counter()
+
 from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
@@ -1,20 +1,26 @@
+import multiprocessing
 import os
-from flask import Flask, send_from_directory, current_app
-from . import pipeline_manager
-from .config import UPLOADS_DIR, BASE_DIR
+from flask import Flask, current_app, request
+from .config import BASE_DIR
 from .views import api
 
 from . import db
+from . import database, migrations
 from .models import User
-from .extensions import bcrypt, login_manager
+from .extensions import bcrypt, login_manager, blobs, docker_manager, scheduler, job_tracker, job_logs, artifacts, result_cache, pipeline_registry, dag_executor, container_pool, job_events, passwords, user_cache, static_assets, background
+from .passwords import MIN_ROUNDS, hash_password
+from .startup_profile import StartupProfile
 from flask_login import login_user
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.get(int(user_id), lambda user_id: db.session.get(User, user_id))
 
-def create_app():
-    """Create and configure an instance of the Flask application."""
+def create_app(test_config=None):
+    """
+    Create and configure an instance of the Flask application.
+    `test_config` overrides values from config.py before anything is initialised.
+    """
     app = Flask(__name__, static_folder=None)
 
     # --- Configuration ---
@@ -22,46 +28,94 @@ def create_app():
     app.config.from_pyfile('config.py')
     app.config['SECRET_KEY'] = 'a_super_secret_key' # CHANGE THIS!
     app.config['WTF_CSRF_ENABLED'] = False
+    if test_config:
+        app.config.update(test_config)
+    if multiprocessing.current_process().name != 'MainProcess':
+        # A pool worker, such as a password hasher, re-running a script that builds an app:
+        # it must not migrate, nor start a second set of background services.
+        app.config.update({'DB_AUTO_MIGRATE': False, 'WARM_START': False})
+    # STARTUP_PROFILE=1 reports the time each step below takes (see startup_profile.py).
+    profile = StartupProfile(app.config['STARTUP_PROFILE'])
+    app.extensions['startup_profile'] = profile
 
     # --- Initialize Extensions ---
-    db.init_app(app)
-    bcrypt.init_app(app)
-    login_manager.init_app(app)
+    with profile.step('initializing extensions'):
+        database.configure(app)
+        db.init_app(app)
+        database.init_app(app, db)
+        bcrypt.init_app(app)
+        login_manager.init_app(app)
+        blobs.init_app(app)
+        docker_manager.init_app(app)
+        scheduler.init_app(app)
+        job_tracker.init_app(app)
+        job_logs.init_app(app)
+        artifacts.init_app(app)
+        result_cache.init_app(app)
+        dag_executor.init_app(app)
+        container_pool.init_app(app)
+        job_events.init_app(app)
+        passwords.init_app(app)
+        user_cache.init_app(app)
+        static_assets.init_app(app)
+        background.init_app(app)
+        # Pipelines are discovered on first use, or when a server warms up below.
+        pipeline_registry.init_app(app)
 
     # --- Create Directories ---
-    # Ensure the uploads directory exists
-    uploads_path = os.path.join(BASE_DIR, UPLOADS_DIR)
-    if not os.path.exists(uploads_path):
-        os.makedirs(uploads_path)
-
-    # --- Discover Pipelines ---
-    print("--- Initializing Pipelines ---")
-    available_pipelines = pipeline_manager.discover_pipelines()
-    if not available_pipelines:
-        print("Warning: No pipelines found. Check the 'pipelines' directory.")
-    else:
-        print(f"Found {len(available_pipelines)} pipelines: {[p['name'] for p in available_pipelines]}")
-
-    # Store pipelines in the app config for access in blueprints
-    app.config['AVAILABLE_PIPELINES'] = available_pipelines
+    with profile.step('creating directories'):
+        # Ensure the uploads directory exists
+        uploads_path = os.path.join(BASE_DIR, app.config['UPLOADS_DIR'])
+        if not os.path.exists(uploads_path):
+            os.makedirs(uploads_path)
+        # Ensure the job logs directory exists
+        os.makedirs(job_logs.logs_dir, exist_ok=True)
 
     # --- Register Blueprints ---
-    app.register_blueprint(api, url_prefix='/api')
+    with profile.step('registering routes'):
+        app.register_blueprint(api, url_prefix='/api')
+
+    # --- Bring the Database Schema Up to Date ---
+    migrations.init_app(app)
+    if app.config['DB_AUTO_MIGRATE']:
+        with profile.step('migrating the database'):
+            # Workers of one server boot together; the first migrates, the rest find nothing to do.
+            with background.one_at_a_time(), app.app_context():
+                migrations.upgrade()
+
+    if app.config['WARM_START'] and not app.config.get('TESTING'):
+        # --- Warm Up ---
+        # Pipelines and the frontend load on first use; a server loads them now so no request waits.
+        with profile.step('discovering pipelines'):
+            pipeline_registry.load()
+        with profile.step('loading static assets'):
+            static_assets.load()
+
+        # --- Start Background Services ---
+        # Once per server, however many workers it has (see background.py).
+        with profile.step('starting background services'):
+            background.start()
 
-    # --- Create Database Tables ---
-    with app.app_context():
-        db.create_all()
+    # --- Static File Serving ---
+    # In a production environment, the frontend is served from the 'dashboard-ui' directory,
+    # from memory (see static_assets.py).
+    def is_public_asset(path):
+        # Files of the frontend are served to anyone, so looking up the user would be wasted.
+        return path in static_assets
 
     # If in testing mode, create a dummy user and log them in before each request
     if app.config.get('TESTING'):
         @app.before_request
         def create_test_user():
             from flask_login import current_user
+            if request.endpoint == 'serve_spa' and is_public_asset(request.view_args.get('path')):
+                return
             if not current_user.is_authenticated:
                 # Check if the user already exists
                 user = User.query.filter_by(username='testuser').first()
                 if not user:
-                    hashed_password = bcrypt.generate_password_hash('testpassword').decode('utf-8')
+                    # Nobody types this password, so the cheapest hash will do, right here.
+                    hashed_password = hash_password('testpassword', MIN_ROUNDS)
                     user = User(
                         username='testuser',
                         full_name='Test User',
@@ -73,29 +127,24 @@ def create_app():
                     db.session.commit()
                 login_user(user)
 
-    # --- Static File Serving ---
-    # In a production environment, the frontend is served from the 'dashboard-ui' directory.
-    ui_dir = os.path.join(BASE_DIR, 'dashboard-ui')
-
     @app.route('/', defaults={'path': ''})
     @app.route('/<path:path>')
     def serve_spa(path):
         from flask_login import current_user
+        if is_public_asset(path):
+            return static_assets.response(path)
+
         # If in testing mode, bypass authentication
         if current_app.config.get('TESTING'):
-            if path and os.path.exists(os.path.join(ui_dir, path)):
-                return send_from_directory(ui_dir, path)
-            return send_from_directory(ui_dir, 'index.html')
-
-        if path and os.path.exists(os.path.join(ui_dir, path)):
-            return send_from_directory(ui_dir, path)
+            return static_assets.response('index.html')
 
         if not current_user.is_authenticated:
-            return send_from_directory(ui_dir, 'login.html')
+            return static_assets.response('login.html')
 
         if path in ['login', 'register', 'data_submission', 'profile_creation', 'project_submission', 'directory', 'theme_test']:
-             return send_from_directory(ui_dir, f'{path}.html')
+             return static_assets.response(f'{path}.html')
 
-        return send_from_directory(ui_dir, 'index.html')
+        return static_assets.response('index.html')
 
+    profile.report()
     return app
@@ -0,0 +1,94 @@
+import mimetypes
+import os
+from concurrent.futures import ThreadPoolExecutor
+from . import db
+from .blob_store import ARTIFACTS_DIR, file_sha256
+from .config import BASE_DIR
+from .models import Artifact, Job
+from .pipeline_manager import get_pipeline
+from .signals import job_finished, job_outputs_ready
+from . import workspace
+
+
+class ArtifactStore:
+    """
+    Harvests the declared outputs of finished jobs.
+
+    When a job finishes, the files in its workspace that match the file
+    outputs of its pipeline are hashed and recorded as `Artifact` rows,
+    with their size, SHA-256 and MIME type. Hashing happens on a background
+    thread so large outputs don't hold up job status updates. Each artifact
+    is also ingested into the blob store, so identical outputs are stored
+    once, and kept as a link to its blob under
+    `UPLOADS_DIR/artifacts/<job_id>/`. The job's workspace is then removed.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['artifacts'] = self
+        job_finished.connect(self._on_job_finished, sender=app)
+
+    def _on_job_finished(self, app, job):
+        if job.cached_from:
+            # Its artifacts were copied from the cached job.
+            return
+        outputs = workspace.collect_outputs(job, get_pipeline(job.pipeline))
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='artifact-harvester')
+        self._executor.submit(self._harvest_in_context, job.id, outputs)
+
+    def _harvest_in_context(self, job_id, outputs):
+        try:
+            with self.app.app_context():
+                self.harvest(job_id, outputs)
+                workspace.remove_workspace(job_id)
+                job_outputs_ready.send(self.app, job_id=job_id)
+        except Exception as e:
+            print(f"Could not harvest artifacts for job {job_id}: {e}")
+
+    def harvest(self, job_id, outputs):
+        """
+        Records `outputs` (as returned by `workspace.collect_outputs`) as
+        artifacts of a job and marks its outputs as ready. Must be called
+        in an app context.
+        """
+        blobs = self.app.extensions['blobs']
+        existing = {a.filename for a in Artifact.query.filter_by(job_id=job_id)}
+        artifacts = []
+        for output in outputs:
+            if output['filename'] in existing:
+                continue
+            host_path = os.path.join(BASE_DIR, output['filepath'])
+            sha256 = file_sha256(host_path)
+            blobs.ingest(output['filepath'], sha256)
+            # Outlives the workspace; the name is kept for the steps that take it as input.
+            filepath = os.path.join(self.app.config['UPLOADS_DIR'], ARTIFACTS_DIR, job_id, output['filename'])
+            blobs.link(sha256, filepath)
+            artifacts.append(Artifact(
+                job_id=job_id,
+                name=output['name'],
+                filename=output['filename'],
+                filepath=filepath,
+                size=os.path.getsize(host_path),
+                sha256=sha256,
+                mime_type=mimetypes.guess_type(output['filename'])[0] or 'application/octet-stream'
+            ))
+        db.session.add_all(artifacts)
+        Job.query.filter_by(id=job_id).update({'outputs_ready': True}, synchronize_session=False)
+        db.session.commit()
+        return artifacts
+
+    def wait(self):
+        """Blocks until queued harvests are done."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def host_path(self, artifact):
+        return os.path.join(BASE_DIR, artifact.filepath)
@@ -0,0 +1,155 @@
+"""
+Starts and stops the background services, once per server however many
+worker processes it has.
+
+The job dispatchers, the job tracker, the log spooler and the container
+pool act on what every process shares: the database and the Docker
+daemon. A copy per worker would race to reconcile the same containers and
+keep a warm pool each. Under a pre-fork server (see gunicorn.conf.py),
+BACKGROUND_LOCK_FILE names a file that the workers compete to lock. The
+worker holding the lock runs these services. The others try again every
+BACKGROUND_ELECTION_INTERVAL seconds, so when the holder exits, another
+worker takes over. A job submitted to any worker is claimed from the
+database by the holder's dispatchers, within SCHEDULER_POLL_INTERVAL.
+Without a lock file, as under `python run.py`, the process runs the
+services itself; there, the reloader's watching process starts none (see
+run.py).
+
+The pipeline watcher and the job event poller only keep the memory of
+their own process up to date, so every worker runs them.
+
+Shutting down happens in two steps. `drain` runs when the worker is told
+to stop: the dispatchers stop claiming jobs and event streams end. The
+server then finishes the requests in progress, such as uploads. `stop`
+runs last and waits for job launches in progress, then gives up the lock.
+"""
+import fcntl
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class BackgroundServices:
+    """Runs the background services of one app. See the module docstring."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.leader = False
+        self._lock_file = None
+        self._thread = None
+        self._stopping = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['background'] = self
+
+    def one_at_a_time(self):
+        """
+        Returns a context manager that lets one process of the server in at
+        a time, e.g. to apply migrations while the others wait.
+        """
+        path = self.app.config['BACKGROUND_LOCK_FILE']
+        return _exclusive(f'{path}.startup') if path else nullcontext()
+
+    def start(self):
+        """Starts this process's services, and the shared ones if it is (or becomes) the leader."""
+        extensions = self.app.extensions
+        if self.app.config['PIPELINE_WATCH_AUTOSTART']:
+            extensions['pipelines'].start()
+        extensions['job_events'].start()
+
+        self._stopping.clear()
+        if not self.app.config['BACKGROUND_LOCK_FILE']:
+            self._lead()
+        elif not self._try_lock():
+            self._thread = threading.Thread(target=self._elect, name='background-election', daemon=True)
+            self._thread.start()
+
+    def _try_lock(self):
+        lock_file = open(self.app.config['BACKGROUND_LOCK_FILE'], 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        # Tells whoever looks at the file who is running the services.
+        lock_file.truncate(0)
+        lock_file.write(f'{os.getpid()}\n')
+        lock_file.flush()
+        self._lead()
+        return True
+
+    def _elect(self):
+        interval = self.app.config['BACKGROUND_ELECTION_INTERVAL']
+        while not self._stopping.wait(interval):
+            try:
+                if self._try_lock():
+                    return
+            except Exception as e:
+                print(f"Error taking over the background services: {e}")
+
+    def _lead(self):
+        self.leader = True
+        print(f"Running the background services in process {os.getpid()}.")
+        config = self.app.config
+        extensions = self.app.extensions
+        if config['SCHEDULER_AUTOSTART']:
+            if config['CONTAINER_POOL_ENABLED']:
+                extensions['container_pool'].start()
+            extensions['scheduler'].start()
+        if config['JOB_TRACKER_AUTOSTART']:
+            extensions['job_tracker'].start()
+            extensions['job_logs'].start()
+            # Pick up multi-step jobs whose steps finished while we were down.
+            with self.app.app_context():
+                extensions['dag'].resume()
+
+    def drain(self):
+        """
+        Stops taking on new work without waiting for anything, so it is
+        safe to call from a signal handler.
+        """
+        self._stopping.set()
+        extensions = self.app.extensions
+        extensions['scheduler'].drain()
+        extensions['job_events'].close_streams()
+
+    def stop(self, timeout=None):
+        """Stops every service, waiting up to `timeout` seconds for all of them, and gives up the lock."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining():
+            return None if deadline is None else max(deadline - time.monotonic(), 0)
+
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(remaining())
+            self._thread = None
+        extensions = self.app.extensions
+        if self.leader:
+            # The dispatchers first, so no launch is cut short by the others stopping.
+            extensions['scheduler'].stop(remaining())
+            extensions['container_pool'].stop(remaining())
+            extensions['job_tracker'].stop(remaining())
+            extensions['job_logs'].stop(remaining())
+            self.leader = False
+        extensions['pipelines'].stop(remaining())
+        extensions['job_events'].stop(remaining())
+        if self._lock_file is not None:
+            # Closing the file releases the lock for the next leader.
+            self._lock_file.close()
+            self._lock_file = None
+
+
+@contextmanager
+def _exclusive(path):
+    with open(path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,211 @@
+import errno
+import hashlib
+import os
+import shutil
+import click
+from datetime import datetime, timedelta
+from flask import current_app
+from . import db
+from .config import BASE_DIR
+from .models import Artifact, Blob, DataSubmission, JobInput
+
+CHUNK_SIZE = 1024 * 1024
+# Where harvested job outputs are kept, under UPLOADS_DIR.
+ARTIFACTS_DIR = 'artifacts'
+
+
+def file_sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(CHUNK_SIZE), b''):
+            hasher.update(data)
+    return hasher.hexdigest()
+
+
+def _sha256s(file_infos):
+    return [info['sha256'] for info in file_infos if info.get('sha256')]
+
+
+class BlobStore:
+    """
+    Content-addressed storage for uploaded files.
+
+    Every uploaded file is stored once, under `UPLOADS_DIR/blobs/<aa>/<sha256>`.
+    The per-upload paths recorded in `Job.files` and
+    `DataSubmission.uploaded_files` (`uploads/<uuid>_<filename>`) are
+    hardlinks to the blob, so the original filenames survive while
+    identical bytes take up disk space only once. Job artifacts are
+    hardlinks too, under `UPLOADS_DIR/artifacts/<job_id>/<filename>`.
+
+    `Blob.ref_count` counts the file entries in jobs and submissions that
+    point at a blob; `add_refs` and `release` keep it current as they come
+    and go. `collect_garbage()` recounts from the database, counting job
+    artifacts as well, and removes blobs, and their hardlinks, that nothing
+    refers to.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.root = None
+        self.uploads_path = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.uploads_path = os.path.join(BASE_DIR, app.config['UPLOADS_DIR'])
+        self.root = os.path.join(self.uploads_path, 'blobs')
+        app.extensions['blobs'] = self
+        app.cli.add_command(gc_blobs_command)
+
+    def blob_path(self, sha256):
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def save(self, file_storage, filepath):
+        """
+        Saves an uploaded werkzeug FileStorage to `filepath` (relative to
+        BASE_DIR), hashing it on the way, and ingests it. Returns the hash.
+        """
+        hasher = hashlib.sha256()
+        host_path = os.path.join(BASE_DIR, filepath)
+        with open(host_path, 'wb') as f:
+            for data in iter(lambda: file_storage.stream.read(CHUNK_SIZE), b''):
+                hasher.update(data)
+                f.write(data)
+        sha256 = hasher.hexdigest()
+        self.ingest(filepath, sha256)
+        return sha256
+
+    def ingest(self, filepath, sha256=None):
+        """
+        Moves the file at `filepath` (relative to BASE_DIR) into the store.
+        If a blob with the same content exists, the file is replaced by a
+        hardlink to it; otherwise the file becomes the new blob. A file on
+        another filesystem than UPLOADS_DIR, e.g. a job's outputs on a
+        workspace volume, can't be hardlinked, so the blob is a copy of it.
+        The caller commits. Returns the hash.
+        """
+        host_path = os.path.join(BASE_DIR, filepath)
+        if sha256 is None:
+            sha256 = file_sha256(host_path)
+        blob_path = self.blob_path(sha256)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+
+        try:
+            os.link(host_path, blob_path)
+        except FileExistsError:
+            if not os.path.samefile(host_path, blob_path):
+                tmp_path = f"{host_path}.{os.getpid()}.tmp"
+                try:
+                    os.link(blob_path, tmp_path)
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        raise
+                    # Across filesystems the file stays a copy of the blob.
+                else:
+                    os.replace(tmp_path, host_path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # Copied next to the blob first, so the blob never appears half-written.
+            tmp_path = f"{blob_path}.{os.getpid()}.tmp"
+            shutil.copyfile(host_path, tmp_path)
+            os.replace(tmp_path, blob_path)
+
+        if db.session.get(Blob, sha256) is None:
+            db.session.add(Blob(sha256=sha256, size=os.path.getsize(blob_path), ref_count=0))
+            db.session.flush()
+        return sha256
+
+    def link(self, sha256, filepath):
+        """
+        Makes `filepath` (relative to BASE_DIR, under UPLOADS_DIR) a
+        hardlink to a stored blob, replacing any file already there.
+        """
+        host_path = os.path.join(BASE_DIR, filepath)
+        os.makedirs(os.path.dirname(host_path), exist_ok=True)
+        tmp_path = f"{host_path}.{os.getpid()}.tmp"
+        os.link(self.blob_path(sha256), tmp_path)
+        os.replace(tmp_path, host_path)
+
+    def add_refs(self, file_infos):
+        """Counts new references to the blobs behind some file entries. The caller commits."""
+        self._adjust_refs(_sha256s(file_infos), 1)
+
+    def release(self, file_infos):
+        """Drops references added with `add_refs`. The caller commits."""
+        self._adjust_refs(_sha256s(file_infos), -1)
+
+    def _adjust_refs(self, sha256s, delta):
+        counts = {}
+        for sha256 in sha256s:
+            counts[sha256] = counts.get(sha256, 0) + delta
+        for sha256, change in counts.items():
+            Blob.query.filter_by(sha256=sha256).update(
+                {'ref_count': Blob.ref_count + change}, synchronize_session=False
+            )
+
+    def collect_garbage(self, grace_period=None):
+        """
+        Recounts references from jobs and submissions, then deletes blobs
+        nobody refers to, with their hardlinks under UPLOADS_DIR. Blobs
+        younger than the grace period are kept so uploads that are not yet
+        attached to anything survive. Returns the number of blobs removed.
+        """
+        if grace_period is None:
+            grace_period = self.app.config['BLOB_GC_GRACE_PERIOD']
+
+        counts = {}
+        for (sha256,) in db.session.query(JobInput.sha256).filter(JobInput.sha256.isnot(None)):
+            counts[sha256] = counts.get(sha256, 0) + 1
+        for (files,) in db.session.query(DataSubmission.uploaded_files):
+            for sha256 in _sha256s(DataSubmission.parse_files(files)):
+                counts[sha256] = counts.get(sha256, 0) + 1
+        for (sha256,) in db.session.query(Artifact.sha256):
+            counts[sha256] = counts.get(sha256, 0) + 1
+
+        cutoff = datetime.utcnow() - timedelta(seconds=grace_period)
+        garbage = []
+        for blob in Blob.query.all():
+            blob.ref_count = counts.get(blob.sha256, 0)
+            if blob.ref_count == 0 and blob.created_at < cutoff:
+                garbage.append(blob)
+
+        if garbage:
+            # Hardlinks share the blob's inode; find them with one scan.
+            inodes = {}
+            for blob in garbage:
+                try:
+                    inodes[os.stat(self.blob_path(blob.sha256)).st_ino] = blob
+                except FileNotFoundError:
+                    pass
+            for path in self._links():
+                if os.stat(path, follow_symlinks=False).st_ino in inodes:
+                    os.remove(path)
+            for blob in garbage:
+                try:
+                    os.remove(self.blob_path(blob.sha256))
+                except FileNotFoundError:
+                    pass
+                db.session.delete(blob)
+        db.session.commit()
+        return len(garbage)
+
+    def _links(self):
+        # Uploads sit at the top of UPLOADS_DIR, artifacts under artifacts/<job_id>/.
+        with os.scandir(self.uploads_path) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    yield entry.path
+        for dirpath, _, filenames in os.walk(os.path.join(self.uploads_path, ARTIFACTS_DIR)):
+            for filename in filenames:
+                yield os.path.join(dirpath, filename)
+
+
+@click.command('gc-blobs')
+@click.option('--grace-period', type=int, default=None,
+              help='Keep unreferenced blobs younger than this many seconds.')
+def gc_blobs_command(grace_period):
+    """Remove uploaded files that no job or submission refers to."""
+    removed = current_app.extensions['blobs'].collect_garbage(grace_period)
+    click.echo(f"Removed {removed} unreferenced blob(s).")
@@ -3,9 +3,152 @@ import os
 # Directory for storing uploaded files
 UPLOADS_DIR = 'uploads'
 
+# Directory scanned for pipelines (each a subdirectory with a manifest.json)
+PIPELINES_DIR = 'pipelines'
+# Seconds between checks of the pipelines directory for changes
+PIPELINE_WATCH_INTERVAL = float(os.environ.get('PIPELINE_WATCH_INTERVAL', 2.0))
+# Watch the pipelines directory and reload manifests without a restart
+PIPELINE_WATCH_AUTOSTART = os.environ.get('PIPELINE_WATCH_AUTOSTART', '1') == '1'
+
+# Seconds an uploaded file that nothing refers to is kept before
+# `flask gc-blobs` removes it
+BLOB_GC_GRACE_PERIOD = 24 * 60 * 60
+
+# Directory for per-job workspaces (input links and outputs)
+WORKSPACES_DIR = 'workspaces'
+
+# Directory for spooled logs of finished jobs
+LOGS_DIR = 'job_logs'
+
+# Uncompressed bytes per gzip member in a spooled log; smaller members make
+# reads from an offset cheaper at a small cost in compression ratio.
+LOGS_SPOOL_MEMBER_SIZE = 1024 * 1024
+
 # Absolute path to the project root
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 
-# Database configuration
-SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(BASE_DIR, 'database.db')
+# Print the time each step of building the app takes (see startup_profile.py)
+STARTUP_PROFILE = os.environ.get('STARTUP_PROFILE', '0') == '1'
+# Load the pipelines and the frontend and start the background services when
+# the app is created; off for one-off scripts that serve no requests
+WARM_START = os.environ.get('WARM_START', '1') == '1'
+
+# Database configuration; see database.py
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(BASE_DIR, 'database.db'))
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+# Apply pending schema migrations at startup; turn off to run `flask db upgrade` separately
+DB_AUTO_MIGRATE = os.environ.get('DB_AUTO_MIGRATE', '1') == '1'
+# Connections kept open to a server database, per process
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+# Extra connections opened when the pool is exhausted, closed when returned
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+# Seconds to wait for a connection before giving up
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+# Seconds after which a connection is replaced, before the server or a proxy drops it
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+# Milliseconds a SQLite writer waits for another to finish before failing
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
+# SQLite journal mode; WAL lets reads go on while a write is in progress
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+# Page cache per SQLite connection
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+
+# Passwords (see passwords.py)
+# bcrypt cost of new hashes; existing ones are upgraded at the next login
+BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+# Processes hashing passwords; 0 hashes on the request thread
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+# Hashes queued or running at once, and seconds a request waits for a slot before a 503
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 32))
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5.0))
+# Seconds the logged-in user is cached between requests, and how many users are (see user_cache.py)
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60))
+USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 1000))
+
+# Frontend files, served from memory (see static_assets.py); relative to BASE_DIR
+STATIC_ASSETS_DIR = os.environ.get('STATIC_ASSETS_DIR', 'dashboard-ui')
+# Files larger than this are served from disk instead of being held in memory
+STATIC_ASSETS_MAX_MEMORY_BYTES = int(os.environ.get('STATIC_ASSETS_MAX_MEMORY_BYTES', 5 * 1024 * 1024))
+# Files smaller than this aren't worth compressing
+STATIC_ASSETS_MIN_COMPRESS_BYTES = int(os.environ.get('STATIC_ASSETS_MIN_COMPRESS_BYTES', 512))
+
+# Background services (see background.py)
+# File the workers of a pre-fork server compete to lock; the holder runs the scheduler,
+# tracker and container pool. Empty runs them in every process, as under `python run.py`
+BACKGROUND_LOCK_FILE = os.environ.get('BACKGROUND_LOCK_FILE', '')
+# Seconds between attempts of the other workers to take over from the holder
+BACKGROUND_ELECTION_INTERVAL = float(os.environ.get('BACKGROUND_ELECTION_INTERVAL', 5.0))
+
+# Job scheduler configuration
+# Number of dispatcher threads that start queued jobs
+SCHEDULER_WORKERS = int(os.environ.get('SCHEDULER_WORKERS', 2))
+# Maximum number of containers running at once, across all pipelines
+SCHEDULER_MAX_RUNNING = int(os.environ.get('SCHEDULER_MAX_RUNNING', 4))
+# Default cap per pipeline; a manifest can override it with 'max_concurrent'
+SCHEDULER_PIPELINE_MAX_RUNNING = int(os.environ.get('SCHEDULER_PIPELINE_MAX_RUNNING', 2))
+# Queue ordering: 'fifo' or 'fair' (fair share per user)
+SCHEDULER_POLICY = os.environ.get('SCHEDULER_POLICY', 'fifo')
+# Seconds an idle dispatcher waits before re-checking the queue
+SCHEDULER_POLL_INTERVAL = float(os.environ.get('SCHEDULER_POLL_INTERVAL', 2.0))
+# Jobs per page of /api/jobs, by default and at most
+JOBS_PAGE_SIZE = int(os.environ.get('JOBS_PAGE_SIZE', 50))
+JOBS_PAGE_MAX_SIZE = int(os.environ.get('JOBS_PAGE_MAX_SIZE', 500))
+# Most jobs one /api/jobs/batch request may queue
+JOBS_BATCH_MAX_ITEMS = int(os.environ.get('JOBS_BATCH_MAX_ITEMS', 1000))
+# CPUs and memory (e.g. '16g') containers can be placed on; by default, what the host has
+HOST_CPUS = int(os.environ.get('HOST_CPUS', 0)) or None
+HOST_MEMORY = os.environ.get('HOST_MEMORY')
+# Cores (counted from 0) and memory kept free of containers for the web app
+SCHEDULER_RESERVED_CPUS = int(os.environ.get('SCHEDULER_RESERVED_CPUS', 1))
+SCHEDULER_RESERVED_MEMORY = os.environ.get('SCHEDULER_RESERVED_MEMORY', '512m')
+# What a job requests when its manifest declares no resources
+JOB_DEFAULT_CPUS = float(os.environ.get('JOB_DEFAULT_CPUS', 1.0))
+JOB_DEFAULT_MEMORY = os.environ.get('JOB_DEFAULT_MEMORY', '512m')
+# Start the dispatchers when the app is created
+SCHEDULER_AUTOSTART = os.environ.get('SCHEDULER_AUTOSTART', '1') == '1'
+
+# Warm container pool for pipelines marked "poolable" (see container_pool.py)
+CONTAINER_POOL_ENABLED = os.environ.get('CONTAINER_POOL_ENABLED', '1') == '1'
+# Idle containers kept per poolable pipeline
+CONTAINER_POOL_SIZE = int(os.environ.get('CONTAINER_POOL_SIZE', 2))
+# Jobs a pooled container runs before it is replaced
+CONTAINER_POOL_MAX_JOBS = int(os.environ.get('CONTAINER_POOL_MAX_JOBS', 100))
+# Seconds a pooled container may sit idle before it is removed
+CONTAINER_POOL_IDLE_TTL = float(os.environ.get('CONTAINER_POOL_IDLE_TTL', 300))
+# Seconds a job may run in a pooled container before it is killed
+CONTAINER_POOL_JOB_TIMEOUT = int(os.environ.get('CONTAINER_POOL_JOB_TIMEOUT', 600))
+
+# Job tracker configuration
+# Maximum number of status updates written in one transaction
+JOB_TRACKER_BATCH_SIZE = int(os.environ.get('JOB_TRACKER_BATCH_SIZE', 50))
+# Seconds to wait for more updates before writing a partial batch
+JOB_TRACKER_FLUSH_INTERVAL = float(os.environ.get('JOB_TRACKER_FLUSH_INTERVAL', 0.5))
+# Seconds to wait before reconnecting to the Docker event stream
+JOB_TRACKER_RETRY_INTERVAL = float(os.environ.get('JOB_TRACKER_RETRY_INTERVAL', 5.0))
+# Start the tracker when the app is created
+JOB_TRACKER_AUTOSTART = os.environ.get('JOB_TRACKER_AUTOSTART', '1') == '1'
+
+# Job status push (see job_events.py)
+# Seconds between checks for changed jobs while anyone is listening
+JOB_EVENTS_POLL_INTERVAL = float(os.environ.get('JOB_EVENTS_POLL_INTERVAL', 0.5))
+# Seconds of changes re-read on every check, to catch transactions that
+# committed late; also how far back a reconnect is replayed before its last event
+JOB_EVENTS_OVERLAP = float(os.environ.get('JOB_EVENTS_OVERLAP', 5.0))
+# Events buffered per listener; a listener that falls further behind is reset
+JOB_EVENTS_QUEUE_SIZE = int(os.environ.get('JOB_EVENTS_QUEUE_SIZE', 1000))
+# Seconds between keepalive comments on an idle stream
+JOB_EVENTS_KEEPALIVE = float(os.environ.get('JOB_EVENTS_KEEPALIVE', 15.0))
+
+# Pipeline result cache configuration
+RESULT_CACHE_ENABLED = os.environ.get('RESULT_CACHE_ENABLED', '1') == '1'
+# Least recently used entries are evicted beyond this many
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 1000))
+
+# Docker client configuration
+# Maximum number of pooled connections to the Docker daemon
+DOCKER_POOL_SIZE = int(os.environ.get('DOCKER_POOL_SIZE', 10))
+# Seconds between pings of the shared client
+DOCKER_HEALTH_CHECK_INTERVAL = float(os.environ.get('DOCKER_HEALTH_CHECK_INTERVAL', 30.0))
+# Seconds an image lookup is cached for, in case an image event is missed
+DOCKER_IMAGE_CACHE_TTL = float(os.environ.get('DOCKER_IMAGE_CACHE_TTL', 300.0))
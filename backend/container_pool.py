@@ -0,0 +1,318 @@
+"""
+Warm containers for short pipelines.
+
+Starting a container costs far more than running a pipeline like
+word-counter. A manifest with `"poolable": true` opts into a pool of idle
+containers of its image, started with an idle command instead of the
+pipeline. A job handed to one of them goes through a small protocol over
+the Docker API:
+
+1. the container is moved onto the cores the scheduler placed the job on,
+   and its input files are streamed in as a tar archive to /uploads, next
+   to an empty /outputs, the same paths a container of its own would see;
+2. the image's entrypoint is exec'd with the input paths, and what it
+   prints becomes the job's log. It is killed after
+   CONTAINER_POOL_JOB_TIMEOUT seconds;
+3. /outputs is streamed back into the job's workspace, where the outputs
+   are harvested as usual;
+4. /uploads and /outputs are removed, ready for the next job.
+
+A container is retired after CONTAINER_POOL_MAX_JOBS jobs, once its image
+has been rebuilt, or after CONTAINER_POOL_IDLE_TTL idle seconds. Pipelines
+used within the TTL are kept topped up to CONTAINER_POOL_SIZE idle
+containers, so a pipeline nobody runs costs nothing. Idle containers hold
+the memory their pipeline requests on the scheduler's ledger, and the
+pool is only topped up while that memory is free. Pooled images need
+`tail`, `timeout` and `rm`, and since a container runs jobs of different
+users one after another, only pipelines that keep no state outside
+/outputs should be made poolable.
+"""
+import io
+import os
+import tarfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from . import db
+from .config import BASE_DIR
+from .job_tracker import finished_status
+from .models import Job
+from .resources import format_cpuset, host_cores, pipeline_resources
+from . import workspace
+
+# Label attached to pooled containers, holding the id of their pipeline.
+POOL_LABEL = 'pipeline-dashboard.pool'
+
+# What a pooled container runs while it waits for jobs.
+IDLE_COMMAND = ['tail', '-f', '/dev/null']
+
+# Exit code of `timeout` when it had to kill the command.
+TIMED_OUT = 124
+
+
+class WarmContainer:
+    def __init__(self, container, image_id, entrypoint, memory):
+        self.container = container
+        self.image_id = image_id
+        self.entrypoint = entrypoint or []
+        self.memory = memory  # What its pipeline requests
+        self.jobs = 0
+        self.idle_since = time.monotonic()
+
+
+class ContainerPool:
+    """Keeps idle containers of poolable pipelines and runs jobs in them. See the module docstring."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._idle = defaultdict(list)
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._thread = None
+        self._stopping = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['container_pool'] = self
+
+    def handles(self, pipeline):
+        return self.app.config['CONTAINER_POOL_ENABLED'] and pipeline.get('poolable') is True
+
+    def submit(self, job, pipeline):
+        """
+        Hands a claimed job to a warm container, starting one if none is
+        idle. Returns False if no container could be had. Must be called in
+        an app context.
+        """
+        warm = self._acquire(pipeline)
+        if warm is None:
+            return False
+        filepaths = [f['filepath'] for f in job.files]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.app.config['SCHEDULER_MAX_RUNNING'],
+                                                thread_name_prefix='pooled-job')
+        self._executor.submit(self._run_in_context, job.id, pipeline, filepaths, job.cpuset, warm)
+        return True
+
+    def idle_memory(self):
+        """Returns the memory the idle containers hold, as their pipelines request it."""
+        with self._lock:
+            return sum(warm.memory for idle in self._idle.values() for warm in idle)
+
+    def wait(self):
+        """Blocks until the submitted jobs are done."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _acquire(self, pipeline):
+        image_name = pipeline.get('image_name', f"{pipeline['id']}-image")
+        image_id = self.app.extensions['docker'].image_id(image_name)
+        if image_id is None:
+            return None
+        stale = []
+        warm = None
+        with self._lock:
+            self._last_used[pipeline['id']] = time.monotonic()
+            idle = self._idle[pipeline['id']]
+            while idle:
+                candidate = idle.pop()
+                if candidate.image_id == image_id:
+                    warm = candidate
+                    break
+                stale.append(candidate)
+        for candidate in stale:
+            self._remove(candidate)
+        return warm or self._warm_up(pipeline)
+
+    def _warm_up(self, pipeline):
+        docker_manager = self.app.extensions['docker']
+        image_name = pipeline.get('image_name', f"{pipeline['id']}-image")
+        resources = pipeline_resources(pipeline, self.app.config)
+        try:
+            image = docker_manager.client.images.get(image_name)
+            container = docker_manager.client.containers.run(
+                image_name,
+                entrypoint=IDLE_COMMAND,
+                labels={POOL_LABEL: pipeline['id']},
+                mem_limit=resources['memory_limit'],
+                memswap_limit=resources['memory_limit'],
+                nano_cpus=int(resources['cpu_limit'] * 1e9),
+                cpuset_cpus=format_cpuset(host_cores(self.app.config)),
+                detach=True
+            )
+        except Exception as e:
+            print(f"Could not start a pooled container for pipeline '{pipeline['id']}': {e}")
+            return None
+        return WarmContainer(container, image.id, image.attrs['Config'].get('Entrypoint'), resources['memory'])
+
+    def _release(self, pipeline_id, warm, healthy):
+        warm.jobs += 1
+        warm.idle_since = time.monotonic()
+        with self._lock:
+            idle = self._idle[pipeline_id]
+            keep = (healthy and not self._stopping.is_set()
+                    and warm.jobs < self.app.config['CONTAINER_POOL_MAX_JOBS']
+                    and len(idle) < self.app.config['CONTAINER_POOL_SIZE'])
+            if keep:
+                idle.append(warm)
+        if not keep:
+            self._remove(warm)
+
+    def _remove(self, warm):
+        try:
+            warm.container.remove(force=True)
+        except Exception as e:
+            print(f"Could not remove pooled container {warm.container.id}: {e}")
+
+    def _run_in_context(self, job_id, pipeline, filepaths, cpuset, warm):
+        with self.app.app_context():
+            healthy = True
+            try:
+                exit_code, output = self.run_job(warm, job_id, filepaths, cpuset)
+            except Exception as e:
+                print(f"Error running job {job_id} in a pooled container: {e}")
+                exit_code, output, healthy = -1, f"Error running the job: {e}\n".encode(), False
+            if exit_code == TIMED_OUT:
+                # Whatever the job left running stays in the container, so it is retired.
+                output = (output or b'') + b"Job timed out.\n"
+                healthy = False
+            self._release(pipeline['id'], warm, healthy)
+            try:
+                self.app.extensions['job_logs'].spool(job_id, [output or b''])
+            except Exception as e:
+                print(f"Could not spool logs for job {job_id}: {e}")
+            self.app.extensions['job_tracker'].apply_transitions([{
+                'job_id': job_id,
+                'status': finished_status(exit_code),
+                'exit_code': exit_code,
+                'finished_at': datetime.utcnow()
+            }])
+
+    def run_job(self, warm, job_id, filepaths, cpuset=None):
+        """Runs one job in a warm container. Returns its exit code and output."""
+        container = warm.container
+        if cpuset:
+            container.update(cpuset_cpus=cpuset)
+        inputs_dir = workspace.CONTAINER_INPUTS_PATH
+        outputs_dir = workspace.CONTAINER_OUTPUTS_PATH
+
+        archive = io.BytesIO()
+        container_filepaths = []
+        with tarfile.open(fileobj=archive, mode='w') as tar:
+            for directory in (inputs_dir, outputs_dir):
+                info = tarfile.TarInfo(directory.lstrip('/'))
+                info.type = tarfile.DIRTYPE
+                info.mode = 0o777
+                tar.addfile(info)
+            for filepath, name in zip(filepaths, workspace.input_names(filepaths)):
+                tar.add(os.path.join(BASE_DIR, filepath), arcname=f"{inputs_dir.lstrip('/')}/{name}")
+                container_filepaths.append(f"{inputs_dir}/{name}")
+        container.put_archive('/', archive.getvalue())
+
+        try:
+            timeout = ['timeout', str(self.app.config['CONTAINER_POOL_JOB_TIMEOUT'])]
+            exit_code, output = container.exec_run(
+                timeout + warm.entrypoint + container_filepaths,
+                environment={'OUTPUT_DIR': outputs_dir}
+            )
+            self._fetch_outputs(container, job_id)
+        finally:
+            container.exec_run(['rm', '-rf', inputs_dir, outputs_dir])
+        return exit_code, output
+
+    def _fetch_outputs(self, container, job_id):
+        # Only top-level files can match declared outputs, so that is all we keep.
+        outputs_path = os.path.join(workspace.workspace_path(job_id), 'outputs')
+        os.makedirs(outputs_path, exist_ok=True)
+        stream, _ = container.get_archive(workspace.CONTAINER_OUTPUTS_PATH)
+        with tarfile.open(fileobj=io.BytesIO(b''.join(stream))) as tar:
+            for member in tar.getmembers():
+                parts = member.name.split('/')
+                if member.isfile() and len(parts) == 2:
+                    with open(os.path.join(outputs_path, parts[1]), 'wb') as f:
+                        f.write(tar.extractfile(member).read())
+
+    def start(self):
+        """
+        Clears out what a previous run left behind and starts keeping the
+        pools topped up. Must be called before the scheduler starts.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self.app.app_context():
+            try:
+                client = self.app.extensions['docker'].client
+                for container in client.containers.list(all=True, filters={'label': POOL_LABEL}):
+                    container.remove(force=True)
+            except Exception as e:
+                print(f"Could not remove leftover pooled containers: {e}")
+            # Pooled jobs are the only ones running without a container of
+            # their own or steps; a restart lost them.
+            lost = Job.query.filter(Job.status == 'running', Job.container_id.is_(None), ~Job.children.any()).update(
+                {'status': 'failed', 'finished_at': datetime.utcnow()}, synchronize_session=False
+            )
+            db.session.commit()
+            if lost:
+                print(f"Marked {lost} pooled job(s) interrupted by a restart as failed.")
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._maintain, name='container-pool', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.wait()
+        with self._lock:
+            idle = [warm for containers in self._idle.values() for warm in containers]
+            self._idle.clear()
+        for warm in idle:
+            self._remove(warm)
+        # Jobs have all been released by now, so the pool can be used again.
+        self._stopping.clear()
+
+    def _maintain(self):
+        interval = min(5.0, self.app.config['CONTAINER_POOL_IDLE_TTL'])
+        while not self._stopping.wait(interval):
+            try:
+                with self.app.app_context():
+                    self.maintain()
+            except Exception as e:
+                print(f"Error maintaining the container pool: {e}")
+
+    def maintain(self):
+        """Retires containers idle for longer than the TTL and tops up pools in use."""
+        ttl = self.app.config['CONTAINER_POOL_IDLE_TTL']
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for pipeline_id, idle in self._idle.items():
+                expired += [warm for warm in idle if now - warm.idle_since > ttl]
+                idle[:] = [warm for warm in idle if now - warm.idle_since <= ttl]
+            in_use = [p for p, used in self._last_used.items() if now - used <= ttl]
+        for warm in expired:
+            self._remove(warm)
+
+        scheduler = self.app.extensions['scheduler']
+        for pipeline_id in in_use:
+            pipeline = self.app.extensions['pipelines'].get(pipeline_id)
+            if pipeline is None or not self.handles(pipeline):
+                continue
+            resources = pipeline_resources(pipeline, self.app.config)
+            while len(self._idle[pipeline_id]) < self.app.config['CONTAINER_POOL_SIZE']:
+                # Idle containers only take memory no job has asked for.
+                ledger = scheduler.ledger()
+                if ledger.memory is not None and resources['memory'] > ledger.memory:
+                    break
+                warm = self._warm_up(pipeline)
+                if warm is None:
+                    break
+                with self._lock:
+                    self._idle[pipeline_id].append(warm)
@@ -0,0 +1,86 @@
+"""
+Database engine configuration.
+
+SQLALCHEMY_DATABASE_URI (or DATABASE_URL in the environment) picks the
+database. A server database such as PostgreSQL gets a connection pool sized
+by DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT and DB_POOL_RECYCLE, with
+connections checked before use so a restarted server doesn't surface as
+errors. Its driver is an optional dependency (`pip install .[postgres]`).
+
+SQLite gets the pragmas that let the scheduler, the job tracker and the
+web workers write at the same time: WAL, so readers never block the writer,
+and a busy timeout, so writers wait for each other instead of failing with
+"database is locked". They are set on every new connection.
+
+Tests run against an in-memory SQLite database unless TEST_DATABASE_URL
+points them at another one, e.g. the PostgreSQL of docker-compose.test.yml.
+"""
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Database the tests run against.
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL', 'sqlite:///:memory:')
+
+
+def normalize_uri(uri):
+    # Hosting platforms hand out postgres:// URLs, which SQLAlchemy no longer accepts.
+    if uri.startswith('postgres://'):
+        return 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def engine_options(config):
+    """Returns the engine options for the configured database."""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        # The sqlite3 module's timeout is SQLite's busy handler.
+        return {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT'] / 1000}}
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,
+    }
+
+
+def configure(app):
+    """Sets the engine options from the config. Must be called before `db.init_app`."""
+    app.config['SQLALCHEMY_DATABASE_URI'] = normalize_uri(app.config['SQLALCHEMY_DATABASE_URI'])
+    # Options set explicitly, e.g. by a test, win over the computed ones.
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**engine_options(app.config),
+                                               **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+
+
+def init_app(app, db):
+    """Hooks the SQLite pragmas into the engine. Must be called after `db.init_app`."""
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas(app.config, in_memory=engine.url.database in (None, '', ':memory:'))
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def sqlite_pragmas(config, in_memory=False):
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT'])}",
+        # Negative sizes are in KiB.
+        f"PRAGMA cache_size = -{int(config['SQLITE_CACHE_SIZE_KB'])}",
+        'PRAGMA temp_store = MEMORY',
+    ]
+    if not in_memory:
+        # An in-memory database has no journal file to put in WAL mode.
+        pragmas += [
+            f"PRAGMA journal_mode = {config['SQLITE_JOURNAL_MODE']}",
+            # NORMAL is safe with WAL: a power loss can only lose the last commits.
+            f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}",
+        ]
+    return pragmas
@@ -0,0 +1,113 @@
+import threading
+import time
+
+# Image events that can change whether an image is present locally.
+IMAGE_EVENTS = ('pull', 'tag', 'untag', 'delete', 'load', 'import')
+
+
+def docker_sdk():
+    """
+    Returns the Docker SDK, imported on first use. It brings in requests
+    and urllib3, which is a good part of the time it takes to import the
+    backend, and apps built for tests and CLI commands rarely need it.
+    """
+    import docker
+    return docker
+
+
+class DockerClientManager:
+    """
+    Process-wide Docker client.
+
+    Every caller shares one `DockerClient`, and so one pool of connections
+    to the daemon. The client is pinged at most once per health-check
+    interval and rebuilt if the daemon stops answering. The manager also
+    remembers which images exist locally; the job tracker forwards image
+    events so the cache is dropped as soon as an image changes.
+
+    Tests can swap in a stand-in with `set_client()`.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._client = None
+        self._checked_at = 0.0
+        self._images = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['docker'] = self
+
+    @property
+    def client(self):
+        """Returns the shared client, (re)connecting if it is unhealthy."""
+        with self._lock:
+            now = time.monotonic()
+            if self._client is None:
+                self._client = self._connect()
+                self._checked_at = now
+            elif now - self._checked_at > self.app.config['DOCKER_HEALTH_CHECK_INTERVAL']:
+                try:
+                    self._client.ping()
+                except Exception as e:
+                    print(f"Docker health check failed, reconnecting: {e}")
+                    self._close()
+                    self._client = self._connect()
+                    self._images.clear()
+                self._checked_at = now
+            return self._client
+
+    def set_client(self, client):
+        """Replaces the shared client, e.g. with a fake in tests."""
+        with self._lock:
+            self._close()
+            self._client = client
+            self._checked_at = time.monotonic()
+            self._images.clear()
+
+    def image_id(self, image_name):
+        """
+        Returns the id (content digest) of a local image, or None if it
+        doesn't exist, using the cache when possible.
+        """
+        cached = self._images.get(image_name)
+        if cached is not None and time.monotonic() - cached[1] < self.app.config['DOCKER_IMAGE_CACHE_TTL']:
+            return cached[0]
+        try:
+            image_id = self.client.images.get(image_name).id
+        except docker_sdk().errors.ImageNotFound:
+            image_id = None
+        self._images[image_name] = (image_id, time.monotonic())
+        return image_id
+
+    def has_image(self, image_name):
+        """Returns True if the image exists locally, using the cache when possible."""
+        return self.image_id(image_name) is not None
+
+    def handle_image_event(self, event):
+        """Drops cached presence for the image an image event refers to."""
+        if event.get('Action') not in IMAGE_EVENTS:
+            return
+        actor = event.get('Actor', {})
+        names = {actor.get('ID'), actor.get('Attributes', {}).get('name')}
+        # Events may name the image with or without a tag, or only by id, so
+        # anything we can't match is dropped wholesale.
+        matched = [name for name in list(self._images) if name in names or name.split(':')[0] in names]
+        if not matched:
+            self._images.clear()
+        for name in matched:
+            self._images.pop(name, None)
+
+    def _connect(self):
+        return docker_sdk().from_env(max_pool_size=self.app.config['DOCKER_POOL_SIZE'])
+
+    def _close(self):
+        if self._client is not None:
+            try:
+                self._client.close()
+            except Exception:
+                pass
+        self._client = None
@@ -1,5 +1,35 @@
 from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
+from .blob_store import BlobStore
+from .docker_client import DockerClientManager
+from .scheduler import JobScheduler
+from .job_tracker import JobTracker
+from .job_logs import JobLogStore
+from .artifacts import ArtifactStore
+from .result_cache import ResultCache
+from .pipeline_registry import PipelineRegistry
+from .pipeline_dag import DagExecutor
+from .container_pool import ContainerPool
+from .job_events import JobEventHub
+from .passwords import PasswordHasher
+from .user_cache import UserCache
+from .static_assets import StaticAssets
+from .background import BackgroundServices
 
 bcrypt = Bcrypt()
 login_manager = LoginManager()
+blobs = BlobStore()
+docker_manager = DockerClientManager()
+scheduler = JobScheduler()
+job_tracker = JobTracker()
+job_logs = JobLogStore()
+artifacts = ArtifactStore()
+result_cache = ResultCache()
+pipeline_registry = PipelineRegistry()
+dag_executor = DagExecutor()
+container_pool = ContainerPool()
+job_events = JobEventHub()
+passwords = PasswordHasher()
+user_cache = UserCache()
+static_assets = StaticAssets()
+background = BackgroundServices()
@@ -0,0 +1,170 @@
+"""
+An in-process stand-in for the Docker SDK client, for tests.
+
+Install it with `docker_manager.set_client(FakeDockerClient(...))`. Containers
+"run" instantly: they are recorded with their arguments and can be moved to
+an exited state with `FakeContainer.finish()`.
+
+Each container has a tiny in-memory filesystem (`files`, by absolute path)
+for the archive calls. `exec_run` handles `rm` itself and passes any other
+command to `client.exec_handler(container, cmd, environment)`, which
+returns `(exit_code, output)`.
+"""
+import hashlib
+import io
+import itertools
+import queue
+import tarfile
+import docker
+from docker.models.containers import ExecResult
+
+
+class FakeContainer:
+    def __init__(self, client, image, command, **kwargs):
+        self.client = client
+        self.id = f"fake{next(client._ids):060d}"
+        self.image = image
+        self.command = command
+        self.kwargs = kwargs
+        self.labels = kwargs.get('labels') or {}
+        self.logs_output = b''
+        self.attrs = {'State': {'Status': 'running', 'ExitCode': 0, 'OOMKilled': False, 'FinishedAt': ''}}
+        self.files = {}
+        self.execs = []
+
+    @property
+    def status(self):
+        return self.attrs['State']['Status']
+
+    def finish(self, exit_code=0, output=b'', oom_killed=False):
+        self.logs_output += output
+        self.attrs['State'].update({
+            'Status': 'exited',
+            'ExitCode': exit_code,
+            'OOMKilled': oom_killed,
+            'FinishedAt': '2024-01-01T00:00:00.000000000Z',
+        })
+
+    def reload(self):
+        pass
+
+    def update(self, **kwargs):
+        self.kwargs.update(kwargs)
+        self.client.calls.append(('update', self.id, kwargs))
+
+    def wait(self, timeout=None):
+        return {'StatusCode': self.attrs['State']['ExitCode']}
+
+    def logs(self, stream=False, follow=False, **kwargs):
+        if stream:
+            return iter([self.logs_output]) if self.logs_output else iter([])
+        return self.logs_output
+
+    def stop(self, timeout=None):
+        self.finish(exit_code=137)
+
+    def exec_run(self, cmd, environment=None, **kwargs):
+        self.execs.append(cmd)
+        if cmd[0] == 'rm':
+            for path in cmd[2:]:
+                self.files = {p: data for p, data in self.files.items() if not p.startswith(path + '/')}
+            return ExecResult(0, b'')
+        if self.client.exec_handler is None:
+            return ExecResult(0, b'')
+        return ExecResult(*self.client.exec_handler(self, cmd, environment or {}))
+
+    def put_archive(self, path, data):
+        with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+            for member in tar.getmembers():
+                if member.isfile():
+                    self.files[f"{path.rstrip('/')}/{member.name}"] = tar.extractfile(member).read()
+        return True
+
+    def get_archive(self, path):
+        buffer = io.BytesIO()
+        root = path.rsplit('/', 1)[0]
+        with tarfile.open(fileobj=buffer, mode='w') as tar:
+            for filepath, data in sorted(self.files.items()):
+                if filepath.startswith(path + '/'):
+                    info = tarfile.TarInfo(filepath[len(root) + 1:])
+                    info.size = len(data)
+                    tar.addfile(info, io.BytesIO(data))
+        return iter([buffer.getvalue()]), {'name': path.rsplit('/', 1)[1]}
+
+    def remove(self, force=False):
+        self.client.containers._containers.pop(self.id, None)
+
+
+class FakeContainers:
+    def __init__(self, client):
+        self.client = client
+        self._containers = {}
+
+    def run(self, image, command=None, **kwargs):
+        if image not in self.client.images.names:
+            raise docker.errors.ImageNotFound(f"No such image: {image}")
+        container = FakeContainer(self.client, image, command, **kwargs)
+        self._containers[container.id] = container
+        self.client.calls.append(('run', image, command, kwargs))
+        return container
+
+    def get(self, container_id):
+        try:
+            return self._containers[container_id]
+        except KeyError:
+            raise docker.errors.NotFound(f"No such container: {container_id}")
+
+    def list(self, all=False, filters=None):
+        containers = list(self._containers.values())
+        if not all:
+            containers = [c for c in containers if c.status == 'running']
+        label = (filters or {}).get('label')
+        if label:
+            containers = [c for c in containers if label in c.labels]
+        return containers
+
+
+class FakeImage:
+    def __init__(self, name, image_id, entrypoint=None):
+        self.tags = [name]
+        self.id = image_id
+        self.attrs = {'Config': {'Entrypoint': entrypoint}}
+
+
+class FakeImages:
+    def __init__(self, client, names):
+        self.client = client
+        self.names = set(names)
+        # Image ids by name; rebuild an image by assigning a new id.
+        self.ids = {}
+        self.entrypoints = {}
+
+    def get(self, name):
+        self.client.calls.append(('images.get', name))
+        if name not in self.names:
+            raise docker.errors.ImageNotFound(f"No such image: {name}")
+        image_id = self.ids.get(name) or 'sha256:' + hashlib.sha256(name.encode()).hexdigest()
+        return FakeImage(name, image_id, self.entrypoints.get(name))
+
+
+class FakeDockerClient:
+    def __init__(self, images=()):
+        self._ids = itertools.count(1)
+        self.calls = []
+        self.exec_handler = None
+        self.images = FakeImages(self, images)
+        self.containers = FakeContainers(self)
+        self.event_queue = queue.Queue()
+
+    def ping(self):
+        return True
+
+    def close(self):
+        pass
+
+    def events(self, decode=False, filters=None):
+        while True:
+            event = self.event_queue.get()
+            if event is None:
+                return
+            yield event
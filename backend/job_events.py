@@ -0,0 +1,221 @@
+"""
+Pushes changes to the status of jobs to the browser.
+
+Every UPDATE of a job sets `Job.updated_at`. While anyone is listening, a
+single thread per process asks the database for the jobs changed since
+its last look, every JOB_EVENTS_POLL_INTERVAL seconds (sooner when a job
+finishes in this process). It hands each change to the listeners of the
+job's owner. However many tabs are open, that is one small indexed query
+per interval instead of a full /api/jobs per tab. Because the changes are
+read from the database, they include transitions made by other
+processes.
+
+An event carries the new state of one job, not its whole row. Its id
+encodes `updated_at`. A client that reconnects with Last-Event-ID gets
+every job of its own changed since then, read from the database, so
+nothing is lost across reconnects or workers. Events are idempotent
+upserts, so the occasional repeat is harmless. A listener that falls more
+than JOB_EVENTS_QUEUE_SIZE events behind gets a `reset` event and should
+reload the list. When the process shuts down, `close_streams` ends every
+stream and the browsers reconnect, to another worker, and replay.
+"""
+import json
+import queue
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from . import db
+from .models import Job
+from .signals import job_finished
+
+EPOCH = datetime(1970, 1, 1)
+
+# What an event says about a job.
+EVENT_COLUMNS = (Job.id, Job.user_id, Job.status, Job.pipeline, Job.exit_code, Job.created_at, Job.finished_at,
+                 Job.outputs_ready, Job.parent_id, Job.step, Job.shard, Job.data_submission_id, Job.updated_at)
+
+
+def event_id(updated_at):
+    return str((updated_at - EPOCH) // timedelta(microseconds=1))
+
+
+def parse_event_id(value):
+    """Returns the time an event id stands for. Raises ValueError."""
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+def _event(row):
+    return {
+        'id': event_id(row.updated_at),
+        'data': {
+            'id': row.id,
+            'status': row.status,
+            'pipeline': row.pipeline,
+            'exit_code': row.exit_code,
+            'created_at': row.created_at.isoformat(),
+            'finished_at': row.finished_at.isoformat() if row.finished_at else None,
+            'outputs_ready': row.outputs_ready,
+            'parent_id': row.parent_id,
+            'step': row.step,
+            'shard': row.shard,
+            'data_submission_id': row.data_submission_id
+        }
+    }
+
+
+class Subscription:
+    def __init__(self, user_id, size):
+        self.user_id = user_id
+        self.events = queue.Queue(size)
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def close(self):
+        # None ends the stream; a listener too far behind to take it is reset instead.
+        self.put(None)
+
+
+class JobEventHub:
+    """Fans out changes to jobs to the listeners of their owners. See the module docstring."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+        self._seen = {}
+        self._watermark = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stopping = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['job_events'] = self
+        job_finished.connect(self._on_job_finished, sender=app)
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, self.app.config['JOB_EVENTS_QUEUE_SIZE'])
+        with self._lock:
+            if not self._subscriptions:
+                # Nobody was listening, so nothing before now needs publishing.
+                self._watermark = datetime.utcnow()
+            self._subscriptions[user_id].add(subscription)
+        self._wakeup.set()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.user_id]
+
+    def close_streams(self):
+        """Ends every open stream, e.g. so that a worker can shut down without waiting for them."""
+        with self._lock:
+            subscriptions = [s for subscribers in self._subscriptions.values() for s in subscribers]
+        for subscription in subscriptions:
+            subscription.close()
+
+    def replay(self, user_id, since):
+        """Returns events for the user's jobs changed since `since`. Must be called in an app context."""
+        since -= timedelta(seconds=self.app.config['JOB_EVENTS_OVERLAP'])
+        rows = db.session.query(*EVENT_COLUMNS) \
+            .filter(Job.user_id == user_id, Job.updated_at >= since) \
+            .order_by(Job.updated_at)
+        return [_event(row) for row in rows]
+
+    def poll(self):
+        """
+        Publishes the jobs changed since the last poll. Returns how many
+        events went out. Must be called in an app context.
+        """
+        with self._lock:
+            user_ids = set(self._subscriptions)
+        if not user_ids:
+            return 0
+        now = datetime.utcnow()
+        overlap = timedelta(seconds=self.app.config['JOB_EVENTS_OVERLAP'])
+        since = (self._watermark or now) - overlap
+        rows = db.session.query(*EVENT_COLUMNS).filter(Job.updated_at >= since).order_by(Job.updated_at).all()
+        # Don't hold a transaction (or a snapshot) open between polls.
+        db.session.rollback()
+        self._watermark = now
+
+        published = 0
+        for row in rows:
+            event = _event(row)
+            # Rows in the overlap have mostly been published already.
+            state = json.dumps(event['data'], sort_keys=True)
+            if self._seen.get(row.id, (None,))[0] == state:
+                continue
+            self._seen[row.id] = (state, row.updated_at)
+            if row.user_id in user_ids:
+                with self._lock:
+                    subscriptions = list(self._subscriptions.get(row.user_id, ()))
+                for subscription in subscriptions:
+                    subscription.put(event)
+                published += 1
+        self._seen = {job_id: seen for job_id, seen in self._seen.items() if seen[1] >= since}
+        return published
+
+    def stream(self, subscription, replayed=()):
+        """
+        Yields a subscription's events as server-sent events until the
+        client goes away. Needs no app context.
+        """
+        keepalive = self.app.config['JOB_EVENTS_KEEPALIVE']
+        try:
+            for event in replayed:
+                yield self._format(event)
+            while not subscription.overflowed:
+                try:
+                    event = subscription.events.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    # The client reconnects with Last-Event-ID and misses nothing.
+                    return
+                yield self._format(event)
+            yield "event: reset\ndata: \n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    def _format(self, event):
+        return f"id: {event['id']}\nevent: job\ndata: {json.dumps(event['data'])}\n\n"
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='job-events', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.app.config['JOB_EVENTS_POLL_INTERVAL'])
+            self._wakeup.clear()
+            try:
+                with self.app.app_context():
+                    self.poll()
+            except Exception as e:
+                print(f"Error publishing job events: {e}")
+
+    def _on_job_finished(self, app, job):
+        self._wakeup.set()
@@ -0,0 +1,174 @@
+import bisect
+import gzip
+import json
+import os
+import queue
+import threading
+from .config import BASE_DIR
+from .docker_client import docker_sdk
+from .signals import job_finished
+
+# Size of the chunks read from spool files and container log streams.
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class JobLogStore:
+    """
+    Stores and streams the output of pipeline containers.
+
+    While a job's container exists its logs are streamed from Docker. When
+    the job finishes, the job tracker asks the store to spool the logs to
+    `LOGS_DIR/<job_id>.log.gz`, so they outlive the container.
+
+    Spool files are written as a series of independent gzip members, and a
+    small JSON index records where each member starts. Reading from an
+    offset only decompresses from the member containing it, so the tail of
+    a large log can be served without reading the whole file.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.logs_dir = None
+        self._pending = queue.Queue()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.logs_dir = os.path.join(BASE_DIR, app.config['LOGS_DIR'])
+        app.extensions['job_logs'] = self
+        job_finished.connect(self._on_job_finished, sender=app)
+
+    def _on_job_finished(self, app, job):
+        # Spool the output so it outlives the container.
+        if job.container_id:
+            self.enqueue(job.id, job.container_id)
+
+    def spool_path(self, job_id):
+        return os.path.join(self.logs_dir, f"{job_id}.log.gz")
+
+    def _index_path(self, job_id):
+        return os.path.join(self.logs_dir, f"{job_id}.log.idx")
+
+    def _read_index(self, job_id):
+        try:
+            with open(self._index_path(job_id), 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def is_spooled(self, job_id):
+        return self._read_index(job_id) is not None
+
+    def spooled_size(self, job_id):
+        """Returns the uncompressed size of a spooled log, or None."""
+        index = self._read_index(job_id)
+        return index['size'] if index else None
+
+    def spool(self, job_id, chunks):
+        """Writes an iterable of byte chunks to the job's spool file."""
+        member_size = self.app.config['LOGS_SPOOL_MEMBER_SIZE']
+        path = self.spool_path(job_id)
+        members = []
+        size = 0
+        buffer = bytearray()
+
+        with open(path + '.tmp', 'wb') as f:
+            def flush(data):
+                members.append([size, f.tell()])
+                f.write(gzip.compress(bytes(data)))
+                return size + len(data)
+
+            for chunk in chunks:
+                buffer += chunk
+                while len(buffer) >= member_size:
+                    size = flush(buffer[:member_size])
+                    del buffer[:member_size]
+            if buffer or not members:
+                size = flush(buffer)
+
+        # The index is written last: a spool only counts once it has one.
+        os.replace(path + '.tmp', path)
+        with open(self._index_path(job_id) + '.tmp', 'w') as f:
+            json.dump({'size': size, 'members': members}, f)
+        os.replace(self._index_path(job_id) + '.tmp', self._index_path(job_id))
+        return size
+
+    def read_spool(self, job_id, start=0, end=None):
+        """Yields the bytes of a spooled log from `start` up to, not including, `end`."""
+        index = self._read_index(job_id)
+        if index is None:
+            return
+        end = index['size'] if end is None else min(end, index['size'])
+        if start >= end:
+            return
+
+        member = bisect.bisect_right([m[0] for m in index['members']], start) - 1
+        member_start, compressed_offset = index['members'][member]
+        with open(self.spool_path(job_id), 'rb') as f:
+            f.seek(compressed_offset)
+            with gzip.GzipFile(fileobj=f, mode='rb') as log:
+                position = member_start
+                while position < end:
+                    chunk = log.read(READ_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if position + len(chunk) > start:
+                        yield chunk[max(0, start - position):end - position]
+                    position += len(chunk)
+
+    def read_container(self, container_id, start=0, end=None, follow=False):
+        """Yields a container's output from `start`, optionally following it."""
+        container = self.app.extensions['docker'].client.containers.get(container_id)
+        position = 0
+        for chunk in container.logs(stream=True, follow=follow):
+            if end is not None and position >= end:
+                break
+            if position + len(chunk) > start:
+                yield chunk[max(0, start - position):None if end is None else end - position]
+            position += len(chunk)
+
+    def read(self, job_id, container_id, start=0, end=None, follow=False):
+        """
+        Yields a job's output from the spool if there is one, otherwise from
+        its container. Yields nothing if neither exists.
+        """
+        if self.is_spooled(job_id):
+            yield from self.read_spool(job_id, start, end)
+            return
+        if not container_id:
+            return
+        try:
+            yield from self.read_container(container_id, start, end, follow)
+        except docker_sdk().errors.NotFound:
+            # The container was removed before we got to it; it may have
+            # been spooled in the meantime.
+            yield from self.read_spool(job_id, start, end)
+
+    def enqueue(self, job_id, container_id):
+        """Schedules a finished job's logs to be spooled in the background."""
+        self._pending.put((job_id, container_id))
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._spool_pending, name='job-log-spooler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        if self._thread is not None:
+            self._pending.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _spool_pending(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            job_id, container_id = item
+            try:
+                self.spool(job_id, self.read_container(container_id))
+            except Exception as e:
+                print(f"Could not spool logs for job {job_id}: {e}")
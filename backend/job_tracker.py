@@ -0,0 +1,237 @@
+import queue
+import threading
+import time
+from datetime import datetime
+from . import db
+from .docker_client import IMAGE_EVENTS
+from .models import Job
+from .signals import job_finished
+from .pipeline_manager import JOB_LABEL
+
+# Job statuses the tracker is allowed to move a job out of.
+TRACKED_STATUSES = ('starting', 'running')
+
+
+def _parse_docker_time(value):
+    # Docker reports times like '2024-01-01T12:00:00.123456789Z'.
+    if not value or value.startswith('0001-'):
+        return None
+    return datetime.strptime(value[:19], '%Y-%m-%dT%H:%M:%S')
+
+
+def finished_status(exit_code, oom_killed=False):
+    """Maps a container's exit to a job status."""
+    if oom_killed:
+        return 'oom-killed'
+    return 'succeeded' if exit_code == 0 else 'failed'
+
+
+class JobTracker:
+    """
+    Keeps `Job.status` in sync with the containers running the jobs.
+
+    A single reader thread subscribes to the Docker events stream and turns
+    start/oom/die events of pipeline containers into transitions.
+    A writer thread applies the transitions to the database in batches.
+    On startup, and whenever the stream has to be reopened, the tracker
+    reconciles the database with the containers that exist.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._threads = []
+        self._transitions = queue.Queue()
+        self._oom_killed = set()
+        self._stopping = threading.Event()
+        self._events = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['job_tracker'] = self
+
+    @property
+    def running(self):
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self):
+        """Starts the event reader and the status writer threads."""
+        if self.running:
+            return
+        self._stopping.clear()
+        self._threads = [
+            threading.Thread(target=self._read_events, name='job-tracker-events', daemon=True),
+            threading.Thread(target=self._write_transitions, name='job-tracker-writer', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        print("Started job tracker.")
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        if self._events is not None:
+            self._events.close()
+        for thread in self._threads:
+            thread.join(timeout)
+        if not any(thread.is_alive() for thread in self._threads):
+            self._flush()
+        self._threads = []
+
+    def _flush(self):
+        # Write what is still queued instead of leaving it to the next start's reconcile.
+        pending = []
+        while True:
+            try:
+                pending.append(self._transitions.get_nowait())
+            except queue.Empty:
+                break
+        if pending:
+            with self.app.app_context():
+                self.apply_transitions(pending)
+
+    def _read_events(self):
+        # Image events are forwarded to the Docker client manager so its
+        # image cache follows pulls and removals.
+        filters = {'type': ['container', 'image'], 'event': ['start', 'oom', 'die', *IMAGE_EVENTS]}
+        docker_manager = self.app.extensions['docker']
+        while not self._stopping.is_set():
+            try:
+                client = docker_manager.client
+                # Subscribe before reconciling so nothing falls between the two.
+                self._events = client.events(decode=True, filters=filters)
+                self.reconcile(client)
+                for event in self._events:
+                    if event.get('Type') == 'image':
+                        docker_manager.handle_image_event(event)
+                        continue
+                    transition = self.transition_from_event(event)
+                    if transition:
+                        self._transitions.put(transition)
+            except Exception as e:
+                if self._stopping.is_set():
+                    break
+                print(f"Job tracker lost the Docker event stream: {e}")
+            self._stopping.wait(self.app.config['JOB_TRACKER_RETRY_INTERVAL'])
+
+    def transition_from_event(self, event):
+        """Turns a Docker container event into a transition dict, or None."""
+        attributes = event.get('Actor', {}).get('Attributes', {})
+        job_id = attributes.get(JOB_LABEL)
+        container_id = event.get('Actor', {}).get('ID') or event.get('id')
+        action = event.get('Action') or event.get('status')
+        if not job_id:
+            return None
+
+        if action == 'oom':
+            self._oom_killed.add(container_id)
+            return None
+        if action == 'start':
+            return {'job_id': job_id, 'container_id': container_id, 'status': 'running'}
+        if action == 'die':
+            exit_code = int(attributes.get('exitCode', -1))
+            oom_killed = container_id in self._oom_killed
+            self._oom_killed.discard(container_id)
+            finished_at = datetime.utcfromtimestamp(event['timeNano'] / 1e9) if event.get('timeNano') else datetime.utcnow()
+            return {
+                'job_id': job_id,
+                'container_id': container_id,
+                'status': finished_status(exit_code, oom_killed),
+                'exit_code': exit_code,
+                'finished_at': finished_at,
+            }
+        return None
+
+    def reconcile(self, client):
+        """
+        Brings tracked jobs up to date with the containers Docker knows
+        about. Jobs whose container no longer exists are marked failed.
+        """
+        transitions = []
+        seen = set()
+        for container in client.containers.list(all=True, filters={'label': JOB_LABEL}):
+            job_id = container.labels.get(JOB_LABEL)
+            state = container.attrs.get('State', {})
+            seen.add(job_id)
+            if state.get('Status') in ('exited', 'dead'):
+                exit_code = state.get('ExitCode', -1)
+                transitions.append({
+                    'job_id': job_id,
+                    'container_id': container.id,
+                    'status': finished_status(exit_code, state.get('OOMKilled', False)),
+                    'exit_code': exit_code,
+                    'finished_at': _parse_docker_time(state.get('FinishedAt')),
+                })
+            elif state.get('Status') == 'running':
+                transitions.append({'job_id': job_id, 'container_id': container.id, 'status': 'running'})
+
+        with self.app.app_context():
+            lost = Job.query.filter(
+                Job.status == 'running',
+                Job.container_id.isnot(None),
+                Job.id.notin_(seen)
+            ).with_entities(Job.id).all()
+            for (job_id,) in lost:
+                transitions.append({'job_id': job_id, 'status': 'failed', 'finished_at': datetime.utcnow()})
+            self.apply_transitions(transitions)
+
+    def _write_transitions(self):
+        config = self.app.config
+        while not self._stopping.is_set():
+            try:
+                batch = [self._transitions.get(timeout=config['JOB_TRACKER_FLUSH_INTERVAL'])]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + config['JOB_TRACKER_FLUSH_INTERVAL']
+            while len(batch) < config['JOB_TRACKER_BATCH_SIZE']:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._transitions.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                with self.app.app_context():
+                    self.apply_transitions(batch)
+            except Exception as e:
+                print(f"Job tracker failed to write {len(batch)} status update(s): {e}")
+
+    def apply_transitions(self, transitions):
+        """
+        Writes a batch of transitions in one transaction. Only jobs that
+        are still starting or running are updated, so a late event cannot
+        resurrect a finished job. Must be called in an app context.
+        """
+        if not transitions:
+            return 0
+
+        # Later transitions for the same job win.
+        latest = {}
+        for transition in transitions:
+            latest[transition['job_id']] = transition
+
+        jobs = Job.query.filter(Job.id.in_(latest), Job.status.in_(TRACKED_STATUSES)).all()
+        for job in jobs:
+            transition = latest[job.id]
+            job.status = transition['status']
+            if transition.get('container_id'):
+                job.container_id = transition['container_id']
+            if 'exit_code' in transition:
+                job.exit_code = transition['exit_code']
+            if 'finished_at' in transition:
+                job.finished_at = transition['finished_at']
+        db.session.commit()
+
+        finished = [job for job in jobs if job.status not in TRACKED_STATUSES]
+        if finished:
+            # Finished jobs free up capacity for queued ones.
+            scheduler = self.app.extensions.get('scheduler')
+            if scheduler:
+                scheduler.wake()
+            for job in finished:
+                try:
+                    job_finished.send(self.app, job=job)
+                except Exception as e:
+                    print(f"Error handling the end of job {job.id}: {e}")
+        return len(jobs)
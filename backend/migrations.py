@@ -0,0 +1,207 @@
+"""
+Versioned schema migrations.
+
+`create_all` only creates missing tables; it never adds a column or an
+index to a table that exists. Changes to existing tables are therefore
+made by the migrations below, applied in order and recorded in the
+`schema_version` table:
+
+    flask db upgrade           # apply pending migrations
+    flask db current           # show the version of the database
+    flask db history           # list the migrations
+
+The app factory runs `upgrade()` at startup unless DB_AUTO_MIGRATE is off.
+That costs one query when the database is up to date. A new database is
+created from the models in one go and stamped with the latest version, so
+the migrations only ever run against databases that predate them.
+
+Indexes are created with `create_index`. On PostgreSQL it uses CREATE INDEX
+CONCURRENTLY, so the table stays writable while the index builds.
+
+To change the schema, change the model, then append a function decorated
+with `@migration(<next version>, '<what it does>')` that brings an existing
+database to the same place. Migrations must not be edited once released.
+"""
+import json
+from datetime import datetime
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import inspect, literal, text
+from . import db
+from .models import JobInput, SchemaVersion
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    def register(function):
+        if MIGRATIONS and version != MIGRATIONS[-1][0] + 1:
+            raise ValueError(f"migration {version} is out of sequence")
+        MIGRATIONS.append((version, description, function))
+        return function
+    return register
+
+
+def head():
+    """Returns the version the models are at."""
+    return MIGRATIONS[-1][0]
+
+
+def current_version():
+    """Returns the version of the database, 0 if it predates migrations, or None if it is empty."""
+    tables = set(inspect(db.engine).get_table_names())
+    if SchemaVersion.__tablename__ in tables:
+        return db.session.query(db.func.max(SchemaVersion.version)).scalar() or 0
+    return 0 if tables else None
+
+
+def upgrade(target=None):
+    """
+    Brings the database up to `target` (the latest version by default).
+    Returns the versions applied. Must be called in an app context.
+    """
+    target = head() if target is None else target
+    version = current_version()
+    if version is None:
+        # Nothing exists yet, so skip asking about each table first.
+        db.metadata.create_all(db.engine, checkfirst=False)
+        stamp(head())
+        print(f"Created the database schema at version {head()}.")
+        return []
+
+    SchemaVersion.__table__.create(db.engine, checkfirst=True)
+    applied = []
+    for number, description, function in MIGRATIONS:
+        if version < number <= target:
+            print(f"Applying migration {number}: {description}")
+            function()
+            stamp(number, description)
+            applied.append(number)
+    return applied
+
+
+def stamp(version, description=None):
+    """Records that the database is at `version` without running anything."""
+    if description is None:
+        description = next((d for n, d, _ in MIGRATIONS if n == version), 'stamped')
+    db.session.add(SchemaVersion(version=version, description=description, applied_at=datetime.utcnow()))
+    db.session.commit()
+
+
+def _quote(name):
+    return db.engine.dialect.identifier_preparer.quote(name)
+
+
+def add_column(table_name, column_name):
+    """Adds a column to an existing table as the model declares it, if it is missing."""
+    if column_name in {c['name'] for c in inspect(db.engine).get_columns(table_name)}:
+        return
+    column = db.metadata.tables[table_name].c[column_name]
+    dialect = db.engine.dialect
+    ddl = f"ALTER TABLE {_quote(table_name)} ADD COLUMN {_quote(column_name)} {column.type.compile(dialect)}"
+    if not column.nullable:
+        # Existing rows need a value; take the model's default.
+        default = literal(column.default.arg, column.type).compile(dialect=dialect, compile_kwargs={'literal_binds': True})
+        ddl += f" NOT NULL DEFAULT {default}"
+    db.session.execute(text(ddl))
+    db.session.commit()
+
+
+def create_index(table_name, index_name):
+    """Creates an index the model declares, if it is missing, without blocking writes where the database allows."""
+    index = next(i for i in db.metadata.tables[table_name].indexes if i.name == index_name)
+    columns = ', '.join(_quote(column.name) for column in index.columns)
+    unique = 'UNIQUE ' if index.unique else ''
+    if db.engine.dialect.name == 'postgresql':
+        # CONCURRENTLY can't run in a transaction, and waits for every open
+        # one to finish, including ours.
+        db.session.commit()
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.execute(text(f"CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {_quote(index_name)} "
+                                    f"ON {_quote(table_name)} ({columns})"))
+    else:
+        db.session.execute(text(f"CREATE {unique}INDEX IF NOT EXISTS {_quote(index_name)} "
+                                f"ON {_quote(table_name)} ({columns})"))
+        db.session.commit()
+
+
+@migration(1, 'Create the tables added since the first release')
+def create_new_tables():
+    db.create_all()
+
+
+@migration(2, 'Add the scheduling, caching and step columns to jobs')
+def add_job_columns():
+    for column_name in ('exit_code', 'finished_at', 'use_cache', 'cache_key', 'cached_from', 'cpuset',
+                        'outputs_ready', 'parent_id', 'step', 'shard'):
+        add_column('job', column_name)
+
+
+@migration(3, 'Move the input files of jobs to the job_input table')
+def migrate_job_inputs():
+    """
+    Moves the input files of jobs from the JSON column `job._files` into
+    `job_input` rows, then drops the column.
+    """
+    columns = {column['name'] for column in inspect(db.engine).get_columns('job')}
+    if '_files' not in columns:
+        return 0
+    rows = db.session.execute(text('SELECT id, _files FROM job')).all()
+    inputs = []
+    for job_id, files in rows:
+        for position, info in enumerate(json.loads(files) if files else []):
+            job_input = JobInput.from_dict(position, info)
+            job_input.job_id = job_id
+            inputs.append(job_input)
+    db.session.add_all(inputs)
+    db.session.execute(text('ALTER TABLE job DROP COLUMN _files'))
+    db.session.commit()
+    print(f"Moved the input files of {len(rows)} job(s) to the job_input table.")
+    return len(rows)
+
+
+@migration(4, 'Index jobs and submissions for listing and scheduling')
+def add_lookup_indexes():
+    for index_name in ('ix_job_user_id_created_at', 'ix_job_status', 'ix_job_parent_id', 'ix_job_cache_key'):
+        create_index('job', index_name)
+    create_index('data_submission', 'ix_data_submission_user_id')
+
+
+@migration(5, 'Track when jobs change')
+def add_job_updated_at():
+    add_column('job', 'updated_at')
+    create_index('job', 'ix_job_updated_at')
+    create_index('job', 'ix_job_user_id_updated_at')
+
+
+def init_app(app):
+    app.cli.add_command(db_command)
+
+
+@click.group('db')
+def db_command():
+    """Manage the database schema."""
+
+
+@db_command.command('upgrade')
+@click.option('--to', 'target', type=int, default=None, help='Stop at this version.')
+@with_appcontext
+def upgrade_command(target):
+    """Apply pending migrations."""
+    applied = upgrade(target)
+    click.echo(f"Applied {len(applied)} migration(s); the database is at version {current_version()}.")
+
+
+@db_command.command('current')
+@with_appcontext
+def current_command():
+    """Show the schema version of the database."""
+    version = current_version()
+    click.echo('The database is empty.' if version is None else f"Version {version} of {head()}.")
+
+
+@db_command.command('history')
+def history_command():
+    """List the migrations."""
+    for number, description, _ in MIGRATIONS:
+        click.echo(f"{number}: {description}")
@@ -14,24 +14,57 @@ class User(UserMixin, db.Model):
     jobs = db.relationship('Job', backref='user', lazy=True)
 
 class Job(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('parent_id', 'step', 'shard'),
+        # For listing a user's jobs newest first, and for the scheduler's queue scans.
+        db.Index('ix_job_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_job_status', 'status'),
+        # For streaming changes to a user's jobs; see job_events.py.
+        db.Index('ix_job_user_id_updated_at', 'user_id', 'updated_at'),
+    )
+
     id = db.Column(db.String(36), primary_key=True)
-    _files = db.Column(db.Text, nullable=False)
     status = db.Column(db.String(20), nullable=False, default='uploaded')
     pipeline = db.Column(db.String(50), nullable=True)
     container_id = db.Column(db.String(64), nullable=True)
+    cpuset = db.Column(db.String(255), nullable=True)  # Cores the container may run on. See resources.py.
+    exit_code = db.Column(db.Integer, nullable=True)
+    use_cache = db.Column(db.Boolean, nullable=False, default=True)  # False to always run the container
+    cache_key = db.Column(db.String(64), nullable=True, index=True)  # See result_cache.py
+    cached_from = db.Column(db.String(36), db.ForeignKey('job.id'), nullable=True)  # Job whose results were reused
+    outputs_ready = db.Column(db.Boolean, nullable=False, default=False)  # Artifacts have been recorded
+    # Steps of a multi-step pipeline are child jobs of the job that runs it. See pipeline_dag.py.
+    parent_id = db.Column(db.String(36), db.ForeignKey('job.id'), nullable=True, index=True)
+    step = db.Column(db.String(100), nullable=True)
+    shard = db.Column(db.Integer, nullable=True)  # Which input file, for steps that fan out
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    # Set by every UPDATE, bulk ones included.
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     data_submission_id = db.Column(db.Integer, db.ForeignKey('data_submission.id'), nullable=True)
 
     data_submission = db.relationship('DataSubmission', backref=db.backref('jobs', lazy=True))
+    # Loaded along with the jobs, for all of them at once.
+    inputs = db.relationship('JobInput', lazy='selectin', order_by='JobInput.position',
+                             cascade='all, delete-orphan')
+    children = db.relationship('Job', foreign_keys=[parent_id], backref=db.backref('parent', remote_side=[id]),
+                               order_by='(Job.created_at, Job.shard)')
 
     @property
     def files(self):
-        return json.loads(self._files)
+        """The input files, as {original_filename, filepath, sha256} dicts."""
+        return [job_input.to_dict() for job_input in self.inputs]
 
     @files.setter
     def files(self, value):
-        self._files = json.dumps(value)
+        self.inputs = [JobInput.from_dict(position, info) for position, info in enumerate(value)]
+
+    @classmethod
+    def using_file(cls, sha256=None, filepath=None):
+        """Returns a query for the jobs that took a file as input, by content or by path."""
+        criteria = {'sha256': sha256} if sha256 else {'filepath': filepath}
+        return cls.query.filter(cls.inputs.any(**criteria))
 
     def to_dict(self):
         return {
@@ -40,10 +73,84 @@ class Job(db.Model):
             'status': self.status,
             'pipeline': self.pipeline,
             'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'exit_code': self.exit_code,
+            'cached_from': self.cached_from,
+            'parent_id': self.parent_id,
+            'step': self.step,
+            'shard': self.shard,
+            'outputs': [artifact.to_dict() for artifact in self.artifacts],
             'data_submission_id': self.data_submission_id
         }
 
 
+class JobInput(db.Model):
+    """An input file of a job, in the order the pipeline gets them."""
+    job_id = db.Column(db.String(36), db.ForeignKey('job.id'), primary_key=True)
+    position = db.Column(db.Integer, primary_key=True)
+    original_filename = db.Column(db.String(255), nullable=False)
+    filepath = db.Column(db.String(512), nullable=False, index=True)  # Relative to the project root
+    sha256 = db.Column(db.String(64), nullable=True, index=True)  # Of the contents; see blob_store.py
+
+    @classmethod
+    def from_dict(cls, position, info):
+        return cls(position=position, original_filename=info.get('original_filename') or '',
+                   filepath=info['filepath'], sha256=info.get('sha256'))
+
+    def to_dict(self):
+        return {'original_filename': self.original_filename, 'filepath': self.filepath, 'sha256': self.sha256}
+
+
+class CachedResult(db.Model):
+    """A finished job whose outputs can be reused for identical runs. See result_cache.py."""
+    key = db.Column(db.String(64), primary_key=True)
+    job_id = db.Column(db.String(36), db.ForeignKey('job.id'), nullable=False)
+    pipeline = db.Column(db.String(50), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False, default=0)  # Total size of the artifacts
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class Artifact(db.Model):
+    """An output file harvested from a finished job. See artifacts.py."""
+    __table_args__ = (db.UniqueConstraint('job_id', 'filename'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(36), db.ForeignKey('job.id'), nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)  # The output name declared in the manifest
+    filename = db.Column(db.String(255), nullable=False)
+    filepath = db.Column(db.String(512), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False)
+    mime_type = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    job = db.relationship('Job', backref=db.backref('artifacts', lazy=True, order_by='Artifact.id'))
+
+    def copy(self, job_id, filename=None):
+        """Returns a new artifact of another job that refers to the same stored file."""
+        return Artifact(
+            job_id=job_id,
+            name=self.name,
+            filename=filename or self.filename,
+            filepath=self.filepath,
+            size=self.size,
+            sha256=self.sha256,
+            mime_type=self.mime_type
+        )
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'filename': self.filename,
+            'size': self.size,
+            'sha256': self.sha256,
+            'mime_type': self.mime_type,
+            'url': f"/api/jobs/{self.job_id}/artifacts/{self.filename}"
+        }
+
+
 # Association table for the many-to-many relationship between LabMember and Skill
 lab_member_skills = db.Table('lab_member_skills',
     db.Column('lab_member_id', db.Integer, db.ForeignKey('lab_member.id'), primary_key=True),
@@ -71,7 +178,8 @@ class LabMember(db.Model):
     projects = db.Column(db.Text, nullable=True)
     responsibilities = db.Column(db.Text, nullable=True)
 
-    skills = db.relationship('Skill', secondary=lab_member_skills, lazy='subquery',
+    # Loaded with the members where they are listed; see serializers.py.
+    skills = db.relationship('Skill', secondary=lab_member_skills, lazy=True,
         backref=db.backref('lab_members', lazy=True))
 
     def to_dict(self):
@@ -126,7 +234,7 @@ class DataSubmission(db.Model):
     primers_used = db.Column(db.String(200), nullable=True)
     submitted_to = db.Column(db.String(120), nullable=False)
     submission_date = db.Column(db.Date, nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     uploaded_files = db.Column(db.Text, nullable=True)  # JSON array of file info
 
     project = db.relationship('Project', backref=db.backref('data_submissions', lazy=True))
@@ -149,5 +257,56 @@ class DataSubmission(db.Model):
             'submission_date': self.submission_date.isoformat(),
             'user_id': self.user_id,
             'project_name': self.project.project_name if self.project else None,
-            'uploaded_files': json.loads(self.uploaded_files) if self.uploaded_files and self.uploaded_files.strip() else []
+            'uploaded_files': self.files
         }
+
+    @property
+    def files(self):
+        return self.parse_files(self.uploaded_files)
+
+    @staticmethod
+    def parse_files(uploaded_files):
+        """Parses the `uploaded_files` column into a list of file entries."""
+        return json.loads(uploaded_files) if uploaded_files and uploaded_files.strip() else []
+
+
+class Blob(db.Model):
+    """A stored file, identified by the SHA-256 of its contents. See blob_store.py."""
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class Upload(db.Model):
+    """A chunked, resumable file upload. See uploads.py."""
+    id = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    original_filename = db.Column(db.String(255), nullable=False)
+    filepath = db.Column(db.String(512), nullable=False)
+    length = db.Column(db.BigInteger, nullable=True)  # Declared total size, if known
+    offset = db.Column(db.BigInteger, nullable=False, default=0)  # Bytes received so far
+    checksum = db.Column(db.String(64), nullable=True)  # SHA-256, set on finalize
+    status = db.Column(db.String(20), nullable=False, default='uploading')
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.original_filename,
+            'length': self.length,
+            'offset': self.offset,
+            'checksum': self.checksum,
+            'status': self.status
+        }
+
+    def file_info(self):
+        """The entry used for this upload in Job.files and DataSubmission.uploaded_files."""
+        return {'original_filename': self.original_filename, 'filepath': self.filepath, 'sha256': self.checksum}
+
+
+class SchemaVersion(db.Model):
+    """A schema migration applied to the database. See migrations.py."""
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
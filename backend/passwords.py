@@ -0,0 +1,106 @@
+"""
+Password hashing off the request threads.
+
+bcrypt is slow on purpose, and a login storm would otherwise keep every
+server thread busy hashing. Hashes are computed in a pool of
+PASSWORD_HASH_WORKERS processes (0 hashes on the calling thread). At most
+PASSWORD_HASH_MAX_PENDING hashes may be queued or running at once. A
+request that can't get a slot within PASSWORD_HASH_QUEUE_TIMEOUT seconds
+gets `PasswordHasherBusy`, which the views turn into a 503, rather than
+joining an ever longer queue.
+
+New hashes use BCRYPT_LOG_ROUNDS. A stored hash with a different cost
+still verifies, and `needs_rehash` tells the login view to replace it, so
+a change of cost reaches every account at its next login.
+
+The workers are spawned, so each imports the main script again. A script
+that builds an app must do so under `if __name__ == '__main__'`; an app
+built in a worker anyway starts no background services (see create_app).
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt
+
+# Lowest cost bcrypt accepts, for throwaway test accounts.
+MIN_ROUNDS = 4
+
+
+class PasswordHasherBusy(Exception):
+    """Too many passwords are being hashed; the client should retry later."""
+
+
+def _encode(password):
+    # bcrypt only ever looked at the first 72 bytes; newer versions refuse more.
+    return password.encode('utf-8')[:72]
+
+
+def hash_password(password, rounds):
+    return bcrypt.hashpw(_encode(password), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def check_password(password_hash, password):
+    try:
+        return bcrypt.checkpw(_encode(password), password_hash.encode('utf-8'))
+    except ValueError:  # Not a bcrypt hash
+        return False
+
+
+def hash_rounds(password_hash):
+    """Returns the cost a bcrypt hash was made with, or None if it isn't one."""
+    parts = (password_hash or '').split('$')
+    return int(parts[2]) if len(parts) > 3 and parts[2].isdigit() else None
+
+
+class PasswordHasher:
+    """Hashes and checks passwords in a bounded process pool. See the module docstring."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['passwords'] = self
+        self._slots = threading.BoundedSemaphore(app.config['PASSWORD_HASH_MAX_PENDING'])
+
+    def hash(self, password, rounds=None):
+        return self._run(hash_password, password, rounds or self.app.config['BCRYPT_LOG_ROUNDS'])
+
+    def check(self, password_hash, password):
+        return self._run(check_password, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return hash_rounds(password_hash) != self.app.config['BCRYPT_LOG_ROUNDS']
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(timeout=self.app.config['PASSWORD_HASH_QUEUE_TIMEOUT']):
+            raise PasswordHasherBusy()
+        try:
+            executor = self._get_executor()
+            if executor is None:
+                return function(*args)
+            return executor.submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+    def _get_executor(self):
+        workers = self.app.config['PASSWORD_HASH_WORKERS']
+        if workers <= 0:
+            return None
+        with self._executor_lock:
+            if self._executor is None:
+                # Forking a process that runs threads can copy held locks; spawn a clean one.
+                self._executor = ProcessPoolExecutor(max_workers=workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def stop(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
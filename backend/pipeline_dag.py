@@ -0,0 +1,238 @@
+"""
+Multi-step pipelines.
+
+A manifest with `steps` describes a DAG of other pipelines instead of a
+container of its own:
+
+    "steps": [
+        {"id": "qc", "pipeline": "fastqc", "for_each": "file"},
+        {"id": "trim", "pipeline": "trimmer", "needs": ["qc"], "inputs": ["input"], "for_each": "file"},
+        {"id": "assemble", "pipeline": "assembler", "inputs": ["trim.reads"]}
+    ]
+
+`inputs` says where the files of a step come from: `input` (the files of
+the job), `<step>` (every output of an earlier step) or `<step>.<output>`
+(one declared output of it). It defaults to the outputs of the steps in
+`needs`, or to the job's files for a step that needs nothing. A step with
+`"for_each": "file"` fans out into one run per input file; a step that
+takes its outputs fans back in and gets the outputs of all the runs.
+
+Each run of a step is a child `Job` (`parent_id`, `step`, `shard`) queued
+with the scheduler like any other job, so independent steps and shards run
+in parallel within the usual concurrency caps, and can be served from the
+result cache. The inputs of a run are the artifacts of earlier runs,
+hardlinked into its workspace rather than copied.
+
+A step starts once every run of the steps it needs has succeeded and had
+its outputs recorded. The parent job is 'running' until then. It fails as
+soon as any run does, cancelling the runs still queued, and succeeds when
+all steps have, with the outputs of the final steps as its own artifacts.
+"""
+import threading
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from . import db
+from . import pipeline_manager
+from .models import Artifact, CachedResult, Job
+from .signals import job_finished, job_outputs_ready
+from .workspace import unique_name
+
+# Statuses of step runs that have not finished yet.
+PENDING_STATUSES = ('queued', 'starting', 'running')
+
+
+def step_needs(step):
+    """Returns the ids of the steps that `step` has to wait for."""
+    needs = list(step.get('needs', []))
+    for source in step.get('inputs', []):
+        other = source.split('.')[0]
+        if source != 'input' and other not in needs:
+            needs.append(other)
+    return needs
+
+
+class DagExecutor:
+    """
+    Runs multi-step pipelines by queuing their steps as child jobs and
+    advancing them as the children finish. See the module docstring.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['dag'] = self
+        job_finished.connect(self._on_job_finished, sender=app)
+        job_outputs_ready.connect(self._on_job_outputs_ready, sender=app)
+
+    def start(self, job, pipeline):
+        """
+        Starts running a multi-step pipeline for `job` by queuing its first
+        steps. The steps of an earlier run are discarded. The caller commits.
+        """
+        for child in list(job.children):
+            job.children.remove(child)
+            self._discard(child)
+        Artifact.query.filter_by(job_id=job.id).delete()
+        job.exit_code = None
+        job.finished_at = None
+        job.outputs_ready = False
+
+        unavailable = [s['pipeline'] for s in pipeline['steps'] if not self._step_pipeline(s)]
+        if unavailable:
+            print(f"Error: Pipeline '{pipeline['id']}' has steps using unavailable pipelines: {unavailable}")
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+            return
+
+        job.status = 'running'
+        for step in pipeline['steps']:
+            if not step_needs(step) and not self._queue_step(job, step, {}):
+                print(f"Error: Step '{step['id']}' of job {job.id} has no input files.")
+                job.status = 'failed'
+                job.finished_at = datetime.utcnow()
+                for child in job.children:
+                    child.status = 'cancelled'
+                return
+
+    def resume(self):
+        """Advances every running multi-step job, e.g. after a restart. Must be called in an app context."""
+        for (job_id,) in db.session.query(Job.id).filter(Job.status == 'running', Job.children.any()).all():
+            self.advance(job_id)
+
+    def advance(self, job_id):
+        """
+        Queues the steps of a multi-step job that have become ready, or
+        finishes the job. Must be called in an app context.
+        """
+        with self._lock:
+            job = self._advance(job_id)
+        if job is not None:
+            job_finished.send(self.app, job=job)
+
+    def _advance(self, job_id):
+        # Other threads may have committed since this session last looked.
+        job = Job.query.filter_by(id=job_id).populate_existing().first()
+        if job is None or job.status != 'running':
+            return None
+        pipeline = pipeline_manager.get_pipeline(job.pipeline)
+        runs = Job.query.filter_by(parent_id=job.id).order_by(Job.shard).populate_existing().all()
+
+        if pipeline is None or not pipeline.get('steps'):
+            print(f"Error: Pipeline '{job.pipeline}' for job {job.id} is no longer a multi-step pipeline.")
+            return self._finish(job, 'failed')
+        failed = next((run for run in runs if run.status not in PENDING_STATUSES + ('succeeded',)), None)
+        if failed is not None:
+            return self._finish(job, 'failed', failed.exit_code)
+
+        runs_by_step = defaultdict(list)
+        for run in runs:
+            runs_by_step[run.step].append(run)
+        done = {step for step, step_runs in runs_by_step.items()
+                if all(run.status == 'succeeded' and run.outputs_ready for run in step_runs)}
+
+        queued = False
+        for step in pipeline['steps']:
+            if step['id'] in runs_by_step or not all(other in done for other in step_needs(step)):
+                continue
+            if not self._queue_step(job, step, runs_by_step):
+                print(f"Error: Step '{step['id']}' of job {job.id} has no input files.")
+                return self._finish(job, 'failed')
+            queued = True
+
+        if queued:
+            db.session.commit()
+            self.app.extensions['scheduler'].wake()
+        elif all(step['id'] in done for step in pipeline['steps']):
+            return self._finish(job, 'succeeded', 0, pipeline, runs_by_step)
+        return None
+
+    def _queue_step(self, job, step, runs_by_step):
+        """Adds the runs of a step as children of `job`. Returns how many there are."""
+        files = self._step_inputs(job, step, runs_by_step)
+        if not files:
+            return 0
+        shards = [[f] for f in files] if step.get('for_each') == 'file' else [files]
+        scheduler = self.app.extensions['scheduler']
+        for shard, shard_files in enumerate(shards):
+            child = Job(
+                id=str(uuid.uuid4()),
+                files=shard_files,
+                user_id=job.user_id,
+                data_submission_id=job.data_submission_id,
+                use_cache=job.use_cache,
+                step=step['id'],
+                shard=shard
+            )
+            scheduler.enqueue(child, step['pipeline'])
+            job.children.append(child)
+        return len(shards)
+
+    def _step_inputs(self, job, step, runs_by_step):
+        sources = step.get('inputs') or step.get('needs') or ['input']
+        files = []
+        for source in sources:
+            if source == 'input':
+                files.extend(job.files)
+                continue
+            step_id, _, output = source.partition('.')
+            shard_of = {run.id: run.shard for run in runs_by_step[step_id]}
+            artifacts = Artifact.query.filter(Artifact.job_id.in_(shard_of)).all()
+            for artifact in sorted(artifacts, key=lambda a: (shard_of[a.job_id], a.id)):
+                if not output or artifact.name == output:
+                    files.append({
+                        'original_filename': artifact.filename,
+                        'filepath': artifact.filepath,
+                        'sha256': artifact.sha256
+                    })
+        return files
+
+    def _finish(self, job, status, exit_code=None, pipeline=None, runs_by_step=None):
+        job.status = status
+        job.exit_code = exit_code
+        job.finished_at = datetime.utcnow()
+        if status == 'succeeded':
+            # The outputs of the final steps are the outputs of the job.
+            needed = {other for step in pipeline['steps'] for other in step_needs(step)}
+            taken = set()
+            for step in pipeline['steps']:
+                if step['id'] in needed:
+                    continue
+                shard_of = {run.id: run.shard for run in runs_by_step[step['id']]}
+                artifacts = Artifact.query.filter(Artifact.job_id.in_(shard_of)).all()
+                for artifact in sorted(artifacts, key=lambda a: (shard_of[a.job_id], a.id)):
+                    db.session.add(artifact.copy(job.id, unique_name(artifact.filename, taken)))
+            job.outputs_ready = True
+        else:
+            Job.query.filter_by(parent_id=job.id, status='queued').update(
+                {'status': 'cancelled', 'finished_at': job.finished_at}, synchronize_session=False
+            )
+        db.session.commit()
+        print(f"Multi-step job {job.id} {status}.")
+        return job
+
+    def _step_pipeline(self, step):
+        pipeline = pipeline_manager.get_pipeline(step['pipeline'])
+        # Steps run single containers; pipelines don't nest.
+        if pipeline is None or pipeline.get('steps'):
+            return None
+        return pipeline
+
+    def _discard(self, child):
+        CachedResult.query.filter_by(job_id=child.id).delete()
+        Artifact.query.filter_by(job_id=child.id).delete()
+        db.session.delete(child)
+
+    def _on_job_finished(self, app, job):
+        if job.parent_id:
+            self.advance(job.parent_id)
+
+    def _on_job_outputs_ready(self, app, job_id):
+        job = db.session.get(Job, job_id)
+        if job is not None and job.parent_id:
+            self.advance(job.parent_id)
@@ -1,8 +1,14 @@
 import os
 import json
-import docker
 from flask import current_app
-from .config import BASE_DIR, UPLOADS_DIR
+from . import workspace
+from .config import BASE_DIR
+from .docker_client import docker_sdk
+from .resources import pipeline_resources
+from .signals import job_finished
+
+# Label attached to every pipeline container, holding the id of its job.
+JOB_LABEL = 'pipeline-dashboard.job_id'
 
 def discover_pipelines(pipeline_dir=None):
     """
@@ -28,61 +34,74 @@ def discover_pipelines(pipeline_dir=None):
                     print(f"Warning: Could not parse manifest for pipeline '{pipeline_name}'.")
     return pipelines
 
-def run_pipeline(pipeline, job_id, filenames):
+def get_pipeline(pipeline_id):
+    """
+    Returns the manifest of an available pipeline, or None if there is no
+    pipeline with that id.
+    """
+    return current_app.extensions['pipelines'].get(pipeline_id)
+
+def run_pipeline(pipeline, job_id, filepaths, cpuset=None):
     """
-    Runs a pipeline in a Docker container.
+    Runs a pipeline in a Docker container. `filepaths` are the job's input
+    files, relative to the project root. The container gets the CPU and
+    memory limits of the pipeline and, if given, is pinned to `cpuset`.
     """
     if current_app.config.get('TESTING'):
         # In testing mode, create dummy files to avoid issues with real data
-        host_uploads_path = os.path.join(BASE_DIR, UPLOADS_DIR)
-        if not os.path.exists(host_uploads_path):
-            os.makedirs(host_uploads_path)
-
-        for filename in filenames:
-            filepath = os.path.join(host_uploads_path, filename)
-            with open(filepath, 'w') as f:
-                f.write(f"This is a dummy file for {filename}.")
+        for filepath in filepaths:
+            host_path = os.path.join(BASE_DIR, filepath)
+            os.makedirs(os.path.dirname(host_path), exist_ok=True)
+            # Existing files may be hardlinks into the blob store, so they
+            # must not be overwritten.
+            if not os.path.exists(host_path):
+                with open(host_path, 'w') as f:
+                    f.write(f"This is a dummy file for {os.path.basename(filepath)}.")
 
-    client = docker.from_env()
+    docker_manager = current_app.extensions['docker']
     image_name = pipeline.get('image_name', f"{pipeline['id']}-image")
 
-    # In a real app, you should handle image not found errors
-    try:
-        client.images.get(image_name)
-    except docker.errors.ImageNotFound:
+    if not docker_manager.has_image(image_name):
         print(f"Error: Docker image '{image_name}' not found.")
         # For this project, we assume images are pre-built.
         # You could add a call to build_pipelines here if you want to build on the fly.
         return None
 
-    # Path to the uploads directory on the host
-    host_uploads_path = os.path.join(BASE_DIR, UPLOADS_DIR)
-
-    # The container will have a corresponding /uploads volume
-    container_uploads_path = '/uploads'
-
-    # Create the volume mapping
-    volumes = {
-        host_uploads_path: {'bind': container_uploads_path, 'mode': 'rw'}
+    # The container only sees this job's inputs (read-only, under /uploads)
+    # and its own outputs directory. The command to run in the container
+    # is the list of input paths inside it.
+    volumes, container_filepaths = workspace.build_workspace(job_id, filepaths)
+    resources = pipeline_resources(pipeline, current_app.config)
+    limits = {
+        'mem_limit': resources['memory_limit'],
+        'memswap_limit': resources['memory_limit'],  # No swap, so memory-hungry jobs fail fast
+        'nano_cpus': int(resources['cpu_limit'] * 1e9)
     }
-
-    # The command to run in the container will be the list of filenames
-    # prefixed by their path in the container.
-    container_filepaths = [os.path.join(container_uploads_path, f) for f in filenames]
+    if cpuset:
+        limits['cpuset_cpus'] = cpuset
 
     try:
-        container = client.containers.run(
+        container = docker_manager.client.containers.run(
             image_name,
             command=container_filepaths,
             volumes=volumes,
-            detach=True  # Run in the background
+            environment={'OUTPUT_DIR': workspace.CONTAINER_OUTPUTS_PATH},
+            labels={JOB_LABEL: job_id},  # Lets the job tracker map container events back to the job
+            detach=True,  # Run in the background
+            **limits
         )
         print(f"Started container {container.id} for job {job_id}")
         # We return the container object itself. The view can get the ID.
         return container
-    except docker.errors.ContainerError as e:
+    except docker_sdk().errors.ContainerError as e:
         print(f"Error running container for job {job_id}: {e}")
         return None
     except Exception as e:
         print(f"An unexpected error occurred while running the pipeline: {e}")
         return None
+
+
+@job_finished.connect
+def remove_job_inputs(app, job):
+    """Drops a finished job's input links; its outputs are harvested by the artifact store."""
+    workspace.remove_inputs(job.id)
@@ -0,0 +1,258 @@
+import hashlib
+import json
+import os
+import threading
+from .config import BASE_DIR
+from .pipeline_manager import discover_pipelines
+from .resources import parse_memory
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:  # Optional; the watcher polls without it
+    INotify = None
+
+# Types allowed for the inputs and outputs declared in a manifest.
+INPUT_TYPES = ('file',)
+OUTPUT_TYPES = ('file', 'stdout')
+
+
+def validate_manifest(manifest):
+    """Returns a list of problems with a pipeline manifest; empty if it is valid."""
+    errors = []
+    if not isinstance(manifest.get('name'), str) or not manifest['name']:
+        errors.append("'name' must be a non-empty string")
+    for key in ('description', 'image_name'):
+        if key in manifest and not isinstance(manifest[key], str):
+            errors.append(f"'{key}' must be a string")
+    for key, types in (('inputs', INPUT_TYPES), ('outputs', OUTPUT_TYPES)):
+        entries = manifest.get(key, [])
+        if not isinstance(entries, list):
+            errors.append(f"'{key}' must be a list")
+            continue
+        for entry in entries:
+            if not isinstance(entry, dict) or not isinstance(entry.get('name'), str):
+                errors.append(f"every entry in '{key}' needs a 'name'")
+            elif entry.get('type') not in types:
+                errors.append(f"'{key}' entry '{entry['name']}' has unknown type {entry.get('type')!r}")
+    if 'max_concurrent' in manifest and (not isinstance(manifest['max_concurrent'], int) or manifest['max_concurrent'] < 1):
+        errors.append("'max_concurrent' must be a positive integer")
+    if 'cacheable' in manifest and not isinstance(manifest['cacheable'], bool):
+        errors.append("'cacheable' must be true or false")
+    if 'poolable' in manifest and not isinstance(manifest['poolable'], bool):
+        errors.append("'poolable' must be true or false")
+    if 'steps' in manifest:
+        errors.extend(_validate_steps(manifest['steps']))
+    if 'resources' in manifest:
+        errors.extend(_validate_resources(manifest['resources']))
+    return errors
+
+
+def _validate_resources(resources):
+    if not isinstance(resources, dict):
+        return ["'resources' must be an object"]
+    errors = []
+    parsed = {}
+    for kind in ('requests', 'limits'):
+        spec = resources.get(kind, {})
+        if not isinstance(spec, dict):
+            errors.append(f"'resources.{kind}' must be an object")
+            continue
+        if 'cpu' in spec:
+            cpu = spec['cpu']
+            if isinstance(cpu, bool) or not isinstance(cpu, (int, float)) or cpu <= 0:
+                errors.append(f"'resources.{kind}.cpu' must be a positive number")
+            else:
+                parsed[(kind, 'cpu')] = cpu
+        if 'memory' in spec:
+            try:
+                parsed[(kind, 'memory')] = parse_memory(spec['memory'])
+            except ValueError:
+                errors.append(f"'resources.{kind}.memory' must be a size such as '512m'")
+    for key in ('cpu', 'memory'):
+        if ('requests', key) in parsed and ('limits', key) in parsed and parsed[('limits', key)] < parsed[('requests', key)]:
+            errors.append(f"'resources.limits.{key}' must not be less than the request")
+    if 'pin_cpus' in resources and not isinstance(resources['pin_cpus'], bool):
+        errors.append("'resources.pin_cpus' must be true or false")
+    return errors
+
+
+def _validate_steps(steps):
+    # Steps may only refer to steps declared before them, which also rules out cycles.
+    if not isinstance(steps, list) or not steps:
+        return ["'steps' must be a non-empty list"]
+    errors = []
+    declared = set()
+    for step in steps:
+        if not isinstance(step, dict) or not isinstance(step.get('id'), str) or not step['id']:
+            errors.append("every step needs an 'id'")
+            continue
+        if step['id'] in declared:
+            errors.append(f"step '{step['id']}' is declared twice")
+        if not isinstance(step.get('pipeline'), str):
+            errors.append(f"step '{step['id']}' needs a 'pipeline'")
+        if step.get('for_each') not in (None, 'file'):
+            errors.append(f"step '{step['id']}' has unknown 'for_each' {step['for_each']!r}")
+        needs = step.get('needs', [])
+        sources = step.get('inputs', [])
+        if not isinstance(needs, list) or not isinstance(sources, list) or not all(isinstance(s, str) for s in sources):
+            errors.append(f"'needs' and 'inputs' of step '{step['id']}' must be lists of names")
+            continue
+        referenced = list(needs) + [s.split('.')[0] for s in sources if isinstance(s, str) and s != 'input']
+        for other in referenced:
+            if other not in declared:
+                errors.append(f"step '{step['id']}' refers to '{other}', which is not declared before it")
+        declared.add(step['id'])
+    return errors
+
+
+class PipelineRegistry:
+    """
+    The set of available pipelines, indexed by id.
+
+    Manifests are read from PIPELINES_DIR and validated; invalid ones are
+    skipped with a warning. A watcher thread reloads them when the
+    directory changes (with inotify if `inotify_simple` is installed,
+    otherwise by polling modification times). Each reload builds a new
+    index and swaps it in with a single assignment, so readers never see a
+    half-loaded registry. `etag` changes whenever the set of manifests does.
+
+    Nothing is read until the registry is first used, so building an app
+    for a test or a CLI command doesn't scan the directory.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.pipeline_dir = None
+        self._index = None
+        self._etag = None
+        self._signature = None
+        self._load_lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.pipeline_dir = os.path.join(BASE_DIR, app.config['PIPELINES_DIR'])
+        app.extensions['pipelines'] = self
+        self._index = None
+        self._etag = None
+
+    def get(self, pipeline_id):
+        return self._pipelines().get(pipeline_id)
+
+    def list(self):
+        return list(self._pipelines().values())
+
+    @property
+    def etag(self):
+        self._pipelines()
+        return self._etag
+
+    def load(self):
+        """Discovers the pipelines now rather than on first use."""
+        self._pipelines()
+
+    def _pipelines(self):
+        index = self._index
+        if index is None:
+            with self._load_lock:
+                if self._index is None:
+                    print("--- Initializing Pipelines ---")
+                    self.reload()
+                    if not self._index:
+                        print("Warning: No pipelines found. Check the 'pipelines' directory.")
+                    else:
+                        print(f"Found {len(self._index)} pipelines: {[p['name'] for p in self._index.values()]}")
+                index = self._index
+        return index
+
+    def reload(self):
+        """Rescans the pipelines directory. Returns True if anything changed."""
+        self._signature = self._scan_signature()
+        manifests = []
+        for manifest in discover_pipelines(self.pipeline_dir):
+            errors = validate_manifest(manifest)
+            if errors:
+                print(f"Warning: Ignoring invalid manifest for pipeline '{manifest['id']}': {'; '.join(errors)}.")
+            else:
+                manifests.append(manifest)
+        return self._swap(manifests)
+
+    def replace(self, manifests):
+        """Replaces the registry with the given manifests, e.g. in tests."""
+        for manifest in manifests:
+            errors = validate_manifest(manifest)
+            if errors:
+                raise ValueError(f"Invalid manifest for pipeline '{manifest.get('id')}': {'; '.join(errors)}")
+        return self._swap(manifests)
+
+    def _swap(self, manifests):
+        manifests = sorted(manifests, key=lambda m: m['id'])
+        etag = hashlib.sha256(json.dumps(manifests, sort_keys=True).encode()).hexdigest()[:32]
+        if etag == self._etag and self._index is not None:
+            return False
+        self._index = {m['id']: m for m in manifests}
+        self._etag = etag
+        return True
+
+    def _scan_signature(self):
+        # Cheap to compute: one listdir and a stat per manifest.
+        if not os.path.isdir(self.pipeline_dir):
+            return ()
+        signature = []
+        for name in sorted(os.listdir(self.pipeline_dir)):
+            try:
+                stat = os.stat(os.path.join(self.pipeline_dir, name, 'manifest.json'))
+                signature.append((name, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                pass
+        return tuple(signature)
+
+    def start(self):
+        """Starts watching the pipelines directory for changes."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        # The watcher compares against what was loaded.
+        self.load()
+        self._stopping.clear()
+        target = self._watch_inotify if INotify is not None else self._watch_polling
+        self._thread = threading.Thread(target=target, name='pipeline-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _reload_if_changed(self):
+        if self._scan_signature() == self._signature:
+            return
+        try:
+            if self.reload():
+                print(f"Reloaded pipelines: {sorted(self._index)}")
+        except Exception as e:
+            print(f"Error reloading pipelines: {e}")
+
+    def _watch_polling(self):
+        while not self._stopping.wait(self.app.config['PIPELINE_WATCH_INTERVAL']):
+            self._reload_if_changed()
+
+    def _watch_inotify(self):
+        inotify = INotify()
+        mask = (inotify_flags.CREATE | inotify_flags.DELETE | inotify_flags.MODIFY
+                | inotify_flags.MOVED_FROM | inotify_flags.MOVED_TO | inotify_flags.CLOSE_WRITE)
+        watched = set()
+        interval_ms = int(self.app.config['PIPELINE_WATCH_INTERVAL'] * 1000)
+        while not self._stopping.is_set():
+            # Pipeline subdirectories come and go, so keep the watch list current.
+            watched = {path for path in watched if os.path.isdir(path)}
+            subdirs = os.listdir(self.pipeline_dir) if os.path.isdir(self.pipeline_dir) else []
+            for path in [self.pipeline_dir] + [os.path.join(self.pipeline_dir, d) for d in subdirs]:
+                if path not in watched and os.path.isdir(path):
+                    inotify.add_watch(path, mask)
+                    watched.add(path)
+            if inotify.read(timeout=interval_ms, read_delay=100):
+                self._reload_if_changed()
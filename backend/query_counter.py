@@ -0,0 +1,33 @@
+"""A context manager counting SQL statements, for tests that pin down how many queries an endpoint runs."""
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """
+    Counts the statements executed on `engine` while active:
+
+        with QueryCounter(db.engine) as queries:
+            client.get('/api/members')
+        self.assertEqual(queries.count, 2)
+
+    `statements` holds their SQL, to show what ran when a count is off.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+        return False
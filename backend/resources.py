@@ -0,0 +1,141 @@
+"""
+CPU and memory for pipeline containers.
+
+A manifest can declare what its container needs and what it may use:
+
+    "resources": {
+        "requests": {"cpu": 1, "memory": "512m"},
+        "limits": {"cpu": 2, "memory": "1g"},
+        "pin_cpus": true
+    }
+
+Requests are reserved on the host's ledger, and the scheduler only starts
+a job whose requests fit in what is left. Limits default to the requests
+and are applied as cgroup limits when the container starts. With
+`pin_cpus` the container is given whole cores of its own, as many as its
+CPU limit rounds up to; other containers may use any core. Pipelines that
+declare nothing request JOB_DEFAULT_CPUS and JOB_DEFAULT_MEMORY.
+
+The first SCHEDULER_RESERVED_CPUS cores and SCHEDULER_RESERVED_MEMORY bytes
+are never handed to containers, so the web app isn't starved.
+"""
+import math
+import os
+import re
+
+_MEMORY_UNITS = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3, 't': 1024 ** 4}
+
+
+def parse_memory(value):
+    """Parses a memory size such as 512m, 2g or a number of bytes. Raises ValueError."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        size = value
+    else:
+        match = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?', str(value).strip().lower())
+        if not match:
+            raise ValueError(f"invalid memory size {value!r}")
+        size = float(match.group(1)) * _MEMORY_UNITS[match.group(2)]
+    if size <= 0:
+        raise ValueError(f"invalid memory size {value!r}")
+    return int(size)
+
+
+def pipeline_resources(pipeline, config):
+    """Returns the requests and limits of a pipeline, with the defaults filled in."""
+    declared = (pipeline or {}).get('resources', {})
+    requests = declared.get('requests', {})
+    limits = declared.get('limits', {})
+    # Like Kubernetes, a pipeline that only declares limits requests as much.
+    cpu = float(requests.get('cpu', limits.get('cpu', config['JOB_DEFAULT_CPUS'])))
+    memory = parse_memory(requests.get('memory', limits.get('memory', config['JOB_DEFAULT_MEMORY'])))
+    return {
+        'cpu': cpu,
+        'memory': memory,
+        'cpu_limit': float(limits.get('cpu', cpu)),
+        'memory_limit': parse_memory(limits.get('memory', memory)),
+        'pin_cpus': declared.get('pin_cpus', False)
+    }
+
+
+def host_cores(config):
+    """Returns the cores containers may run on."""
+    cpus = config['HOST_CPUS'] or os.cpu_count() or 1
+    reserved = min(config['SCHEDULER_RESERVED_CPUS'], cpus - 1)
+    return list(range(reserved, cpus))
+
+
+def host_memory(config):
+    """Returns the memory containers may use, or None if it is unknown."""
+    total = config['HOST_MEMORY']
+    if total:
+        total = parse_memory(total)
+    else:
+        try:
+            total = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+        except (AttributeError, ValueError, OSError):
+            return None
+    return max(total - parse_memory(config['SCHEDULER_RESERVED_MEMORY']), 0)
+
+
+def format_cpuset(cores):
+    return ','.join(str(core) for core in sorted(cores))
+
+
+def parse_cpuset(cpuset):
+    return {int(core) for core in cpuset.split(',')} if cpuset else set()
+
+
+class ResourceLedger:
+    """
+    What is left of the host once the requests of the active jobs are
+    reserved. The scheduler rebuilds it from the `Job` table for every
+    claim, so it always agrees with what is actually running.
+    """
+
+    def __init__(self, config):
+        self.cores = host_cores(config)
+        self.cpu = float(len(self.cores))
+        self.total_memory = host_memory(config)
+        self.memory = self.total_memory
+        self.pinned = set()
+
+    def _requests(self, resources):
+        # A job asking for more than the whole host can still run, alone.
+        cpu = min(resources['cpu'], len(self.cores))
+        memory = resources['memory']
+        if self.total_memory is not None:
+            memory = min(memory, self.total_memory)
+        return cpu, memory
+
+    def reserve(self, resources, cpuset=None):
+        """Records what an active job holds."""
+        cpu, memory = self._requests(resources)
+        self.cpu -= cpu
+        if self.memory is not None:
+            self.memory -= memory
+        if resources['pin_cpus']:
+            self.pinned |= parse_cpuset(cpuset)
+
+    def hold(self, memory):
+        """Records memory held outside of any job, such as by an idle warm container."""
+        if self.memory is not None:
+            self.memory -= memory
+
+    def place(self, resources):
+        """
+        Returns the cpuset a job should run with if its requests fit, or
+        None if they don't.
+        """
+        cpu, memory = self._requests(resources)
+        if cpu > self.cpu + 1e-9:
+            return None
+        if self.memory is not None and memory > self.memory:
+            return None
+        # Cores pinned to other jobs are theirs alone, whether this job is pinned or not.
+        free = [core for core in self.cores if core not in self.pinned]
+        if not resources['pin_cpus']:
+            return format_cpuset(free) if free and len(free) >= cpu else None
+        count = min(math.ceil(resources['cpu_limit']), len(self.cores))
+        if len(free) < count:
+            return None
+        return format_cpuset(free[:count])
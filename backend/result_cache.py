@@ -0,0 +1,115 @@
+import hashlib
+import json
+from datetime import datetime
+from . import db
+from .models import CachedResult, Job
+from .signals import job_finished, job_outputs_ready
+from . import workspace
+
+
+class ResultCache:
+    """
+    Reuses the results of identical pipeline runs.
+
+    A run is identified by the pipeline, the id (content digest) of its
+    resolved Docker image, the user who submitted it and the name and
+    SHA-256 of each input file, in order. The names are the container's
+    arguments and can show up in its logs and outputs. Results are only
+    reused for the same user, since a cached job shares its logs.
+    When a job with a known key is dispatched, it is completed on the spot:
+    it points at the cached job (`Job.cached_from`) for its logs and gets
+    copies of its artifact records, which refer to the same stored files.
+
+    A successful job becomes a cache entry once its outputs are harvested.
+    Entries are evicted least recently used first when there are more than
+    RESULT_CACHE_MAX_ENTRIES of them. The outputs belong to the jobs, not
+    the cache, so evicting an entry frees no disk space; it only stops the
+    results from being reused. A job submitted with `use_cache` off always
+    runs, and a manifest can opt out with `"cacheable": false`.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['result_cache'] = self
+        job_outputs_ready.connect(self._on_job_outputs_ready, sender=app)
+
+    def key_for(self, job, pipeline):
+        """Returns the cache key for running `job` with `pipeline`, or None if it can't be cached."""
+        if not self.app.config['RESULT_CACHE_ENABLED'] or pipeline.get('cacheable') is False:
+            return None
+        input_hashes = [f.get('sha256') for f in job.files]
+        if not all(input_hashes):
+            return None
+        image_name = pipeline.get('image_name', f"{pipeline['id']}-image")
+        image_id = self.app.extensions['docker'].image_id(image_name)
+        if image_id is None:
+            return None
+        filepaths = [f['filepath'] for f in job.files]
+        key = json.dumps([pipeline['id'], image_id, job.user_id, workspace.input_names(filepaths), input_hashes])
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def complete_from_cache(self, job, pipeline):
+        """
+        Looks up a claimed job in the cache. On a hit, completes the job
+        from the cached results, commits and returns True. On a miss,
+        records the key on the job for later and returns False.
+        """
+        try:
+            key = self.key_for(job, pipeline)
+        except Exception as e:
+            print(f"Could not compute the cache key for job {job.id}: {e}")
+            key = None
+        if key is None:
+            return False
+        job.cache_key = key
+
+        entry = db.session.get(CachedResult, job.cache_key) if job.use_cache else None
+        if entry is None:
+            db.session.commit()
+            return False
+
+        source = db.session.get(Job, entry.job_id)
+        for artifact in source.artifacts:
+            db.session.add(artifact.copy(job.id))
+        job.cached_from = source.id
+        job.outputs_ready = True
+        job.status = 'succeeded'
+        job.exit_code = source.exit_code
+        job.finished_at = datetime.utcnow()
+        entry.hits += 1
+        entry.last_used_at = job.finished_at
+        db.session.commit()
+        print(f"Job {job.id} completed from the results of job {source.id}.")
+
+        job_finished.send(self.app, job=job)
+        return True
+
+    def _on_job_outputs_ready(self, app, job_id):
+        job = db.session.get(Job, job_id)
+        if job is None or job.status != 'succeeded' or not job.cache_key or job.cached_from:
+            return
+        if db.session.get(CachedResult, job.cache_key) is not None:
+            return
+        db.session.add(CachedResult(
+            key=job.cache_key,
+            job_id=job.id,
+            pipeline=job.pipeline,
+            size=sum(a.size for a in job.artifacts)
+        ))
+        db.session.commit()
+        self.evict()
+
+    def evict(self):
+        """Drops least recently used entries until there are at most RESULT_CACHE_MAX_ENTRIES."""
+        excess = CachedResult.query.count() - self.app.config['RESULT_CACHE_MAX_ENTRIES']
+        if excess <= 0:
+            return 0
+        for entry in CachedResult.query.order_by(CachedResult.last_used_at).limit(excess):
+            db.session.delete(entry)
+        db.session.commit()
+        return excess
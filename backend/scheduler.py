@@ -0,0 +1,214 @@
+import threading
+from collections import Counter
+from sqlalchemy import func
+from . import db
+from . import pipeline_manager
+from .models import Job
+from .resources import ResourceLedger, pipeline_resources
+
+# Job statuses that count against the concurrency caps.
+ACTIVE_STATUSES = ('starting', 'running')
+
+
+def _active():
+    # A job running a multi-step pipeline has no container; only its steps count.
+    return Job.status.in_(ACTIVE_STATUSES) & ~Job.children.any()
+
+
+class JobScheduler:
+    """
+    Dispatches queued jobs to pipeline containers.
+
+    The `Job` table is the queue: views mark a job as 'queued' and call
+    `wake()`. A pool of dispatcher threads claims queued jobs one at a time
+    and starts their containers, as long as the global and per-pipeline
+    concurrency caps allow it and the CPU and memory the pipeline requests
+    are free on the host (see resources.py).
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._threads = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['scheduler'] = self
+
+    @property
+    def running(self):
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self):
+        """Starts the dispatcher threads, if they are not already running."""
+        if self.running:
+            return
+        self._stopping.clear()
+        self._threads = []
+        for i in range(self.app.config['SCHEDULER_WORKERS']):
+            thread = threading.Thread(target=self._worker, name=f"job-dispatcher-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"Started {len(self._threads)} job dispatcher(s).")
+
+    def stop(self, timeout=None):
+        """Signals the dispatcher threads to exit and waits for them."""
+        self.drain()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def drain(self):
+        """Signals the dispatcher threads to exit once the launch they are in is done, without waiting."""
+        self._stopping.set()
+        self.wake()
+
+    def wake(self):
+        """Tells idle dispatchers that new work may be available."""
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def enqueue(self, job, pipeline_id):
+        """Marks a job as queued for the given pipeline. The caller commits."""
+        job.pipeline = pipeline_id
+        job.container_id = None
+        pipeline = pipeline_manager.get_pipeline(pipeline_id)
+        if pipeline and pipeline.get('steps'):
+            # A multi-step pipeline queues its steps as child jobs instead.
+            self.app.extensions['dag'].start(job, pipeline)
+        else:
+            job.status = 'queued'
+
+    def _worker(self):
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    dispatched = self.dispatch_next()
+            except Exception as e:
+                print(f"Error in job dispatcher: {e}")
+                dispatched = False
+
+            if not dispatched:
+                with self._wakeup:
+                    self._wakeup.wait(self.app.config['SCHEDULER_POLL_INTERVAL'])
+
+    def dispatch_next(self):
+        """
+        Claims the next eligible queued job and starts its container.
+        Returns True if a job was claimed. Must be called in an app context.
+        """
+        job = self._claim_next()
+        if job is None:
+            return False
+
+        pipeline = pipeline_manager.get_pipeline(job.pipeline)
+        result_cache = self.app.extensions.get('result_cache')
+        if pipeline is not None and result_cache and result_cache.complete_from_cache(job, pipeline):
+            self.wake()
+            return True
+
+        pool = self.app.extensions.get('container_pool')
+        if pipeline is not None and pool and pool.handles(pipeline) and pool.submit(job, pipeline):
+            # As below, the job may already have finished in its warm container.
+            Job.query.filter_by(id=job.id, status='starting').update({'status': 'running'}, synchronize_session=False)
+            db.session.commit()
+            return True
+
+        container = None
+        if pipeline is None:
+            print(f"Error: Pipeline '{job.pipeline}' for job {job.id} is no longer available.")
+        else:
+            filepaths = [f['filepath'] for f in job.files]
+            try:
+                container = pipeline_manager.run_pipeline(pipeline, job.id, filepaths, job.cpuset)
+            except Exception as e:
+                print(f"Error launching job {job.id}: {e}")
+
+        if container is None:
+            job.status = 'failed'
+            db.session.commit()
+            return True
+
+        # The job tracker may already have seen the container start or even
+        # exit, so only move the job to 'running' if it is still starting.
+        Job.query.filter_by(id=job.id).update({'container_id': container.id}, synchronize_session=False)
+        Job.query.filter_by(id=job.id, status='starting').update({'status': 'running'}, synchronize_session=False)
+        db.session.commit()
+        return True
+
+    def _claim_next(self):
+        # The lock serialises claims within this process; the conditional
+        # UPDATE below keeps claims safe across processes.
+        with self._lock:
+            config = self.app.config
+            active_jobs = db.session.query(Job.pipeline, Job.cpuset).filter(_active()).all()
+            active = Counter(pipeline_id for pipeline_id, _ in active_jobs)
+            if len(active_jobs) >= config['SCHEDULER_MAX_RUNNING']:
+                db.session.rollback()
+                return None
+
+            ledger = self.ledger(active_jobs)
+            # Pipelines at their cap, or whose requests don't fit on the host right now.
+            queued_pipelines = [p for (p,) in db.session.query(Job.pipeline).filter(Job.status == 'queued').distinct()]
+            excluded = [p for p in queued_pipelines
+                        if active[p] >= self._pipeline_limit(p) or ledger.place(self._resources(p)) is None]
+            query = Job.query.filter(Job.status == 'queued')
+            if excluded:
+                query = query.filter(Job.pipeline.notin_(excluded))
+
+            if config['SCHEDULER_POLICY'] == 'fair':
+                # Users with the fewest active jobs go first; FIFO within a user.
+                per_user = (
+                    db.session.query(Job.user_id, func.count(Job.id).label('active'))
+                    .filter(_active())
+                    .group_by(Job.user_id)
+                    .subquery()
+                )
+                query = query.outerjoin(per_user, per_user.c.user_id == Job.user_id).order_by(
+                    func.coalesce(per_user.c.active, 0), Job.created_at, Job.id
+                )
+            else:
+                query = query.order_by(Job.created_at, Job.id)
+
+            job = query.first()
+            if job is None:
+                db.session.rollback()
+                return None
+
+            claimed = Job.query.filter_by(id=job.id, status='queued').update(
+                {'status': 'starting', 'cpuset': ledger.place(self._resources(job.pipeline))},
+                synchronize_session=False
+            )
+            db.session.commit()
+            if not claimed:
+                return None
+            db.session.refresh(job)
+            return job
+
+    def ledger(self, active_jobs=None):
+        """
+        Returns what is left of the host after the active jobs and the idle
+        warm containers. Must be called in an app context.
+        """
+        if active_jobs is None:
+            active_jobs = db.session.query(Job.pipeline, Job.cpuset).filter(_active()).all()
+        ledger = ResourceLedger(self.app.config)
+        for pipeline_id, cpuset in active_jobs:
+            ledger.reserve(self._resources(pipeline_id), cpuset)
+        pool = self.app.extensions.get('container_pool')
+        if pool is not None:
+            ledger.hold(pool.idle_memory())
+        return ledger
+
+    def _resources(self, pipeline_id):
+        return pipeline_resources(pipeline_manager.get_pipeline(pipeline_id), self.app.config)
+
+    def _pipeline_limit(self, pipeline_id):
+        pipeline = pipeline_manager.get_pipeline(pipeline_id)
+        if pipeline and pipeline.get('max_concurrent'):
+            return int(pipeline['max_concurrent'])
+        return self.app.config['SCHEDULER_PIPELINE_MAX_RUNNING']
@@ -0,0 +1,39 @@
+"""
+Loading for the list endpoints.
+
+Each `to_dict` reads a known set of columns and relationships. The loader
+options here load exactly those, relationships included, in the query
+that fetches the list, so a list serializes in a fixed number of queries
+however long it is. Columns a `to_dict` doesn't read are never loaded, and
+anything not declared here raises instead of being lazy-loaded row by row:
+a `to_dict` that starts reading something new has to be declared here, or
+its endpoint's tests fail.
+"""
+from . import db
+from .models import Artifact, DataSubmission, Job, LabMember, Project, Skill
+
+# Loader options per model, for a list of its rows and what they show.
+PROJECT_LIST = (
+    db.load_only(Project.id, Project.project_name, Project.project_lead, Project.start_date,
+                 Project.status, Project.sequencing_method, raiseload=True),
+    db.raiseload('*'),
+)
+SUBMISSION_LIST = (
+    db.joinedload(DataSubmission.project).load_only(Project.project_name, raiseload=True),
+    db.raiseload('*'),
+)
+MEMBER_LIST = (
+    db.selectinload(LabMember.skills).load_only(Skill.name, raiseload=True),
+    db.raiseload('*'),
+)
+JOB_LIST = (
+    db.selectinload(Job.inputs),
+    db.selectinload(Job.artifacts).load_only(Artifact.job_id, Artifact.name, Artifact.filename, Artifact.size,
+                                             Artifact.sha256, Artifact.mime_type, raiseload=True),
+    db.raiseload('*'),
+)
+
+
+def serialize(query, options):
+    """Runs `query` with the given loader options and returns its rows as dicts."""
+    return [row.to_dict() for row in query.options(*options)]
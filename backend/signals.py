@@ -0,0 +1,13 @@
+from blinker import Namespace
+
+_signals = Namespace()
+
+# Sent by the job tracker, with the app as sender, after a job has moved to
+# a final status (succeeded, failed, oom-killed) and been committed.
+# Receivers get the Job as `job` and run inside an app context.
+job_finished = _signals.signal('job-finished')
+
+# Sent by the artifact store, with the app as sender, once the outputs of a
+# finished job have been harvested (even if there were none). Receivers get
+# the job id as `job_id` and run inside an app context.
+job_outputs_ready = _signals.signal('job-outputs-ready')
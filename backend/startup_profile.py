@@ -0,0 +1,45 @@
+"""
+Reports where the time to build the app goes.
+
+With STARTUP_PROFILE=1 in the environment, `create_app` prints how long
+importing the backend took and how long each step of building the app took:
+
+    STARTUP_PROFILE=1 python init_db.py
+
+For the cost of each imported module, use `python -X importtime`.
+"""
+import time
+from contextlib import contextmanager
+from . import IMPORT_STARTED
+
+# Only the first app built in a process pays for the imports.
+_imports_reported = False
+
+
+class StartupProfile:
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.imports = self.started - IMPORT_STARTED
+        self.steps = []
+
+    @contextmanager
+    def step(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((name, time.perf_counter() - started))
+
+    def report(self):
+        global _imports_reported
+        if not self.enabled:
+            return
+        total = time.perf_counter() - self.started
+        print("--- Startup Profile ---")
+        if not _imports_reported:
+            print(f"{'importing the backend':<40} {self.imports * 1000:8.1f} ms")
+            _imports_reported = True
+        for name, seconds in self.steps:
+            print(f"{name:<40} {seconds * 1000:8.1f} ms")
+        print(f"{'building the app':<40} {total * 1000:8.1f} ms")
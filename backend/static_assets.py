@@ -0,0 +1,200 @@
+"""
+Serves the files of the frontend from memory.
+
+The files under STATIC_ASSETS_DIR are read once into a manifest keyed by
+their path. Each entry holds the file's bytes, a strong ETag made
+from its SHA-256, and gzip and (if the `brotli` module is installed)
+brotli versions compressed ahead of time. A request then costs a dictionary
+lookup: no filesystem probes and no compression on the request thread.
+
+Responses carry the ETag, so a browser revalidating an unchanged file gets
+a 304. A name that contains a content hash, as a bundler writes them
+(`index-3f2a9c1b.js`, `index-BKl8LzKm.js`), can never change, so it is
+cached for a year with `immutable`. Anything else, such as the HTML pages,
+is `no-cache`: the browser may keep it but asks first. If the build wrote
+a Vite manifest (`.vite/manifest.json`), the files it lists are the
+hashed ones; otherwise they are told apart by their names.
+
+The manifest is built on first use, which a server does at startup (an
+app built for a test or a CLI command usually never serves a file).
+Files larger than STATIC_ASSETS_MAX_MEMORY_BYTES are only hashed and are
+served from disk. The manifest doesn't follow changes to the directory;
+restart the server (or call `reload()`) after a new frontend build.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import threading
+from flask import Response, abort, request, send_file
+from .config import BASE_DIR
+
+try:
+    import brotli
+except ImportError:  # Optional; assets are only gzipped without it
+    brotli = None
+
+# Directories under the frontend that are never served.
+SKIPPED_DIRS = {'node_modules'}
+# Types worth compressing; images and fonts are compressed already.
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'application/xml', 'image/svg+xml')
+# A name with a content hash right before the extension: '-' or '.' and 8-20 hex digits
+# (some of them numbers), or '-' and 8 base64 characters (some upper case) as Vite writes them.
+FINGERPRINTED = re.compile(r'(?:[.-](?=[0-9a-f]*\d)[0-9a-f]{8,20}|-(?=\w*[A-Z])[A-Za-z0-9_]{8})\.\w+$')
+# Where Vite writes its manifest of the files it built, under the output directory.
+BUNDLER_MANIFESTS = ('.vite/manifest.json', 'manifest.json')
+# Cache-Control for files whose name changes with their content, and for the rest
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+# Encodings in order of preference.
+ENCODINGS = ('br', 'gzip')
+
+
+def is_fingerprinted(name):
+    return FINGERPRINTED.search(os.path.basename(name)) is not None
+
+
+def _compressible(mimetype):
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+class Asset:
+    """One file of the frontend, as it is served."""
+
+    def __init__(self, filename, name, data=None, digest=None, fingerprinted=False):
+        self.filename = filename
+        self.mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        self.etag = digest[:32]
+        self.cache_control = IMMUTABLE if fingerprinted else REVALIDATE
+        # Encoding -> body; None is the file as it is. Empty for files served from disk.
+        self.bodies = {None: data} if data is not None else {}
+
+    def compress(self, min_bytes):
+        data = self.bodies.get(None)
+        if data is None or len(data) < min_bytes or not _compressible(self.mimetype):
+            return
+        candidates = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            candidates['br'] = brotli.compress(data, quality=11)
+        for encoding, body in candidates.items():
+            # Keep a variant only if it is worth the decoding.
+            if len(body) < len(data):
+                self.bodies[encoding] = body
+
+
+class StaticAssets:
+    """An in-memory manifest of the frontend's files. See the module docstring."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.root = None
+        self._assets = None
+        self._load_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.root = os.path.join(BASE_DIR, app.config['STATIC_ASSETS_DIR'])
+        app.extensions['static_assets'] = self
+        self._assets = None
+
+    def load(self):
+        """Builds the manifest now rather than on first use."""
+        self._manifest()
+
+    def _manifest(self):
+        assets = self._assets
+        if assets is None:
+            with self._load_lock:
+                if self._assets is None:
+                    print(f"Loaded {self.reload()} static assets from {self.root}")
+                assets = self._assets
+        return assets
+
+    def reload(self):
+        """Reads the frontend's files into a new manifest. Returns how many there are."""
+        max_memory = self.app.config['STATIC_ASSETS_MAX_MEMORY_BYTES']
+        min_compress = self.app.config['STATIC_ASSETS_MIN_COMPRESS_BYTES']
+        hashed = self._bundled_files()
+        assets = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d not in SKIPPED_DIRS and not d.startswith('.')]
+            for filename in filenames:
+                if filename.startswith('.'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                fingerprinted = name in hashed if hashed is not None else is_fingerprinted(name)
+                try:
+                    assets[name] = self._read(path, name, fingerprinted, max_memory, min_compress)
+                except OSError as e:
+                    print(f"Warning: could not read static asset {name}: {e}")
+        # Requests in flight keep the manifest they started with.
+        self._assets = assets
+        return len(assets)
+
+    def _bundled_files(self):
+        # The files named in the bundler's manifest, or None if there is no manifest.
+        for manifest in BUNDLER_MANIFESTS:
+            try:
+                with open(os.path.join(self.root, manifest)) as f:
+                    chunks = json.load(f)
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError) as e:
+                print(f"Warning: could not read the bundler manifest {manifest}: {e}")
+                continue
+            files = set()
+            for chunk in chunks.values():
+                files.add(chunk['file'])
+                files.update(chunk.get('css', []))
+                files.update(chunk.get('assets', []))
+            return files
+        return None
+
+    def _read(self, path, name, fingerprinted, max_memory, min_compress):
+        if os.path.getsize(path) > max_memory:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            return Asset(path, name, digest=digest.hexdigest(), fingerprinted=fingerprinted)
+        with open(path, 'rb') as f:
+            data = f.read()
+        asset = Asset(path, name, data=data, digest=hashlib.sha256(data).hexdigest(), fingerprinted=fingerprinted)
+        asset.compress(min_compress)
+        return asset
+
+    def __contains__(self, name):
+        return name in self._manifest()
+
+    def __len__(self):
+        return len(self._manifest())
+
+    def response(self, name):
+        """Returns the response for a file of the frontend, or a 304 if the client has it. 404s if there is none."""
+        asset = self._manifest().get(name)
+        if asset is None:
+            abort(404)
+        if not asset.bodies:
+            response = send_file(asset.filename, mimetype=asset.mimetype, etag=asset.etag, max_age=None)
+        else:
+            encoding = self._negotiate(asset)
+            response = Response(asset.bodies[encoding], mimetype=asset.mimetype)
+            if encoding is not None:
+                response.headers['Content-Encoding'] = encoding
+            # Each encoding is a different representation, so it needs its own strong ETag.
+            response.set_etag(f'{asset.etag}-{encoding}' if encoding else asset.etag)
+            if len(asset.bodies) > 1:
+                response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = asset.cache_control
+        return response.make_conditional(request)
+
+    def _negotiate(self, asset):
+        for encoding in ENCODINGS:
+            if encoding in asset.bodies and request.accept_encodings[encoding]:
+                return encoding
+        return None
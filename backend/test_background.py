@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+from backend.app import create_app
+from backend.background import BackgroundServices
+from backend.database import TEST_DATABASE_URL
+from backend.models import db
+from backend.extensions import job_events
+
+
+class TestBackgroundServices(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+            'BACKGROUND_LOCK_FILE': os.path.join(self.tmp, 'background.lock'),
+            'BACKGROUND_ELECTION_INTERVAL': 0.05,
+            'SCHEDULER_AUTOSTART': False,
+            'JOB_TRACKER_AUTOSTART': False,
+            'PIPELINE_WATCH_AUTOSTART': False,
+            'JOB_EVENTS_KEEPALIVE': 0.05
+        })
+
+    def tearDown(self):
+        job_events.stop()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        shutil.rmtree(self.tmp)
+
+    def test_one_worker_leads_and_another_takes_over(self):
+        # Two workers of one server, as far as the lock file is concerned.
+        first, second = BackgroundServices(self.app), BackgroundServices(self.app)
+        first.start()
+        second.start()
+        try:
+            self.assertTrue(first.leader)
+            self.assertFalse(second.leader)
+            with open(self.app.config['BACKGROUND_LOCK_FILE']) as f:
+                self.assertEqual(f.read().strip(), str(os.getpid()))
+
+            first.stop()
+            deadline = time.monotonic() + 5
+            while not second.leader and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(second.leader)
+        finally:
+            first.stop()
+            second.stop()
+
+    def test_stop_shares_one_deadline(self):
+        services = BackgroundServices(self.app)
+        services.leader = True
+        timeouts = {}
+
+        def slow_stop(name):
+            def stop(timeout=None):
+                timeouts[name] = timeout
+                time.sleep(0.1)
+            return stop
+
+        with mock.patch.dict(self.app.extensions, {
+            name: mock.Mock(stop=slow_stop(name))
+            for name in ('scheduler', 'container_pool', 'job_tracker', 'job_logs', 'pipelines', 'job_events')
+        }):
+            services.stop(timeout=0.25)
+
+        # Each service gets what the ones before it left over.
+        self.assertLessEqual(timeouts['scheduler'], 0.25)
+        self.assertLess(timeouts['container_pool'], 0.16)
+        self.assertLess(timeouts['job_tracker'], 0.06)
+        self.assertEqual(timeouts['job_logs'], 0)
+        self.assertEqual(timeouts['job_events'], 0)
+
+    def test_drain_ends_event_streams(self):
+        services = BackgroundServices(self.app)
+        subscription = job_events.subscribe(1)
+        stream = job_events.stream(subscription)
+        self.assertEqual(next(stream), ": keepalive\n\n")
+        services.drain()
+        # The stream ends without a reset, so the client just reconnects.
+        self.assertEqual(list(stream), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import errno
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from unittest import mock
+from backend.app import create_app
+from backend.database import TEST_DATABASE_URL
+from backend.config import BASE_DIR
+from backend.models import db, Blob, DataSubmission, Job, Project, User
+from backend.extensions import blobs
+
+
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.uploads_dir = tempfile.mkdtemp()
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+            'UPLOADS_DIR': self.uploads_dir
+        })
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            user = User(username='testuser', email='test@test.com', password_hash='x')
+            db.session.add(user)
+            db.session.add(Project(id='P1', project_name='P1', project_lead='Lead',
+                                   start_date=date(2024, 1, 1), status='Active'))
+            db.session.commit()
+            db.session.add(DataSubmission(id=1, name='S1', project_id='P1', sample_ids='s1',
+                                          extraction_date=date(2024, 1, 1), extracted_by='me',
+                                          extraction_method='kit', sequencing_method='WGS',
+                                          submitted_to='facility', submission_date=date(2024, 1, 1),
+                                          user_id=user.id, uploaded_files='[]'))
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        shutil.rmtree(self.uploads_dir)
+
+    def create_job(self, content):
+        response = self.client.post('/api/submissions/1/create-job', data={
+            'files': (io.BytesIO(content), 'reads.fastq')
+        })
+        self.assertEqual(response.status_code, 200)
+        with self.app.app_context():
+            return db.session.get(Job, response.json['jobId']).files[0]
+
+    def test_files_on_another_filesystem_are_copied_into_the_store(self):
+        path = os.path.join(self.uploads_dir, 'report.txt')
+        with open(path, 'wb') as f:
+            f.write(b'report')
+        cross_device = OSError(errno.EXDEV, 'Invalid cross-device link')
+        with self.app.app_context(), mock.patch('backend.blob_store.os.link', side_effect=cross_device):
+            sha256 = blobs.ingest(path)
+            with open(blobs.blob_path(sha256), 'rb') as f:
+                self.assertEqual(f.read(), b'report')
+            # Ingesting it again finds the blob and leaves the file be.
+            self.assertEqual(blobs.ingest(path), sha256)
+        self.assertTrue(os.path.exists(path))
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.create_job(b'ACGT' * 100)
+        second = self.create_job(b'ACGT' * 100)
+
+        self.assertNotEqual(first['filepath'], second['filepath'])
+        self.assertEqual(first['sha256'], second['sha256'])
+        self.assertTrue(os.path.samefile(os.path.join(BASE_DIR, first['filepath']),
+                                         os.path.join(BASE_DIR, second['filepath'])))
+        with self.app.app_context():
+            self.assertEqual(db.session.get(Blob, first['sha256']).ref_count, 2)
+
+    def test_garbage_collection_removes_unreferenced_blobs(self):
+        kept = self.create_job(b'kept')
+        dropped = self.create_job(b'dropped')
+        with self.app.app_context():
+            job = Job.using_file(sha256=dropped['sha256']).one()
+            blobs.release(job.files)
+            db.session.delete(job)
+            db.session.commit()
+
+            self.assertEqual(blobs.collect_garbage(grace_period=0), 1)
+            self.assertIsNone(db.session.get(Blob, dropped['sha256']))
+            self.assertEqual(db.session.get(Blob, kept['sha256']).ref_count, 1)
+        self.assertFalse(os.path.exists(os.path.join(BASE_DIR, dropped['filepath'])))
+        self.assertFalse(os.path.exists(blobs.blob_path(dropped['sha256'])))
+        self.assertTrue(os.path.exists(os.path.join(BASE_DIR, kept['filepath'])))
+
+
+if __name__ == '__main__':
+    unittest.main()
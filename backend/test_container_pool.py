@@ -0,0 +1,134 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from backend.app import create_app
+from backend.database import TEST_DATABASE_URL
+from backend.container_pool import IDLE_COMMAND
+from backend.models import db, Job, User
+from backend.extensions import artifacts, container_pool, docker_manager, job_logs, pipeline_registry, scheduler
+from backend.fake_docker import FakeDockerClient
+
+
+def count_words(container, cmd, environment):
+    """Stands in for the word-counter image: counts the words of each input."""
+    counts = [len(container.files[path].split()) for path in cmd if path.startswith('/uploads/')]
+    container.files[f"{environment['OUTPUT_DIR']}/counts.txt"] = str(sum(counts)).encode()
+    return 0, f"{counts}\n".encode()
+
+
+class TestContainerPool(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+            'SCHEDULER_AUTOSTART': False,
+            'JOB_TRACKER_AUTOSTART': False,
+            'HOST_CPUS': 4,
+            'UPLOADS_DIR': os.path.join(self.tmp_dir, 'uploads'),
+            'WORKSPACES_DIR': os.path.join(self.tmp_dir, 'workspaces'),
+            'LOGS_DIR': os.path.join(self.tmp_dir, 'logs')
+        })
+        pipeline_registry.replace([{
+            'id': 'word-counter', 'name': 'Word Counter', 'image_name': 'word-counter-image', 'poolable': True,
+            'outputs': [{'name': 'counts', 'type': 'file'}]
+        }])
+        self.fake = FakeDockerClient(images=['word-counter-image'])
+        self.fake.images.entrypoints['word-counter-image'] = ['./process.sh']
+        self.fake.exec_handler = count_words
+        docker_manager.set_client(self.fake)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.session.add(User(id=1, username='alice', email='alice@test.com', password_hash='x'))
+        db.session.commit()
+
+    def tearDown(self):
+        container_pool.stop()
+        artifacts.wait()
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+        shutil.rmtree(self.tmp_dir)
+
+    def run_job(self, job_id, text):
+        filepath = os.path.join(self.tmp_dir, 'uploads', f"{job_id}.txt")
+        with open(filepath, 'w') as f:
+            f.write(text)
+        job = Job(id=job_id, files=[{'filepath': filepath}], user_id=1, use_cache=False)
+        scheduler.enqueue(job, 'word-counter')
+        db.session.add(job)
+        db.session.commit()
+        scheduler.dispatch_next()
+        container_pool.wait()
+        artifacts.wait()
+        db.session.expire_all()
+        return db.session.get(Job, job_id)
+
+    def pooled_containers(self):
+        return [call for call in self.fake.calls if call[0] == 'run']
+
+    def test_jobs_reuse_a_warm_container(self):
+        first = self.run_job('job-1', 'one two three')
+        second = self.run_job('job-2', 'four five')
+
+        [run] = self.pooled_containers()
+        self.assertEqual(run[3]['entrypoint'], IDLE_COMMAND)
+        self.assertEqual((first.status, second.status), ('succeeded', 'succeeded'))
+        self.assertIsNone(second.container_id)
+        self.assertEqual(b''.join(job_logs.read_spool('job-2')), b'[2]\n')
+        with open(artifacts.host_path(second.artifacts[0]), 'rb') as f:
+            self.assertEqual(f.read(), b'2')
+
+        container = self.fake.containers.list()[0]
+        self.assertEqual(container.execs[0], ['timeout', '600', './process.sh', '/uploads/job-1.txt'])
+        # Nothing of a job is left in the container for the next one.
+        self.assertEqual(container.files, {})
+
+    def test_containers_are_recycled(self):
+        self.app.config['CONTAINER_POOL_MAX_JOBS'] = 1
+        self.run_job('job-1', 'one')
+        self.run_job('job-2', 'two')
+        self.assertEqual(len(self.pooled_containers()), 2)
+        self.assertEqual(len(self.fake.containers.list()), 0)
+
+    def test_jobs_run_on_their_cpuset_and_time_out(self):
+        pipeline_registry.replace([{
+            'id': 'word-counter', 'name': 'Word Counter', 'image_name': 'word-counter-image', 'poolable': True,
+            'resources': {'requests': {'cpu': 2}, 'pin_cpus': True}
+        }])
+        self.fake.exec_handler = lambda container, cmd, environment: (124, b'')
+        job = self.run_job('job-1', 'one')
+
+        [update] = [call for call in self.fake.calls if call[0] == 'update']
+        self.assertEqual(update[2], {'cpuset_cpus': '1,2'})
+        self.assertEqual(job.cpuset, '1,2')
+        self.assertEqual(job.status, 'failed')
+        # It may still be running the job, so it is not reused.
+        self.assertEqual(self.fake.containers.list(), [])
+
+    def test_idle_containers_hold_memory_on_the_ledger(self):
+        # 1g is left for containers once SCHEDULER_RESERVED_MEMORY is taken.
+        self.app.config['HOST_MEMORY'] = '1536m'
+        self.app.config['JOB_DEFAULT_MEMORY'] = '640m'
+        self.run_job('job-1', 'one')
+        self.assertEqual(container_pool.idle_memory(), 640 * 1024 ** 2)
+        self.assertEqual(scheduler.ledger().memory, 384 * 1024 ** 2)
+
+        # A second idle container would not fit next to the first.
+        container_pool.maintain()
+        self.assertEqual(len(self.fake.containers.list()), 1)
+
+    def test_idle_containers_expire_and_are_topped_up_while_in_use(self):
+        self.run_job('job-1', 'one')
+        container_pool.maintain()
+        self.assertEqual(len(self.fake.containers.list()), 2)
+
+        self.app.config['CONTAINER_POOL_IDLE_TTL'] = 0
+        time.sleep(0.01)
+        container_pool.maintain()
+        self.assertEqual(len(self.fake.containers.list()), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
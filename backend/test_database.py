@@ -0,0 +1,36 @@
+import os
+import tempfile
+import unittest
+from sqlalchemy import text
+from backend.app import create_app
+from backend.models import db
+from backend import database
+
+
+class TestDatabase(unittest.TestCase):
+    def test_sqlite_files_get_wal_and_a_busy_timeout(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            app = create_app({
+                'TESTING': True,
+                'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'test.db'),
+                'SQLITE_BUSY_TIMEOUT': 1234
+            })
+            with app.app_context():
+                self.assertEqual(db.session.execute(text('PRAGMA journal_mode')).scalar(), 'wal')
+                self.assertEqual(db.session.execute(text('PRAGMA busy_timeout')).scalar(), 1234)
+                self.assertEqual(db.session.execute(text('PRAGMA synchronous')).scalar(), 1)  # NORMAL
+                db.session.remove()
+                db.engine.dispose()
+
+    def test_server_databases_are_pooled(self):
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+        config = dict(app.config, SQLALCHEMY_DATABASE_URI='postgresql://app@db/app', DB_POOL_SIZE=3)
+        options = database.engine_options(config)
+        self.assertEqual(options['pool_size'], 3)
+        self.assertEqual(options['pool_recycle'], app.config['DB_POOL_RECYCLE'])
+        self.assertTrue(options['pool_pre_ping'])
+        self.assertEqual(database.normalize_uri('postgres://app@db/app'), 'postgresql://app@db/app')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import unittest
+from backend.app import create_app
+from backend.database import TEST_DATABASE_URL
+from backend.extensions import docker_manager
+from backend.fake_docker import FakeDockerClient
+from backend.pipeline_manager import run_pipeline, JOB_LABEL
+
+
+class TestDockerClientManager(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+            'WORKSPACES_DIR': os.path.join(self.tmp_dir, 'workspaces')
+        })
+        self.fake = FakeDockerClient(images=['word-counter-image'])
+        docker_manager.set_client(self.fake)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_client_is_shared(self):
+        self.assertIs(docker_manager.client, self.fake)
+        self.assertIs(docker_manager.client, docker_manager.client)
+
+    def test_image_lookups_are_cached(self):
+        self.assertTrue(docker_manager.has_image('word-counter-image'))
+        self.assertTrue(docker_manager.has_image('word-counter-image'))
+        self.assertFalse(docker_manager.has_image('missing-image'))
+        self.assertEqual(self.fake.calls, [('images.get', 'word-counter-image'), ('images.get', 'missing-image')])
+
+    def test_image_event_invalidates_cache(self):
+        self.assertFalse(docker_manager.has_image('new-image'))
+        self.fake.images.names.add('new-image')
+        docker_manager.handle_image_event({'Type': 'image', 'Action': 'tag',
+                                           'Actor': {'ID': 'sha256:abc', 'Attributes': {'name': 'new-image:latest'}}})
+        self.assertTrue(docker_manager.has_image('new-image'))
+
+    def test_launch_is_a_single_run_call(self):
+        pipeline = {'id': 'word-counter', 'image_name': 'word-counter-image'}
+        # Testing mode would write dummy input files into the real uploads dir.
+        self.app.config['TESTING'] = False
+        with self.app.app_context():
+            run_pipeline(pipeline, 'job-1', ['uploads/a.txt'])
+            self.fake.calls.clear()
+            container = run_pipeline(pipeline, 'job-2', ['uploads/b.txt'])
+
+        self.assertEqual([call[0] for call in self.fake.calls], ['run'])
+        self.assertEqual(container.labels, {JOB_LABEL: 'job-2'})
+
+    def test_launch_applies_resource_limits(self):
+        pipeline = {'id': 'word-counter', 'image_name': 'word-counter-image',
+                    'resources': {'requests': {'cpu': 0.5, 'memory': '256m'}, 'limits': {'cpu': 2}}}
+        self.app.config['TESTING'] = False
+        with self.app.app_context():
+            container = run_pipeline(pipeline, 'job-1', ['uploads/a.txt'], '1,2')
+
+        self.assertEqual(container.kwargs['nano_cpus'], 2 * 10 ** 9)
+        self.assertEqual(container.kwargs['mem_limit'], 256 * 1024 ** 2)
+        self.assertEqual(container.kwargs['cpuset_cpus'], '1,2')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import json
+import unittest
+from backend.app import create_app
+from backend.database import TEST_DATABASE_URL
+from backend.models import db, Job, User
+from backend.extensions import job_events
+from backend.job_events import parse_event_id
+
+
+def read_events(response, count):
+    """Reads `count` events (not keepalives) from a streaming response."""
+    events = []
+    for chunk in response.response:
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if chunk.startswith(':'):
+            continue
+        fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+        events.append(fields)
+        if len(events) == count:
+            break
+    return events
+
+
+class TestJobEvents(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+            'JOB_EVENTS_KEEPALIVE': 0.05
+        })
+        # Other tests' apps may have started the poller; these tests poll by hand.
+        job_events.stop()
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.session.add_all([
+                User(id=1, username='testuser', email='test@test.com', password_hash='x'),
+                User(id=2, username='bob', email='bob@test.com', password_hash='x'),
+                Job(id='mine', files=[], user_id=1, status='queued'),
+                Job(id='theirs', files=[], user_id=2, status='queued'),
+            ])
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def set_status(self, job_id, status):
+        with self.app.app_context():
+            Job.query.filter_by(id=job_id).update({'status': status}, synchronize_session=False)
+            db.session.commit()
+
+    def test_changes_are_pushed_to_the_owner(self):
+        response = self.client.get('/api/jobs/events', buffered=False)
+        try:
+            self.assertEqual(response.mimetype, 'text/event-stream')
+            self.set_status('theirs', 'running')
+            self.set_status('mine', 'running')
+            with self.app.app_context():
+                self.assertEqual(job_events.poll(), 1)
+                # Nothing changed since, so the overlap re-read publishes nothing.
+                self.assertEqual(job_events.poll(), 0)
+
+            [event] = read_events(response, 1)
+            self.assertEqual(event['event'], 'job')
+            self.assertEqual(json.loads(event['data'])['id'], 'mine')
+            self.assertEqual(json.loads(event['data'])['status'], 'running')
+        finally:
+            response.close()
+        self.assertEqual(dict(job_events._subscriptions), {})
+
+    def test_reconnect_replays_changes_since_the_last_event(self):
+        since = self.client.get('/api/jobs').headers['X-Events-Since']
+        self.set_status('mine', 'succeeded')
+        self.set_status('theirs', 'failed')
+
+        response = self.client.get('/api/jobs/events', headers={'Last-Event-ID': since}, buffered=False)
+        try:
+            [event] = read_events(response, 1)
+        finally:
+            response.close()
+        self.assertEqual(json.loads(event['data'])['status'], 'succeeded')
+        with self.app.app_context():
+            updated_at = db.session.get(Job, 'mine').updated_at
+        self.assertEqual(parse_event_id(event['id']), updated_at)
+
+        self.assertEqual(self.client.get('/api/jobs/events?since=yesterday').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import shutil
+import tempfile
+import unittest
+from backend.app import create_app
+from backend.database import TEST_DATABASE_URL
+from backend.models import db, Job, User
+from backend.extensions import docker_manager, job_logs
+from backend.fake_docker import FakeDockerClient
+
+LOG = b''.join(f"line {i}\n".encode() for i in range(1000))
+
+
+class TestJobLogs(unittest.TestCase):
+    def setUp(self):
+        self.logs_dir = tempfile.mkdtemp()
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+            'LOGS_DIR': self.logs_dir,
+            'LOGS_SPOOL_MEMBER_SIZE': 1000
+        })
+        self.fake = FakeDockerClient(images=['word-counter-image'])
+        docker_manager.set_client(self.fake)
+        self.container = self.fake.containers.run('word-counter-image')
+        self.container.logs_output = LOG
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            user = User(username='testuser', email='test@test.com', password_hash='x')
+            db.session.add(user)
+            db.session.commit()
+            db.session.add(Job(id='job-1', files=[], user_id=user.id, status='running',
+                               container_id=self.container.id))
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        shutil.rmtree(self.logs_dir)
+
+    def test_spool_reads_from_any_offset(self):
+        job_logs.spool('job-1', [LOG[i:i + 777] for i in range(0, len(LOG), 777)])
+        self.assertEqual(job_logs.spooled_size('job-1'), len(LOG))
+        self.assertEqual(b''.join(job_logs.read_spool('job-1')), LOG)
+        self.assertEqual(b''.join(job_logs.read_spool('job-1', 4321, 6789)), LOG[4321:6789])
+
+    def test_live_logs_come_from_the_container(self):
+        response = self.client.get('/api/jobs/job-1/logs?offset=10&limit=20')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, LOG[10:30])
+
+    def test_spooled_logs_outlive_the_container(self):
+        job_logs.spool('job-1', job_logs.read_container(self.container.id))
+        self.container.remove()
+
+        response = self.client.get('/api/jobs/job-1/logs?offset=-8')
+        self.assertEqual(response.data, LOG[-8:])
+
+        response = self.client.get('/api/jobs/job-1/logs', headers={'Range': 'bytes=100-199'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Range'], f"bytes 100-199/{len(LOG)}")
+        self.assertEqual(response.data, LOG[100:200])
+
+    def test_tail_of_running_job_is_rejected(self):
+        response = self.client.get('/api/jobs/job-1/logs?offset=-8')
+        self.assertEqual(response.status_code, 416)
+
+    def test_server_sent_events_resume_from_last_event_id(self):
+        self.container.logs_output = b"hello\nworld\n"
+        response = self.client.get('/api/jobs/job-1/logs', headers={
+            'Accept': 'text/event-stream',
+            'Last-Event-ID': '6'
+        })
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertEqual(response.get_data(as_text=True),
+                         "id: 12\ndata: world\ndata: \n\nevent: end\ndata: \n\n")
+
+    def test_server_sent_events_keep_characters_split_across_chunks(self):
+        # 'é' is two bytes, and the container's output is cut between them.
+        self.container.logs = lambda stream=False, **kwargs: iter([b'caf\xc3', b'\xa9\n'])
+        response = self.client.get('/api/jobs/job-1/logs', headers={'Accept': 'text/event-stream'})
+        self.assertEqual(response.get_data(as_text=True),
+                         "id: 3\ndata: caf\n\nid: 6\ndata: \u00e9\ndata: \n\nevent: end\ndata: \n\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from unittest import mock
+from backend.app import create_app
+from backend.database import TEST_DATABASE_URL
+from backend.models import db, Job, User
+from backend.extensions import artifacts, job_tracker
+from backend.pipeline_manager import JOB_LABEL
+
+
+def container_event(action, job_id, container_id='c1', **attributes):
+    attributes[JOB_LABEL] = job_id
+    return {'Type': 'container', 'Action': action, 'timeNano': 1700000000 * 10**9,
+            'Actor': {'ID': container_id, 'Attributes': attributes}}
+
+
+class TestJobTracker(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL
+        })
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        user = User(username='alice', email='alice@test.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        for job_id, status in [('job-1', 'running'), ('job-2', 'running'), ('job-3', 'succeeded')]:
+            db.session.add(Job(id=job_id, files=[], user_id=user.id, status=status, container_id=f'c-{job_id}'))
+        db.session.commit()
+
+    def tearDown(self):
+        # Finished jobs are harvested in the background.
+        artifacts.wait()
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_die_event_records_exit(self):
+        transition = job_tracker.transition_from_event(container_event('die', 'job-1', exitCode='2'))
+        job_tracker.apply_transitions([transition])
+
+        job = db.session.get(Job, 'job-1')
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.exit_code, 2)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_oom_event_marks_job_oom_killed(self):
+        self.assertIsNone(job_tracker.transition_from_event(container_event('oom', 'job-1')))
+        transition = job_tracker.transition_from_event(container_event('die', 'job-1', exitCode='137'))
+        self.assertEqual(transition['status'], 'oom-killed')
+
+    def test_finished_jobs_are_not_resurrected(self):
+        updated = job_tracker.apply_transitions([
+            {'job_id': 'job-3', 'status': 'running'},
+            {'job_id': 'job-1', 'status': 'running'},
+            {'job_id': 'job-1', 'status': 'succeeded', 'exit_code': 0},
+        ])
+        self.assertEqual(updated, 1)
+        self.assertEqual(db.session.get(Job, 'job-3').status, 'succeeded')
+        self.assertEqual(db.session.get(Job, 'job-1').status, 'succeeded')
+
+    def test_reconcile_with_existing_containers(self):
+        exited = mock.Mock(id='c-job-1', labels={JOB_LABEL: 'job-1'},
+                           attrs={'State': {'Status': 'exited', 'ExitCode': 0, 'OOMKilled': False,
+                                            'FinishedAt': '2024-01-01T12:00:00.123456789Z'}})
+        client = mock.Mock()
+        client.containers.list.return_value = [exited]
+
+        job_tracker.reconcile(client)
+
+        job = db.session.get(Job, 'job-1')
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual(job.finished_at.hour, 12)
+        # job-2's container is gone, so its job cannot still be running.
+        self.assertEqual(db.session.get(Job, 'job-2').status, 'failed')
+
+
+if __name__ == '__main__':
+    unittest.main()
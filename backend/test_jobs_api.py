@@ -0,0 +1,120 @@
+import json
+import unittest
+from datetime import date, datetime, timedelta
+from backend.app import create_app
+from backend.database import TEST_DATABASE_URL
+from backend.models import db, DataSubmission, Job, Project, User
+from backend.extensions import pipeline_registry
+
+
+class TestJobsApi(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL
+        })
+        pipeline_registry.replace([{'id': 'word-counter', 'name': 'Word Counter'}])
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.session.add_all([
+                User(id=1, username='testuser', email='test@test.com', password_hash='x'),
+                User(id=2, username='bob', email='bob@test.com', password_hash='x'),
+                Project(id='P1', project_name='One', project_lead='me', start_date=date(2024, 1, 1), status='active'),
+                Project(id='P2', project_name='Two', project_lead='me', start_date=date(2024, 1, 1), status='active'),
+            ])
+            for submission_id, project_id, user_id in [(1, 'P1', 1), (2, 'P1', 1), (3, 'P2', 1), (4, 'P1', 2)]:
+                files = [{'filepath': f'uploads/{submission_id}.fq', 'sha256': None}]
+                db.session.add(DataSubmission(id=submission_id, name=f'S{submission_id}', project_id=project_id,
+                                              sample_ids='s', extraction_date=date(2024, 1, 1), extracted_by='me',
+                                              extraction_method='kit', sequencing_method='WGS',
+                                              submitted_to='facility', submission_date=date(2024, 1, 1),
+                                              user_id=user_id, uploaded_files=json.dumps(files)))
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_batch_of_items_reports_each_result(self):
+        response = self.client.post('/api/jobs/batch', json={'items': [
+            {'submission_id': 1, 'pipeline_id': 'word-counter'},
+            {'submission_id': 4, 'pipeline_id': 'word-counter'},
+            {'submission_id': 2, 'pipeline_id': 'no-such-pipeline'},
+            {'submission_id': 99, 'pipeline_id': 'word-counter'},
+        ]})
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json['queued'], 1)
+        results = response.json['results']
+        self.assertEqual(results[0]['status'], 'queued')
+        self.assertEqual([r.get('code') for r in results], [None, 403, 404, 404])
+        with self.app.app_context():
+            job = db.session.get(Job, results[0]['job_id'])
+            self.assertEqual(job.data_submission_id, 1)
+            self.assertEqual(job.files[0]['filepath'], 'uploads/1.fq')
+
+    def test_batch_by_query(self):
+        response = self.client.post('/api/jobs/batch', json={'query': {'project_id': 'P1'}, 'pipeline_id': 'word-counter'})
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual([r['submission_id'] for r in response.json['results']], [1, 2])
+        with self.app.app_context():
+            self.assertEqual(Job.query.filter_by(status='queued').count(), 2)
+
+    def add_jobs(self, count):
+        with self.app.app_context():
+            for i in range(count):
+                db.session.add(Job(id=f'job-{i:02d}', files=[], user_id=1, pipeline='word-counter',
+                                   status='succeeded' if i % 2 else 'failed',
+                                   created_at=datetime(2024, 1, 1) + timedelta(minutes=i // 2)))
+            db.session.commit()
+
+    def test_jobs_are_paginated_newest_first(self):
+        self.add_jobs(5)
+
+        first = self.client.get('/api/jobs?limit=2')
+        self.assertEqual([job['id'] for job in first.json], ['job-04', 'job-03'])
+        cursor = first.headers['X-Next-Cursor']
+        self.assertIn('rel="next"', first.headers['Link'])
+
+        second = self.client.get(f'/api/jobs?limit=2&cursor={cursor}')
+        third = self.client.get(f"/api/jobs?limit=2&cursor={second.headers['X-Next-Cursor']}")
+        self.assertEqual([job['id'] for job in second.json], ['job-02', 'job-01'])
+        self.assertEqual([job['id'] for job in third.json], ['job-00'])
+        self.assertNotIn('X-Next-Cursor', third.headers)
+
+        self.assertEqual(self.client.get('/api/jobs?cursor=nonsense').status_code, 400)
+
+    def test_jobs_can_be_filtered(self):
+        self.add_jobs(5)
+        response = self.client.get('/api/jobs?status=failed&pipeline=word-counter')
+        self.assertEqual([job['id'] for job in response.json], ['job-04', 'job-02', 'job-00'])
+        self.assertEqual(self.client.get('/api/jobs?submission=1').json, [])
+
+    def test_jobs_can_be_found_by_input_file(self):
+        self.add_jobs(2)
+        with self.app.app_context():
+            db.session.get(Job, 'job-00').files = [{'original_filename': 'a.fq', 'filepath': 'uploads/a.fq',
+                                                    'sha256': 'a' * 64}]
+            db.session.commit()
+        response = self.client.get(f"/api/jobs?file={'a' * 64}")
+        self.assertEqual([job['id'] for job in response.json], ['job-00'])
+        self.assertEqual(response.json[0]['files'][0]['filepath'], 'uploads/a.fq')
+
+    def test_unchanged_page_is_not_modified(self):
+        self.add_jobs(2)
+        etag = self.client.get('/api/jobs').headers['ETag']
+        self.assertEqual(self.client.get('/api/jobs', headers={'If-None-Match': etag}).status_code, 304)
+
+        with self.app.app_context():
+            db.session.get(Job, 'job-01').status = 'running'
+            db.session.commit()
+        self.assertEqual(self.client.get('/api/jobs', headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_batch_needs_items_or_query(self):
+        self.assertEqual(self.client.post('/api/jobs/batch', json={'items': 'all'}).status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
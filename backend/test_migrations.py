@@ -0,0 +1,83 @@
+import json
+import unittest
+from sqlalchemy import inspect, text
+from backend.app import create_app
+from backend.database import TEST_DATABASE_URL
+from backend.models import db, DataSubmission, Job, LabMember, Project, Skill, User, lab_member_skills
+from backend import migrations
+
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL
+        })
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_job_files_move_to_job_inputs(self):
+        files = [{'original_filename': 'a.fq', 'filepath': 'uploads/a.fq', 'sha256': 'a' * 64},
+                 {'original_filename': 'b.fq', 'filepath': 'uploads/b.fq', 'sha256': None}]
+        with self.app.app_context():
+            db.session.add(User(id=1, username='testuser', email='test@test.com', password_hash='x'))
+            db.session.commit()
+            # A job as an earlier version stored it.
+            db.session.execute(text('ALTER TABLE job ADD COLUMN _files TEXT'))
+            db.session.execute(text("INSERT INTO job (id, _files, status, use_cache, outputs_ready, created_at, user_id) "
+                                    "VALUES ('old', :files, 'succeeded', TRUE, TRUE, '2024-01-01 00:00:00', 1)"),
+                               {'files': json.dumps(files)})
+            db.session.commit()
+
+            self.assertEqual(migrations.migrate_job_inputs(), 1)
+            self.assertEqual(migrations.migrate_job_inputs(), 0)
+            self.assertNotIn('_files', {c['name'] for c in inspect(db.engine).get_columns('job')})
+            self.assertEqual(db.session.get(Job, 'old').files, files)
+            self.assertEqual([job.id for job in Job.using_file(sha256='a' * 64)], ['old'])
+            self.assertEqual([job.id for job in Job.using_file(filepath='uploads/b.fq')], ['old'])
+
+    def test_new_database_is_created_at_the_latest_version(self):
+        with self.app.app_context():
+            self.assertEqual(migrations.current_version(), migrations.head())
+            self.assertEqual(migrations.upgrade(), [])
+
+    def test_database_of_the_first_release_is_upgraded(self):
+        with self.app.app_context():
+            db.drop_all()
+            db.metadata.create_all(db.engine, tables=[User.__table__, Project.__table__, DataSubmission.__table__,
+                                                      Skill.__table__, LabMember.__table__, lab_member_skills])
+            db.session.execute(text('DROP INDEX ix_data_submission_user_id'))
+            db.session.execute(text(
+                'CREATE TABLE job (id VARCHAR(36) PRIMARY KEY, _files TEXT NOT NULL, status VARCHAR(20) NOT NULL, '
+                'pipeline VARCHAR(50), container_id VARCHAR(64), created_at DATETIME NOT NULL, '
+                'user_id INTEGER NOT NULL, data_submission_id INTEGER)'
+            ))
+            db.session.add(User(id=1, username='testuser', email='test@test.com', password_hash='x'))
+            db.session.execute(text("INSERT INTO job VALUES ('old', :files, 'succeeded', 'word-counter', NULL, "
+                                    "'2024-01-01 00:00:00', 1, NULL)"),
+                               {'files': json.dumps([{'original_filename': 'a.fq', 'filepath': 'uploads/a.fq'}])})
+            db.session.commit()
+            self.assertEqual(migrations.current_version(), 0)
+
+            self.assertEqual(migrations.upgrade(), list(range(1, migrations.head() + 1)))
+
+            self.assertEqual(migrations.current_version(), migrations.head())
+            job = db.session.get(Job, 'old')
+            self.assertEqual(job.files[0]['filepath'], 'uploads/a.fq')
+            self.assertTrue(job.use_cache)
+            self.assertFalse(job.outputs_ready)
+            indexes = {i['name'] for i in inspect(db.engine).get_indexes('job')}
+            self.assertTrue({'ix_job_user_id_created_at', 'ix_job_status', 'ix_job_parent_id'} <= indexes)
+            self.assertIn('ix_data_submission_user_id',
+                          {i['name'] for i in inspect(db.engine).get_indexes('data_submission')})
+
+    def test_cli_reports_the_version(self):
+        result = self.app.test_cli_runner().invoke(args=['db', 'current'])
+        self.assertIn(f"Version {migrations.head()} of {migrations.head()}", result.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from backend.app import create_app
+from backend.database import TEST_DATABASE_URL
+from backend.models import db, User
+from backend.extensions import passwords
+from backend.passwords import hash_password, hash_rounds
+from backend.query_counter import QueryCounter
+from backend.user_cache import UserCache
+
+
+class TestPasswords(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+            'BCRYPT_LOG_ROUNDS': 4,
+            'PASSWORD_HASH_WORKERS': 1,
+            'PASSWORD_HASH_MAX_PENDING': 1,
+            'PASSWORD_HASH_QUEUE_TIMEOUT': 0.05
+        })
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.session.add(User(id=1, username='alice', email='alice@test.com', password_hash=hash_password('secret', 5)))
+            db.session.commit()
+
+    def tearDown(self):
+        passwords.stop()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def login(self, password):
+        return self.client.post('/api/login', json={'username': 'alice', 'password': password})
+
+    def test_login_upgrades_hashes_of_another_cost(self):
+        self.assertEqual(self.login('wrong').status_code, 401)
+        self.assertEqual(self.login('secret').status_code, 200)
+        with self.app.app_context():
+            password_hash = db.session.get(User, 1).password_hash
+        self.assertEqual(hash_rounds(password_hash), 4)
+        self.assertTrue(passwords.check(password_hash, 'secret'))
+
+    def test_busy_hasher_sheds_load(self):
+        passwords._slots.acquire()
+        try:
+            response = self.login('secret')
+        finally:
+            passwords._slots.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+
+    def test_page_load_costs_no_queries_once_logged_in(self):
+        self.login('secret')
+        self.client.get('/api/profile')
+        with self.app.app_context(), QueryCounter(db.engine) as queries:
+            self.assertEqual(self.client.get('/').status_code, 200)
+            self.assertEqual(self.client.get('/src/index.js').status_code, 200)
+            self.client.get('/api/profile')
+        self.assertEqual(queries.count, 0)
+
+    def test_profile_changes_reach_the_cache(self):
+        self.login('secret')
+        self.assertIsNone(self.client.get('/api/profile').json['full_name'])
+        with self.app.app_context():
+            db.session.get(User, 1).full_name = 'Alice A.'
+            db.session.commit()
+        self.assertEqual(self.client.get('/api/profile').json['full_name'], 'Alice A.')
+
+
+class TestUserCache(unittest.TestCase):
+    def test_least_recently_used_users_are_dropped(self):
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+                          'USER_CACHE_MAX_ENTRIES': 2})
+        cache = UserCache(app)
+        loads = []
+
+        def load(user_id):
+            loads.append(user_id)
+            return User(id=user_id, username=f'u{user_id}', email=f'u{user_id}@test.com')
+
+        for user_id in (1, 2, 1, 3, 1, 2):
+            self.assertEqual(cache.get(user_id, load).username, f'u{user_id}')
+        self.assertEqual(loads, [1, 2, 3, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
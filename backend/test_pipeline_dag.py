@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import unittest
+from backend.app import create_app
+from backend.database import TEST_DATABASE_URL
+from backend.models import db, Job, User
+from backend.extensions import artifacts, docker_manager, job_tracker, pipeline_registry, scheduler
+from backend.fake_docker import FakeDockerClient
+
+
+class TestPipelineDag(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+            'SCHEDULER_AUTOSTART': False,
+            'JOB_TRACKER_AUTOSTART': False,
+            'SCHEDULER_MAX_RUNNING': 2,
+            'HOST_CPUS': 4,
+            'UPLOADS_DIR': os.path.join(self.tmp_dir, 'uploads'),
+            'WORKSPACES_DIR': os.path.join(self.tmp_dir, 'workspaces')
+        })
+        pipeline_registry.replace([
+            {'id': 'qc', 'name': 'QC', 'image_name': 'qc-image',
+             'outputs': [{'name': 'report', 'type': 'file'}]},
+            {'id': 'assembler', 'name': 'Assembler', 'image_name': 'assembler-image',
+             'outputs': [{'name': 'contigs', 'type': 'file'}]},
+            {'id': 'qc-assemble', 'name': 'QC and Assemble', 'steps': [
+                {'id': 'qc', 'pipeline': 'qc', 'for_each': 'file'},
+                {'id': 'assemble', 'pipeline': 'assembler', 'inputs': ['qc.report']}
+            ]}
+        ])
+        self.fake = FakeDockerClient(images=['qc-image', 'assembler-image'])
+        docker_manager.set_client(self.fake)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.session.add(User(id=1, username='alice', email='alice@test.com', password_hash='x'))
+        files = []
+        for name in ['reads-1.fq', 'reads-2.fq']:
+            filepath = os.path.join(self.tmp_dir, 'uploads', name)
+            with open(filepath, 'w') as f:
+                f.write(name)
+            files.append({'original_filename': name, 'filepath': filepath})
+        job = Job(id='job-1', files=files, user_id=1)
+        scheduler.enqueue(job, 'qc-assemble')
+        db.session.add(job)
+        db.session.commit()
+
+    def tearDown(self):
+        artifacts.wait()
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+        shutil.rmtree(self.tmp_dir)
+
+    def runs(self, step):
+        db.session.expire_all()
+        return Job.query.filter_by(parent_id='job-1', step=step).order_by(Job.shard).all()
+
+    def finish(self, job, outputs, status='succeeded'):
+        outputs_dir = os.path.join(self.tmp_dir, 'workspaces', job.id, 'outputs')
+        for name, content in outputs.items():
+            with open(os.path.join(outputs_dir, name), 'w') as f:
+                f.write(content)
+        job_tracker.apply_transitions([{'job_id': job.id, 'status': status, 'exit_code': 0 if status == 'succeeded' else 1}])
+        artifacts.wait()
+
+    def test_steps_fan_out_and_back_in(self):
+        qc_runs = self.runs('qc')
+        self.assertEqual([run.status for run in qc_runs], ['queued', 'queued'])
+        # The parent has no container of its own, so both runs fit under the cap of 2.
+        while scheduler.dispatch_next():
+            pass
+        self.assertEqual([run.status for run in self.runs('qc')], ['running', 'running'])
+
+        self.finish(qc_runs[0], {'report.txt': 'ok 1'})
+        self.assertEqual(self.runs('assemble'), [])
+        self.finish(qc_runs[1], {'report.txt': 'ok 2'})
+
+        [assemble] = self.runs('assemble')
+        self.assertEqual([f['filepath'] for f in assemble.files],
+                         [os.path.join(self.app.config['UPLOADS_DIR'], 'artifacts', run.id, 'report.txt') for run in qc_runs])
+        scheduler.dispatch_next()
+        container = self.fake.containers.list()[-1]
+        self.assertEqual(container.command, ['/uploads/report.txt', '/uploads/1_report.txt'])
+        # Intermediate outputs are linked into the next workspace, not copied.
+        inputs_dir = os.path.join(self.tmp_dir, 'workspaces', assemble.id, 'inputs')
+        self.assertTrue(os.path.samefile(os.path.join(inputs_dir, '1_report.txt'),
+                                         os.path.join(self.tmp_dir, 'uploads', 'artifacts', qc_runs[1].id, 'report.txt')))
+
+        self.finish(assemble, {'contigs.fa': '>contig'})
+        job = db.session.get(Job, 'job-1')
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual([a.filename for a in job.artifacts], ['contigs.fa'])
+
+    def test_failed_step_fails_the_job_and_cancels_queued_runs(self):
+        self.app.config['SCHEDULER_PIPELINE_MAX_RUNNING'] = 1
+        scheduler.dispatch_next()
+        first, second = self.runs('qc')
+
+        self.finish(first, {}, status='failed')
+
+        self.assertEqual(db.session.get(Job, 'job-1').status, 'failed')
+        self.assertEqual(self.runs('qc')[1].status, 'cancelled')
+        self.assertFalse(scheduler.dispatch_next())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,7 @@ import json
 import tempfile
 import shutil
 from backend.app import create_app
+from backend.database import TEST_DATABASE_URL
 from backend.models import db, Job, User
 from backend.pipeline_manager import discover_pipelines
 from backend.extensions import bcrypt
@@ -48,9 +49,14 @@ class TestPipelineManager(unittest.TestCase):
 class TestApi(unittest.TestCase):
     def setUp(self):
         """Set up a test client and initialize the database."""
-        self.app = create_app()
-        self.app.config['TESTING'] = True
-        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+            # The schema is created below; cheap hashes, checked on this thread.
+            'DB_AUTO_MIGRATE': False,
+            'BCRYPT_LOG_ROUNDS': 4,
+            'PASSWORD_HASH_WORKERS': 0
+        })
         self.client = self.app.test_client()
 
         with self.app.app_context():
@@ -70,7 +76,7 @@ class TestApi(unittest.TestCase):
             db.session.add(user)
             db.session.commit()
 
-            job = Job(id='test-job', files=[{'filename': 'test.txt'}], user_id=user.id)
+            job = Job(id='test-job', files=[{'original_filename': 'test.txt', 'filepath': 'uploads/test.txt'}], user_id=user.id)
             db.session.add(job)
             db.session.commit()
 
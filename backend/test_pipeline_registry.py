@@ -0,0 +1,81 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from backend.app import create_app
+from backend.database import TEST_DATABASE_URL
+from backend.pipeline_registry import validate_manifest
+
+
+class TestPipelineRegistry(unittest.TestCase):
+    def setUp(self):
+        self.pipelines_dir = tempfile.mkdtemp()
+        self.write_manifest('word-counter', {'name': 'Word Counter', 'outputs': [{'name': 'counts', 'type': 'file'}]})
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+            'PIPELINES_DIR': self.pipelines_dir
+        })
+        self.registry = self.app.extensions['pipelines']
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.pipelines_dir)
+
+    def write_manifest(self, pipeline_id, manifest):
+        os.makedirs(os.path.join(self.pipelines_dir, pipeline_id), exist_ok=True)
+        with open(os.path.join(self.pipelines_dir, pipeline_id, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f)
+
+    def test_loads_on_first_use(self):
+        self.write_manifest('late', {'name': 'Late'})
+        # Nothing was scanned when the app was built.
+        self.assertEqual(self.registry.get('late')['name'], 'Late')
+
+    def test_validate_manifest(self):
+        self.assertEqual(validate_manifest({'name': 'Ok', 'max_concurrent': 2}), [])
+        self.assertTrue(validate_manifest({}))
+        self.assertTrue(validate_manifest({'name': 'Bad', 'outputs': [{'name': 'x', 'type': 'socket'}]}))
+        self.assertTrue(validate_manifest({'name': 'Bad', 'max_concurrent': 0}))
+        steps = [{'id': 'count', 'pipeline': 'word-counter', 'inputs': ['split.parts']},
+                 {'id': 'split', 'pipeline': 'splitter', 'for_each': 'file'}]
+        self.assertTrue(validate_manifest({'name': 'Out of order', 'steps': steps}))
+        self.assertEqual(validate_manifest({'name': 'Ok', 'steps': steps[::-1]}), [])
+        self.assertTrue(validate_manifest({'name': 'Bad', 'resources': {'requests': {'cpu': 2}, 'limits': {'cpu': 1}}}))
+        self.assertTrue(validate_manifest({'name': 'Bad', 'resources': {'limits': {'memory': 'lots'}}}))
+
+    def test_invalid_manifests_are_skipped(self):
+        self.registry.load()
+        self.write_manifest('broken', {'description': 'no name'})
+        self.assertFalse(self.registry.reload())
+        self.assertIsNone(self.registry.get('broken'))
+        self.assertEqual(self.registry.get('word-counter')['name'], 'Word Counter')
+
+    def test_reload_picks_up_changes(self):
+        etag = self.registry.etag
+        self.assertFalse(self.registry.reload())
+
+        self.write_manifest('video-converter', {'name': 'Video Converter'})
+        self.registry._reload_if_changed()
+        self.assertEqual([p['id'] for p in self.registry.list()], ['video-converter', 'word-counter'])
+        self.assertNotEqual(self.registry.etag, etag)
+
+    def test_pipelines_endpoint_revalidates(self):
+        response = self.client.get('/api/pipelines')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json[0]['id'], 'word-counter')
+        etag = response.headers['ETag']
+
+        response = self.client.get('/api/pipelines', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        self.write_manifest('video-converter', {'name': 'Video Converter'})
+        self.registry.reload()
+        response = self.client.get('/api/pipelines', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
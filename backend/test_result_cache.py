@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import unittest
+from backend.app import create_app
+from backend.database import TEST_DATABASE_URL
+from backend.models import db, CachedResult, Job, User
+from backend.extensions import artifacts, docker_manager, job_tracker, pipeline_registry, result_cache, scheduler
+from backend.fake_docker import FakeDockerClient
+
+FILES = [{'filepath': 'a.txt', 'sha256': 'a' * 64}, {'filepath': 'b.txt', 'sha256': 'b' * 64}]
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+            'SCHEDULER_AUTOSTART': False,
+            'JOB_TRACKER_AUTOSTART': False,
+            'UPLOADS_DIR': os.path.join(self.tmp_dir, 'uploads'),
+            'WORKSPACES_DIR': os.path.join(self.tmp_dir, 'workspaces')
+        })
+        pipeline_registry.replace([{'id': 'word-counter', 'name': 'Word Counter', 'image_name': 'word-counter-image'}])
+        self.fake = FakeDockerClient(images=['word-counter-image'])
+        docker_manager.set_client(self.fake)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.session.add(User(id=1, username='alice', email='alice@test.com', password_hash='x'))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+        shutil.rmtree(self.tmp_dir)
+
+    def run_job(self, job_id, files=FILES, use_cache=True, user_id=1):
+        job = Job(id=job_id, files=files, user_id=user_id, use_cache=use_cache)
+        scheduler.enqueue(job, 'word-counter')
+        db.session.add(job)
+        db.session.commit()
+        scheduler.dispatch_next()
+        job = db.session.get(Job, job_id)
+        if job.status == 'running':
+            job_tracker.apply_transitions([{'job_id': job_id, 'status': 'succeeded', 'exit_code': 0}])
+            artifacts.wait()
+        return db.session.get(Job, job_id)
+
+    def containers_started(self):
+        return len([call for call in self.fake.calls if call[0] == 'run'])
+
+    def test_identical_run_is_served_from_cache(self):
+        first = self.run_job('job-1')
+        second = self.run_job('job-2')
+
+        self.assertEqual(self.containers_started(), 1)
+        self.assertEqual(second.status, 'succeeded')
+        self.assertEqual(second.cached_from, 'job-1')
+        self.assertEqual(second.cache_key, first.cache_key)
+        self.assertEqual(db.session.get(CachedResult, first.cache_key).hits, 1)
+
+    def test_different_inputs_or_image_miss(self):
+        self.run_job('job-1')
+        self.run_job('job-2', files=FILES[:1])
+        self.fake.images.ids['word-counter-image'] = 'sha256:rebuilt'
+        docker_manager.handle_image_event({'Action': 'tag', 'Actor': {'Attributes': {'name': 'word-counter-image'}}})
+        self.run_job('job-3')
+
+        self.assertEqual(self.containers_started(), 3)
+
+    def test_other_names_or_users_miss(self):
+        # The names are the container's arguments, and a hit shares the first job's logs.
+        db.session.add(User(id=2, username='bob', email='bob@test.com', password_hash='x'))
+        db.session.commit()
+        self.run_job('job-1')
+        self.run_job('job-2', files=[dict(FILES[0], filepath='renamed.txt'), FILES[1]])
+        self.run_job('job-3', user_id=2)
+
+        self.assertEqual(self.containers_started(), 3)
+
+    def test_bypass_flag_always_runs(self):
+        self.run_job('job-1')
+        second = self.run_job('job-2', use_cache=False)
+
+        self.assertEqual(self.containers_started(), 2)
+        self.assertIsNone(second.cached_from)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.app.config['RESULT_CACHE_MAX_ENTRIES'] = 1
+        self.run_job('job-1')
+        self.run_job('job-2', files=FILES[:1])
+
+        self.assertEqual([entry.job_id for entry in CachedResult.query.all()], ['job-2'])
+        self.assertEqual(result_cache.evict(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from backend.app import create_app
+from backend.database import TEST_DATABASE_URL
+from backend.models import db, Job, User
+from backend.extensions import pipeline_registry, scheduler
+
+
+class TestJobScheduler(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+            'SCHEDULER_MAX_RUNNING': 3,
+            'SCHEDULER_PIPELINE_MAX_RUNNING': 2,
+            'HOST_CPUS': 8,
+            'HOST_MEMORY': '16g'
+        })
+        pipeline_registry.replace([
+            {'id': 'word-counter', 'name': 'Word Counter'},
+            {'id': 'video-converter', 'name': 'Video Converter', 'max_concurrent': 1}
+        ])
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        self.alice = User(username='alice', email='alice@test.com', password_hash='x')
+        self.bob = User(username='bob', email='bob@test.com', password_hash='x')
+        db.session.add_all([self.alice, self.bob])
+        db.session.commit()
+        self.started = datetime(2024, 1, 1)
+
+        self.container_ids = iter(range(1000))
+        patcher = mock.patch('backend.pipeline_manager.run_pipeline',
+                             side_effect=lambda *args: mock.Mock(id=f"container-{next(self.container_ids)}"))
+        self.run_pipeline = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def queue_job(self, job_id, user, pipeline='word-counter'):
+        job = Job(id=job_id, files=[{'filepath': f'uploads/{job_id}.txt'}], user_id=user.id,
+                  created_at=self.started + timedelta(seconds=len(Job.query.all())))
+        scheduler.enqueue(job, pipeline)
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    def dispatch_all(self):
+        while scheduler.dispatch_next():
+            pass
+        return [call.args[1] for call in self.run_pipeline.call_args_list]
+
+    def test_fifo_order_and_global_cap(self):
+        for i in range(5):
+            self.queue_job(f'job-{i}', self.alice if i % 2 else self.bob)
+        self.app.config['SCHEDULER_PIPELINE_MAX_RUNNING'] = 5
+
+        self.assertEqual(self.dispatch_all(), ['job-0', 'job-1', 'job-2'])
+        self.assertEqual(db.session.get(Job, 'job-0').status, 'running')
+        self.assertEqual(db.session.get(Job, 'job-0').container_id, 'container-0')
+        self.assertEqual(db.session.get(Job, 'job-3').status, 'queued')
+
+    def test_per_pipeline_cap(self):
+        self.queue_job('video-1', self.alice, 'video-converter')
+        self.queue_job('video-2', self.alice, 'video-converter')
+        self.queue_job('count-1', self.alice)
+
+        self.assertEqual(self.dispatch_all(), ['video-1', 'count-1'])
+        self.assertEqual(db.session.get(Job, 'video-2').status, 'queued')
+
+    def test_fair_share_interleaves_users(self):
+        self.app.config['SCHEDULER_POLICY'] = 'fair'
+        self.queue_job('alice-1', self.alice)
+        self.queue_job('alice-2', self.alice)
+        self.queue_job('bob-1', self.bob)
+
+        self.assertEqual(self.dispatch_all(), ['alice-1', 'bob-1'])
+
+    def test_jobs_start_only_when_their_requests_fit(self):
+        pipeline_registry.replace([
+            {'id': 'word-counter', 'name': 'Word Counter', 'resources': {'requests': {'cpu': 0.5, 'memory': '1g'}}},
+            {'id': 'video-converter', 'name': 'Video Converter',
+             'resources': {'requests': {'cpu': 4, 'memory': '4g'}, 'pin_cpus': True}}
+        ])
+        self.app.config['SCHEDULER_MAX_RUNNING'] = 10
+        self.queue_job('video-1', self.alice, 'video-converter')
+        self.queue_job('video-2', self.alice, 'video-converter')
+        self.queue_job('count-1', self.bob)
+
+        # Core 0 is reserved, so the first video job gets 4 of the remaining 7
+        # cores to itself and the second has to wait; the small job still fits,
+        # on the cores nobody has pinned.
+        self.assertEqual(self.dispatch_all(), ['video-1', 'count-1'])
+        self.assertEqual(db.session.get(Job, 'video-1').cpuset, '1,2,3,4')
+        self.assertEqual(db.session.get(Job, 'count-1').cpuset, '5,6,7')
+
+        Job.query.filter_by(id='video-1').update({'status': 'succeeded'})
+        db.session.commit()
+        self.assertEqual(self.dispatch_all()[-1], 'video-2')
+
+    def test_failed_launch_marks_job_failed(self):
+        self.run_pipeline.side_effect = None
+        self.run_pipeline.return_value = None
+        self.queue_job('job-1', self.alice)
+
+        self.dispatch_all()
+        self.assertEqual(db.session.get(Job, 'job-1').status, 'failed')
+
+
+if __name__ == '__main__':
+    unittest.main()
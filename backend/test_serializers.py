@@ -0,0 +1,75 @@
+import unittest
+from datetime import date
+from backend.app import create_app
+from backend.database import TEST_DATABASE_URL
+from backend.models import db, Artifact, DataSubmission, Job, LabMember, Project, Skill, User
+from backend.query_counter import QueryCounter
+
+
+class TestListQueries(unittest.TestCase):
+    """The list endpoints run as many queries for many rows as for one."""
+
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL
+        })
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.session.add(User(id=1, username='testuser', email='test@test.com', password_hash='x'))
+            db.session.add_all([Skill(name='PCR'), Skill(name='Python')])
+            db.session.commit()
+        self.add_rows(0)
+        # Logs the test user in, so the counts below don't include creating it.
+        self.client.get('/api/user')
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def add_rows(self, n):
+        with self.app.app_context():
+            skills = Skill.query.all()
+            project = Project(id=f'P{n}', project_name=f'Project {n}', project_lead='me',
+                              start_date=date(2024, 1, 1), status='active')
+            db.session.add_all([
+                project,
+                LabMember(name=f'M{n}', email=f'm{n}@lab.org', role='tech', status='active', skills=skills),
+                DataSubmission(name=f'S{n}', project=project, sample_ids='s', extraction_date=date(2024, 1, 1),
+                               extracted_by='me', extraction_method='kit', sequencing_method='WGS',
+                               submitted_to='facility', submission_date=date(2024, 1, 1), user_id=1),
+                Job(id=f'job-{n}', files=[], user_id=1, status='succeeded'),
+                Artifact(job_id=f'job-{n}', name='out', filename='out.txt', filepath=f'blobs/{n}',
+                         size=1, sha256='0' * 64, mime_type='text/plain'),
+            ])
+            db.session.commit()
+
+    def count_queries(self, url):
+        with self.app.app_context(), QueryCounter(db.engine) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        return queries.count, response.json
+
+    def test_list_endpoints_run_a_fixed_number_of_queries(self):
+        urls = ['/api/projects', '/api/submissions', '/api/members', '/api/jobs']
+        before = {url: self.count_queries(url)[0] for url in urls}
+        for n in range(1, 6):
+            self.add_rows(n)
+
+        for url in urls:
+            count, rows = self.count_queries(url)
+            self.assertEqual(len(rows), 6)
+            self.assertEqual(count, before[url], url)
+
+    def test_lists_show_related_rows(self):
+        _, submissions = self.count_queries('/api/submissions')
+        _, members = self.count_queries('/api/members')
+        _, jobs = self.count_queries('/api/jobs')
+        self.assertEqual(submissions[0]['project_name'], 'Project 0')
+        self.assertEqual(sorted(members[0]['skills_str'].split(', ')), ['PCR', 'Python'])
+        self.assertEqual(jobs[0]['outputs'][0]['url'], '/api/jobs/job-0/artifacts/out.txt')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+from backend.app import create_app
+from backend.config import BASE_DIR
+from backend.database import TEST_DATABASE_URL
+from backend.extensions import background
+from backend.models import db
+
+
+class TestStartup(unittest.TestCase):
+    def test_profile_reports_each_step(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            app = create_app({
+                'TESTING': True,
+                'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+                'STARTUP_PROFILE': True
+            })
+        steps = [name for name, _ in app.extensions['startup_profile'].steps]
+        self.assertEqual(steps, ['initializing extensions', 'creating directories', 'registering routes',
+                                 'migrating the database'])
+        self.assertIn('--- Startup Profile ---', output.getvalue())
+        self.assertIn('registering routes', output.getvalue())
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_scripts_can_skip_the_warm_up(self):
+        with mock.patch.object(background, 'start') as start:
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+                'WARM_START': False
+            })
+        start.assert_not_called()
+        self.assertIsNone(app.extensions['pipelines']._index)
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_building_an_app_loads_nothing_it_doesnt_need(self):
+        # In a fresh interpreter, since other tests have imported the Docker SDK here.
+        script = (
+            "import sys\n"
+            "from backend.app import create_app\n"
+            "app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})\n"
+            "print('docker' in sys.modules, app.extensions['pipelines']._index is None,"
+            " app.extensions['static_assets']._assets is None)\n"
+        )
+        result = subprocess.run([sys.executable, '-c', script], cwd=BASE_DIR, capture_output=True, text=True,
+                                env={**os.environ, 'STARTUP_PROFILE': '0'}, check=True)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], 'False True True')
+
+    def test_password_workers_start_no_services(self):
+        # A script that builds its app unguarded, which every spawned hash worker imports again.
+        script = (
+            "import os, tempfile\n"
+            "from backend.app import create_app\n"
+            "tmp = tempfile.mkdtemp()\n"
+            "app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'PASSWORD_HASH_WORKERS': 1,\n"
+            "                  'SCHEDULER_AUTOSTART': False, 'JOB_TRACKER_AUTOSTART': False,\n"
+            "                  'PIPELINE_WATCH_AUTOSTART': False, 'BACKGROUND_LOCK_FILE': os.path.join(tmp, 'lock')})\n"
+            "if __name__ == '__main__':\n"
+            "    app.extensions['passwords'].hash('secret', 4)\n"
+            "    app.extensions['passwords'].stop()\n"
+            "    os._exit(0)\n"
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'unguarded.py')
+            with open(path, 'w') as f:
+                f.write(script)
+            result = subprocess.run([sys.executable, path], cwd=BASE_DIR, capture_output=True, text=True,
+                                    env={**os.environ, 'PYTHONPATH': BASE_DIR}, timeout=60, check=True)
+        self.assertEqual(result.stdout.count('Running the background services'), 1, result.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from backend.app import create_app
+from backend.database import TEST_DATABASE_URL
+from backend.models import db
+from backend.static_assets import IMMUTABLE, REVALIDATE, is_fingerprinted
+
+
+class TestStaticAssets(unittest.TestCase):
+    def setUp(self):
+        self.ui_dir = tempfile.mkdtemp()
+        self.script = b'console.log("dashboard");\n' * 100
+        self.write('index.html', b'<html><body>' + b'<p>dashboard</p>' * 100 + b'</body></html>')
+        self.write('assets/index-3f2a9c1b.js', self.script)
+        self.write('logo.png', b'\x89PNG' + b'\x00' * 1000)
+        self.write('node_modules/vite/index.js', b'ignored')
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+            'STATIC_ASSETS_DIR': self.ui_dir
+        })
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        shutil.rmtree(self.ui_dir)
+
+    def write(self, name, data):
+        path = os.path.join(self.ui_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def test_serves_precompressed_assets_from_memory(self):
+        # Served from the manifest a server builds at startup, not the disk.
+        self.app.extensions['static_assets'].load()
+        os.remove(os.path.join(self.ui_dir, 'assets/index-3f2a9c1b.js'))
+        response = self.client.get('/assets/index-3f2a9c1b.js', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(gzip.decompress(response.data), self.script)
+
+        plain = self.client.get('/assets/index-3f2a9c1b.js', headers={'Accept-Encoding': 'identity'})
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(plain.data, self.script)
+        self.assertNotEqual(plain.headers['ETag'], response.headers['ETag'])
+
+        # Images are served as they are.
+        self.assertNotIn('Content-Encoding', self.client.get('/logo.png', headers={'Accept-Encoding': 'gzip'}).headers)
+        self.assertNotIn('node_modules/vite/index.js', self.app.extensions['static_assets'])
+
+    def test_caching_headers_and_revalidation(self):
+        script = self.client.get('/assets/index-3f2a9c1b.js')
+        self.assertEqual(script.headers['Cache-Control'], IMMUTABLE)
+        page = self.client.get('/')
+        self.assertEqual(page.headers['Cache-Control'], REVALIDATE)
+
+        again = self.client.get('/assets/index-3f2a9c1b.js', headers={'If-None-Match': script.headers['ETag']})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.data, b'')
+        self.assertEqual(self.client.get('/index.html', headers={'If-None-Match': '"stale"'}).status_code, 200)
+
+    def test_large_files_are_served_from_disk(self):
+        self.app.config['STATIC_ASSETS_MAX_MEMORY_BYTES'] = 100
+        self.app.extensions['static_assets'].reload()
+        response = self.client.get('/assets/index-3f2a9c1b.js')
+        self.assertEqual(response.data, self.script)
+        self.assertEqual(response.headers['Cache-Control'], IMMUTABLE)
+        response.close()
+        self.assertEqual(self.client.get('/assets/index-3f2a9c1b.js',
+                                         headers={'If-None-Match': response.headers['ETag']}).status_code, 304)
+
+    def test_fingerprinted_names(self):
+        for name in ('assets/index-3f2a9c1b.js', 'app.5d41402abc4b2a76.css', 'assets/index-BKl8LzKm.js'):
+            self.assertTrue(is_fingerprinted(name), name)
+        for name in ('index.html', 'profile_creation.html', 'package-lock.json', 'some-component.js',
+                     'page-layout-2.css', 'my-component-v2.js', 'my-settings.js'):
+            self.assertFalse(is_fingerprinted(name), name)
+
+    def test_bundler_manifest_names_the_hashed_files(self):
+        self.write('.vite/manifest.json', b'{"index.html": {"file": "assets/app-v2.js", "isEntry": true}}')
+        self.write('assets/app-v2.js', self.script)
+        self.assertEqual(self.client.get('/assets/app-v2.js').headers['Cache-Control'], IMMUTABLE)
+        # Only the manifest counts once there is one.
+        self.assertEqual(self.client.get('/assets/index-3f2a9c1b.js').headers['Cache-Control'], REVALIDATE)
+
+
+if __name__ == '__main__':
+    unittest.main()
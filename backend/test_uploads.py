@@ -0,0 +1,116 @@
+import fcntl
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from backend.app import create_app
+from backend.database import TEST_DATABASE_URL
+from backend.config import BASE_DIR
+from backend.models import db, DataSubmission, Job, Project, Upload, User
+
+DATA = os.urandom(300000)
+
+
+class TestResumableUploads(unittest.TestCase):
+    def setUp(self):
+        self.uploads_dir = tempfile.mkdtemp()
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+            'UPLOADS_DIR': self.uploads_dir
+        })
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        shutil.rmtree(self.uploads_dir)
+
+    def create(self, length=len(DATA)):
+        response = self.client.post('/api/uploads', json={'filename': 'reads.fastq.gz', 'length': length})
+        self.assertEqual(response.status_code, 201)
+        return response.json['id']
+
+    def patch(self, upload_id, offset, data):
+        return self.client.patch(f'/api/uploads/{upload_id}', data=data, headers={
+            'Upload-Offset': str(offset),
+            'Content-Type': 'application/offset+octet-stream'
+        })
+
+    def test_chunks_resume_and_finalize(self):
+        upload_id = self.create()
+        self.assertEqual(self.patch(upload_id, 0, DATA[:100000]).status_code, 204)
+
+        # After a dropped connection the client asks where to resume.
+        response = self.client.head(f'/api/uploads/{upload_id}')
+        self.assertEqual(response.headers['Upload-Offset'], '100000')
+
+        self.assertEqual(self.patch(upload_id, 100000, DATA[100000:]).status_code, 204)
+        response = self.client.post(f'/api/uploads/{upload_id}/finalize',
+                                    json={'sha256': hashlib.sha256(DATA).hexdigest()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['status'], 'complete')
+
+        with self.app.app_context():
+            upload = db.session.get(Upload, upload_id)
+            with open(os.path.join(BASE_DIR, upload.filepath), 'rb') as f:
+                self.assertEqual(f.read(), DATA)
+
+    def test_wrong_offset_is_rejected(self):
+        upload_id = self.create()
+        self.patch(upload_id, 0, DATA[:10])
+        response = self.patch(upload_id, 5, DATA[5:20])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.headers['Upload-Offset'], '10')
+
+    def test_chunk_being_written_by_another_process_is_rejected(self):
+        upload_id = self.create()
+        with self.app.app_context():
+            path = os.path.join(BASE_DIR, db.session.get(Upload, upload_id).filepath)
+        # What a request in another worker holds while it writes a chunk.
+        with open(path, 'r+b') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            self.assertEqual(self.patch(upload_id, 0, DATA[:10]).status_code, 409)
+        self.assertEqual(self.patch(upload_id, 0, DATA[:10]).status_code, 204)
+
+    def test_chunk_past_declared_length_is_rejected(self):
+        upload_id = self.create(length=10)
+        self.assertEqual(self.patch(upload_id, 0, DATA[:20]).status_code, 413)
+        self.assertEqual(self.client.head(f'/api/uploads/{upload_id}').headers['Upload-Offset'], '0')
+
+    def test_checksum_mismatch_is_rejected(self):
+        upload_id = self.create(length=10)
+        self.patch(upload_id, 0, DATA[:10])
+        response = self.client.post(f'/api/uploads/{upload_id}/finalize', json={'sha256': '0' * 64})
+        self.assertEqual(response.status_code, 422)
+
+    def test_finished_upload_attaches_to_job_without_copy(self):
+        upload_id = self.create(length=10)
+        self.patch(upload_id, 0, DATA[:10])
+        self.client.post(f'/api/uploads/{upload_id}/finalize')
+
+        with self.app.app_context():
+            user = User.query.filter_by(username='testuser').first()
+            project = Project(id='P1', project_name='P1', project_lead='Lead',
+                              start_date=date(2024, 1, 1), status='Active')
+            db.session.add(project)
+            db.session.add(DataSubmission(id=1, name='S1', project_id='P1', sample_ids='s1',
+                                          extraction_date=project.start_date, extracted_by='me',
+                                          extraction_method='kit', sequencing_method='WGS',
+                                          submitted_to='facility', submission_date=project.start_date,
+                                          user_id=user.id, uploaded_files='[]'))
+            db.session.commit()
+            filepath = db.session.get(Upload, upload_id).filepath
+
+        response = self.client.post('/api/submissions/1/create-job', data={'upload_ids': [upload_id]})
+        self.assertEqual(response.status_code, 200)
+        with self.app.app_context():
+            job = db.session.get(Job, response.json['jobId'])
+            self.assertEqual(job.files[0]['filepath'], filepath)
+
+
+if __name__ == '__main__':
+    unittest.main()
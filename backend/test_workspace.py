@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import unittest
+from backend.app import create_app
+from backend.database import TEST_DATABASE_URL
+from backend.models import db, Artifact, Job, User
+from backend.extensions import artifacts, docker_manager, job_tracker, pipeline_registry
+from backend.fake_docker import FakeDockerClient
+from backend.pipeline_manager import run_pipeline
+from backend.config import BASE_DIR
+
+
+class TestJobWorkspace(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': TEST_DATABASE_URL,
+            'SCHEDULER_AUTOSTART': False,
+            'JOB_TRACKER_AUTOSTART': False,
+            'UPLOADS_DIR': os.path.join(self.tmp_dir, 'uploads'),
+            'WORKSPACES_DIR': os.path.join(self.tmp_dir, 'workspaces')
+        })
+        pipeline_registry.replace([{
+            'id': 'video-converter',
+            'name': 'Video Converter',
+            'image_name': 'video-converter-image',
+            'outputs': [{'name': 'converted_video', 'type': 'file'}]
+        }])
+        self.fake = FakeDockerClient(images=['video-converter-image'])
+        docker_manager.set_client(self.fake)
+        for name in ['mine.mp4', 'someone-elses.mp4']:
+            with open(os.path.join(self.tmp_dir, 'uploads', name), 'w') as f:
+                f.write(name)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.session.add(User(id=1, username='alice', email='alice@test.com', password_hash='x'))
+        db.session.add(Job(id='job-1', files=[{'filepath': os.path.join(self.tmp_dir, 'uploads', 'mine.mp4')}], user_id=1,
+                           status='running', pipeline='video-converter'))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_container_only_sees_its_own_inputs(self):
+        container = run_pipeline(pipeline_registry.get('video-converter'), 'job-1', [os.path.join(self.tmp_dir, 'uploads', 'mine.mp4')])
+
+        inputs_dir = os.path.join(self.tmp_dir, 'workspaces', 'job-1', 'inputs')
+        self.assertEqual(container.command, ['/uploads/mine.mp4'])
+        self.assertEqual(container.kwargs['volumes'][inputs_dir], {'bind': '/uploads', 'mode': 'ro'})
+        self.assertNotIn(os.path.join(self.tmp_dir, 'uploads'), container.kwargs['volumes'])
+        self.assertEqual(os.listdir(inputs_dir), ['mine.mp4'])
+        self.assertTrue(os.path.samefile(os.path.join(inputs_dir, 'mine.mp4'),
+                                         os.path.join(self.tmp_dir, 'uploads', 'mine.mp4')))
+
+    def finish_with_outputs(self, outputs):
+        run_pipeline(pipeline_registry.get('video-converter'), 'job-1', [os.path.join(self.tmp_dir, 'uploads', 'mine.mp4')])
+        outputs_dir = os.path.join(self.tmp_dir, 'workspaces', 'job-1', 'outputs')
+        for name, content in outputs.items():
+            with open(os.path.join(outputs_dir, name), 'wb') as f:
+                f.write(content)
+        job_tracker.apply_transitions([{'job_id': 'job-1', 'status': 'succeeded', 'exit_code': 0}])
+        artifacts.wait()
+
+    def test_declared_outputs_are_harvested_when_the_job_finishes(self):
+        self.finish_with_outputs({'converted_video.mkv': b'video', 'scratch.tmp': b''})
+
+        [artifact] = Artifact.query.filter_by(job_id='job-1').all()
+        self.assertEqual(artifact.name, 'converted_video')
+        self.assertEqual(artifact.filename, 'converted_video.mkv')
+        self.assertEqual(artifact.size, 5)
+        self.assertEqual(artifact.mime_type, 'video/x-matroska')
+        self.assertTrue(os.path.exists(os.path.join(BASE_DIR, artifact.filepath)))
+        # The artifact is kept with the uploads, and the workspace goes.
+        self.assertTrue(os.path.samefile(os.path.join(BASE_DIR, artifact.filepath),
+                                         self.app.extensions['blobs'].blob_path(artifact.sha256)))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, 'workspaces', 'job-1')))
+
+    def test_artifact_download_supports_ranges_and_etags(self):
+        self.finish_with_outputs({'converted_video.mkv': b'0123456789'})
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = '1'
+
+        response = client.get('/api/jobs/job-1/artifacts/converted_video')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b'0123456789')
+        etag = response.headers['ETag']
+
+        response = client.get('/api/jobs/job-1/artifacts/converted_video', headers={'Range': 'bytes=2-5'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, b'2345')
+
+        response = client.get('/api/jobs/job-1/artifacts/converted_video', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        response.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+"""
+Chunked, resumable uploads.
+
+The protocol follows tus loosely:
+
+1. `create_upload` reserves an id and an empty file under UPLOADS_DIR.
+2. The client sends the bytes in any number of chunks, each at the offset
+   the server reports; `write_chunk` appends them straight to the final
+   file and feeds them to a running SHA-256.
+3. After a dropped connection, the client asks for the current offset and
+   carries on from there.
+
+Only one request writes to an upload at a time, in any process of the
+server: the file is locked while a chunk is written, and the offset only
+moves forward if the database still has the one the chunk started from.
+4. `finalize_upload` checks the length and checksum; the finished upload
+   can then be attached to a submission or job by reference, without
+   copying the file.
+"""
+import fcntl
+import hashlib
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from flask import current_app
+from werkzeug.exceptions import ClientDisconnected
+from werkzeug.utils import secure_filename
+from . import db
+from .config import BASE_DIR
+from .models import Upload
+
+# Size of the reads from the request stream and from partial files.
+CHUNK_SIZE = 1024 * 1024
+
+# Running checksums of in-progress uploads, keyed by upload id, as
+# (offset, hasher) pairs. If a process does not have one (e.g. after a
+# restart), it is rebuilt from the bytes already on disk.
+_hashers = {}
+_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """An upload request that cannot be applied. `status` is the HTTP status to report."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _host_path(upload):
+    return os.path.join(BASE_DIR, upload.filepath)
+
+
+def create_upload(user_id, filename, length=None):
+    """Creates an upload and its empty destination file. The caller commits."""
+    if not filename:
+        raise UploadError('Missing filename')
+    if length is not None and length < 0:
+        raise UploadError('Invalid upload length')
+
+    upload_id = str(uuid.uuid4())
+    upload = Upload(
+        id=upload_id,
+        user_id=user_id,
+        original_filename=filename,
+        filepath=os.path.join(current_app.config['UPLOADS_DIR'], f"{upload_id}_{secure_filename(filename)}"),
+        length=length,
+        offset=0
+    )
+    open(_host_path(upload), 'wb').close()
+    db.session.add(upload)
+    with _lock:
+        _hashers[upload_id] = (0, hashlib.sha256())
+    return upload
+
+
+def _hasher_for(upload):
+    """Returns the running checksum for an upload, rebuilding it if needed."""
+    offset, hasher = _hashers.get(upload.id, (None, None))
+    if offset == upload.offset:
+        return hasher
+
+    hasher = hashlib.sha256()
+    remaining = upload.offset
+    with open(_host_path(upload), 'rb') as f:
+        while remaining > 0:
+            data = f.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                break
+            hasher.update(data)
+            remaining -= len(data)
+    return hasher
+
+
+def _read(stream):
+    # A client that drops mid-chunk keeps what it sent; it resumes from
+    # the offset we record.
+    try:
+        return stream.read(CHUNK_SIZE)
+    except (OSError, ClientDisconnected):
+        return b''
+
+
+@contextmanager
+def _claimed(upload, busy_message):
+    """
+    Opens an upload's file, locked against every other request of any
+    process. Raises UploadError if another request holds it.
+    """
+    with open(_host_path(upload), 'r+b') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            raise UploadError(busy_message, 409)
+        yield f
+
+
+def write_chunk(upload, offset, stream):
+    """
+    Appends the bytes of `stream` to an upload, which must currently be at
+    `offset`. Returns the new offset. Commits the session.
+    """
+    if upload.status != 'uploading':
+        raise UploadError('Upload is already finalized', 409)
+
+    with _claimed(upload, 'Upload is already receiving a chunk') as f:
+        # Another process may have written a chunk since the upload was loaded.
+        db.session.refresh(upload)
+        if upload.status != 'uploading':
+            raise UploadError('Upload is already finalized', 409)
+        if offset != upload.offset:
+            raise UploadError(f"Upload is at offset {upload.offset}, not {offset}", 409)
+        with _lock:
+            # A copy, so a failed chunk leaves the cached checksum untouched.
+            hasher = _hasher_for(upload).copy()
+
+        received = 0
+        f.seek(offset)
+        while True:
+            data = _read(stream)
+            if not data:
+                break
+            if upload.length is not None and offset + received + len(data) > upload.length:
+                f.truncate(offset)
+                raise UploadError('Chunk extends past the declared upload length', 413)
+            f.write(data)
+            hasher.update(data)
+            received += len(data)
+        # Anything past the new offset is left over from an interrupted attempt.
+        f.truncate(offset + received)
+
+        new_offset = offset + received
+        # Only from the offset the chunk was written at, in case a server
+        # without the file lock (e.g. on another host) got there first.
+        updated = Upload.query.filter_by(id=upload.id, offset=offset) \
+            .update({'offset': new_offset}, synchronize_session=False)
+        if updated != 1:
+            db.session.rollback()
+            raise UploadError('Upload was moved on by another request', 409)
+        db.session.commit()
+        db.session.refresh(upload)
+        with _lock:
+            _hashers[upload.id] = (new_offset, hasher)
+        return new_offset
+
+
+def finalize_upload(upload, checksum=None):
+    """
+    Completes an upload. If the client sent a SHA-256 `checksum`, it must
+    match. The caller commits.
+    """
+    if upload.status == 'complete':
+        return upload
+    if upload.length is not None and upload.offset != upload.length:
+        raise UploadError(f"Upload has {upload.offset} of {upload.length} bytes", 409)
+
+    with _claimed(upload, 'Upload is still receiving a chunk'), _lock:
+        hasher = _hasher_for(upload)
+        _hashers.pop(upload.id, None)
+    digest = hasher.hexdigest()
+    if checksum and checksum.lower() != digest:
+        raise UploadError('Checksum mismatch', 422)
+
+    # The checksum is already known, so storing the blob costs no extra read.
+    current_app.extensions['blobs'].ingest(upload.filepath, digest)
+    upload.length = upload.offset
+    upload.checksum = digest
+    upload.status = 'complete'
+    return upload
+
+
+def completed_uploads(user_id, upload_ids):
+    """
+    Looks up finished uploads owned by a user, preserving the order of
+    `upload_ids`. Raises UploadError if any of them is missing or incomplete.
+    """
+    if not upload_ids:
+        return []
+    uploads = {u.id: u for u in Upload.query.filter(Upload.id.in_(upload_ids), Upload.user_id == user_id)}
+    missing = [i for i in upload_ids if i not in uploads or uploads[i].status != 'complete']
+    if missing:
+        raise UploadError(f"Unknown or unfinished uploads: {', '.join(missing)}")
+    return [uploads[i] for i in upload_ids]
@@ -0,0 +1,93 @@
+"""
+Caches the users that Flask-Login loads for each request.
+
+Without it, every authenticated request costs a query for the user. The
+loader keeps a snapshot of each user's profile for up to USER_CACHE_TTL
+seconds, and at most USER_CACHE_MAX_ENTRIES users, dropping the least
+recently used. Views only read the logged-in user, so the snapshot is a
+plain object rather than a database row.
+
+A user is dropped from the cache as soon as a change to their row
+(profile or credentials) or its deletion is committed. That covers this
+process; other processes see the change within the TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+from . import db
+from .models import User
+
+# Where a session keeps the ids of the users it changed until it commits.
+_CHANGED_KEY = 'user_cache.changed'
+
+
+class CachedUser(UserMixin):
+    """What the views see of the logged-in user."""
+
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.full_name = user.full_name
+        self.email = user.email
+        self.phone_number = user.phone_number
+
+
+class UserCache:
+    def __init__(self, app=None):
+        self.app = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['user_cache'] = self
+        if not event.contains(User, 'after_update', _record_change):
+            event.listen(User, 'after_update', _record_change)
+            event.listen(User, 'after_delete', _record_change)
+            event.listen(db.session, 'after_commit', self._on_commit)
+            event.listen(db.session, 'after_soft_rollback', _forget_changes)
+
+    def get(self, user_id, load):
+        """Returns the cached user, or calls `load(user_id)` and caches what it returns."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                return entry[0]
+        user = load(user_id)
+        cached = CachedUser(user) if user is not None else None
+        if cached is not None:
+            with self._lock:
+                self._entries[user_id] = (cached, now + self.app.config['USER_CACHE_TTL'])
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.app.config['USER_CACHE_MAX_ENTRIES']:
+                    self._entries.popitem(last=False)
+        return cached
+
+    def invalidate(self, user_id=None):
+        """Forgets one user, or everyone."""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def _on_commit(self, session):
+        for user_id in session.info.pop(_CHANGED_KEY, ()):
+            self.invalidate(user_id)
+
+
+def _record_change(mapper, connection, user):
+    # Invalidated on commit: dropping the entry now would let another
+    # request cache the old row again before the change is visible.
+    object_session(user).info.setdefault(_CHANGED_KEY, set()).add(user.id)
+
+
+def _forget_changes(session, previous_transaction):
+    session.info.pop(_CHANGED_KEY, None)
@@ -1,13 +1,19 @@
+import base64
+import codecs
+import hashlib
 import os
 import uuid
 import json
-from flask import Blueprint, request, jsonify, current_app
-from .models import Job, User, db, Project, Skill, LabMember, DataSubmission
+from flask import Blueprint, Response, request, jsonify, current_app, send_file, url_for
+from .models import Job, User, db, Project, Skill, LabMember, DataSubmission, Upload, Artifact
 from . import pipeline_manager
-from .config import UPLOADS_DIR
+from . import uploads
 from flask_login import login_user, current_user, logout_user, login_required
 from .forms import RegistrationForm, LoginForm
-from .extensions import bcrypt
+from .extensions import blobs, scheduler, job_logs, artifacts, job_events, passwords
+from .passwords import PasswordHasherBusy
+from .job_events import event_id, parse_event_id
+from .serializers import serialize, JOB_LIST, MEMBER_LIST, PROJECT_LIST, SUBMISSION_LIST
 from datetime import datetime
 
 api = Blueprint('api', __name__)
@@ -16,7 +22,10 @@ api = Blueprint('api', __name__)
 def register():
     form = RegistrationForm()
     if form.validate_on_submit():
-        hashed_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
+        try:
+            hashed_password = passwords.hash(form.password.data)
+        except PasswordHasherBusy:
+            return _busy()
         user = User(
             username=form.username.data,
             full_name=form.full_name.data,
@@ -35,13 +44,24 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
-        if user and bcrypt.check_password_hash(user.password_hash, form.password.data):
+        try:
+            valid = user is not None and passwords.check(user.password_hash, form.password.data)
+            if valid and passwords.needs_rehash(user.password_hash):
+                # The cost has changed since this hash was made; this is the only time we have the password.
+                user.password_hash = passwords.hash(form.password.data)
+                db.session.commit()
+        except PasswordHasherBusy:
+            return _busy()
+        if valid:
             login_user(user)
             return jsonify({'message': 'Login successful'})
         else:
             return jsonify({'error': 'Login Unsuccessful. Please check username and password'}), 401
     return jsonify({'errors': form.errors}), 400
 
+def _busy():
+    return jsonify({'error': 'The server is busy, please try again shortly'}), 503, {'Retry-After': '1'}
+
 @api.route('/logout')
 @login_required
 def logout():
@@ -66,32 +86,45 @@ def get_profile():
 @api.route('/pipelines')
 @login_required
 def get_pipelines():
-    return jsonify(current_app.config['AVAILABLE_PIPELINES'])
+    registry = current_app.extensions['pipelines']
+    response = jsonify(registry.list())
+    # The registry's ETag changes whenever a manifest does, so clients can revalidate cheaply.
+    response.set_etag(registry.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 @api.route('/submissions/<int:submission_id>/create-job', methods=['POST'])
 @login_required
 def create_job_in_submission(submission_id):
-    if 'files' not in request.files:
+    files = request.files.getlist('files')
+    upload_ids = request.form.getlist('upload_ids')
+    if not upload_ids and 'files' not in request.files:
         return jsonify({'error': 'No files part in the request'}), 400
 
-    files = request.files.getlist('files')
-    if not files or all(f.filename == '' for f in files):
+    if not upload_ids and (not files or all(f.filename == '' for f in files)):
         return jsonify({'error': 'No files selected'}), 400
 
     submission = DataSubmission.query.get(submission_id)
     if not submission:
         return jsonify({'error': 'Submission not found'}), 404
 
+    # Files sent with the resumable upload API are attached by reference.
+    try:
+        finished_uploads = uploads.completed_uploads(current_user.id, upload_ids)
+    except uploads.UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+
     job_id = str(uuid.uuid4())
-    job_files = []
+    job_files = [upload.file_info() for upload in finished_uploads]
     for file in files:
         if file:
             filename = f"{job_id}_{file.filename}"
-            filepath = os.path.join(UPLOADS_DIR, filename)
-            file.save(filepath)
-            job_files.append({'original_filename': file.filename, 'filepath': filepath})
+            filepath = os.path.join(current_app.config['UPLOADS_DIR'], filename)
+            sha256 = blobs.save(file, filepath)
+            job_files.append({'original_filename': file.filename, 'filepath': filepath, 'sha256': sha256})
 
     new_job = Job(id=job_id, files=job_files, user_id=current_user.id, data_submission_id=submission_id)
+    blobs.add_refs(job_files)
     db.session.add(new_job)
     db.session.commit()
 
@@ -118,37 +151,234 @@ def run_job():
 
     job.data_submission_id = submission_id
 
-    available_pipelines = current_app.config['AVAILABLE_PIPELINES']
-    pipeline = next((p for p in available_pipelines if p['id'] == pipeline_id), None)
-    if not pipeline:
+    if not pipeline_manager.get_pipeline(pipeline_id):
         return jsonify({'error': 'Pipeline not found'}), 404
 
-    filenames = [os.path.basename(f['filepath']) for f in job.files]
-    process = pipeline_manager.run_pipeline(pipeline, job.id, filenames)
-
-    if process is None:
-        return jsonify({'error': 'Failed to start pipeline process'}), 500
-
-    job.status = 'running'
-    job.pipeline = pipeline_id
-    job.container_id = process.id
+    job.use_cache = not data.get('bypassCache', False)
+    scheduler.enqueue(job, pipeline_id)
     db.session.commit()
+    scheduler.wake()
 
     return jsonify({
-        'message': f"Job '{job.id}' started with pipeline '{pipeline_id}'.",
-    })
+        'message': f"Job '{job.id}' queued for pipeline '{pipeline_id}'.",
+        'job_id': job.id,
+        'status': job.status
+    }), 202
 
 @api.route('/jobs')
 @login_required
 def get_jobs():
-    jobs = Job.query.filter_by(user_id=current_user.id).all()
-    return jsonify([job.to_dict() for job in jobs])
+    """
+    Returns the user's jobs, newest first, one page at a time. `status`,
+    `pipeline`, `submission` and `file` (the SHA-256 of an input) filter
+    the list and `limit` sets the page
+    size. When there are more jobs, a `Link: rel="next"` header (and
+    `X-Next-Cursor`) gives the `cursor` for the next page. Pages carry an
+    ETag, so an unchanged page costs a 304.
+    """
+    now = datetime.utcnow()
+    # Steps of multi-step jobs are listed under their job.
+    query = Job.query.filter_by(user_id=current_user.id, parent_id=None)
+    if request.args.get('status'):
+        query = query.filter(Job.status.in_(request.args['status'].split(',')))
+    if request.args.get('pipeline'):
+        query = query.filter_by(pipeline=request.args['pipeline'])
+    if request.args.get('submission'):
+        query = query.filter_by(data_submission_id=request.args.get('submission', type=int))
+    if request.args.get('file'):
+        # Jobs that took a file as input, by SHA-256.
+        query = query.filter(Job.inputs.any(sha256=request.args['file']))
+    if request.args.get('cursor'):
+        try:
+            created_at, job_id = _decode_cursor(request.args['cursor'])
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        # Keyset pagination: everything after the last job of the previous page.
+        query = query.filter(db.or_(Job.created_at < created_at,
+                                    db.and_(Job.created_at == created_at, Job.id < job_id)))
+
+    limit = min(max(request.args.get('limit', default=current_app.config['JOBS_PAGE_SIZE'], type=int), 1),
+                current_app.config['JOBS_PAGE_MAX_SIZE'])
+    jobs = query.order_by(Job.created_at.desc(), Job.id.desc()) \
+        .options(*JOB_LIST).limit(limit + 1).all()
+    next_cursor = _encode_cursor(jobs[limit - 1]) if len(jobs) > limit else None
+    jobs = jobs[:limit]
+
+    # Everything a page shows changes along with one of these columns
+    # (outputs appear together with outputs_ready), so the page doesn't
+    # have to be serialized to tell whether the client's copy is current.
+    state = [[job.id, job.status, job.pipeline, job.exit_code, job.cached_from, job.outputs_ready,
+              job.data_submission_id, job.finished_at and job.finished_at.isoformat()] for job in jobs]
+    etag = hashlib.sha256(json.dumps([state, next_cursor]).encode()).hexdigest()[:32]
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify([job.to_dict() for job in jobs])
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    # Where /api/jobs/events should start so that no change after this page is missed.
+    response.headers['X-Events-Since'] = event_id(now)
+    if next_cursor:
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['Link'] = f'<{url_for(".get_jobs", **args)}>; rel="next"'
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+def _encode_cursor(job):
+    return base64.urlsafe_b64encode(f"{job.created_at.isoformat()}|{job.id}".encode()).decode()
+
+def _decode_cursor(cursor):
+    try:
+        created_at, job_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+        return datetime.fromisoformat(created_at), job_id
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"invalid cursor: {e}")
+
+@api.route('/jobs/events')
+@login_required
+def get_job_events():
+    """
+    Streams changes to the user's jobs (steps included) as server-sent
+    `job` events carrying the job's new status. A reconnect with
+    Last-Event-ID, or `since` set to the X-Events-Since header of
+    /api/jobs, first replays what changed in between. A `reset` event means
+    the client fell behind and should reload the list.
+    """
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        since = parse_event_id(since) if since else None
+    except ValueError:
+        return jsonify({'error': 'Invalid event id'}), 400
+
+    # Subscribe first, so nothing changes unseen between the replay and the stream.
+    subscription = job_events.subscribe(current_user.id)
+    replayed = job_events.replay(current_user.id, since) if since else []
+    return Response(job_events.stream(subscription, replayed), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@api.route('/jobs/<job_id>/steps')
+@login_required
+def get_job_steps(job_id):
+    """Returns the runs of the steps of a multi-step job, in the order they were queued."""
+    job = Job.query.filter_by(id=job_id, user_id=current_user.id).first()
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify([child.to_dict() for child in job.children])
+
+@api.route('/jobs/<job_id>/logs')
+@login_required
+def get_job_logs(job_id):
+    """
+    Returns a job's output. `offset` and `limit` (in bytes) select part of
+    it; a negative offset counts from the end once the job has finished.
+    Standard Range headers are honoured for finished jobs. With `follow=1`
+    the response stays open while the job runs. Clients that accept
+    text/event-stream get server-sent events whose ids are byte offsets,
+    so a reconnect with Last-Event-ID resumes where it stopped.
+    """
+    job = Job.query.filter_by(id=job_id, user_id=current_user.id).first()
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+
+    sse = request.accept_mimetypes.best == 'text/event-stream'
+    follow = request.args.get('follow', '').lower() in ('1', 'true')
+    start = request.args.get('offset', default=0, type=int)
+    limit = request.args.get('limit', type=int)
+    if sse and request.headers.get('Last-Event-ID', '').isdigit():
+        start = int(request.headers['Last-Event-ID'])
+
+    # A job completed from the result cache shows the logs of the job it reused.
+    source = db.session.get(Job, job.cached_from) if job.cached_from else job
+    size = job_logs.spooled_size(source.id)
+    status = 200
+    headers = {}
+    if request.range and size is not None:
+        byte_range = request.range.range_for_length(size)
+        if byte_range is None:
+            return jsonify({'error': 'Requested range not satisfiable'}), 416
+        start, end = byte_range
+        status = 206
+        headers['Content-Range'] = f"bytes {start}-{end - 1}/{size}"
+    else:
+        if start < 0:
+            if size is None:
+                return jsonify({'error': 'Offsets from the end are only available once the job has finished'}), 416
+            start = max(0, size + start)
+        end = start + limit if limit is not None else None
+    if size is not None:
+        headers['Accept-Ranges'] = 'bytes'
+
+    chunks = job_logs.read(source.id, source.container_id, start, end, follow=follow and size is None)
+
+    if not sse:
+        return Response(chunks, status=status, mimetype='text/plain', headers=headers)
+
+    def events():
+        # A character can be split across chunks; the decoder keeps its first bytes for the next one.
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        position = start
+        for chunk in chunks:
+            position += len(chunk)
+            text = decoder.decode(chunk)
+            if text:
+                # Resuming from the id must not skip the bytes the decoder still holds.
+                yield event(position - len(decoder.getstate()[0]), text)
+        text = decoder.decode(b'', final=True)
+        if text:
+            yield event(position, text)
+        yield "event: end\ndata: \n\n"
+
+    def event(position, text):
+        return f"id: {position}\n" + ''.join(f"data: {line}\n" for line in text.split('\n')) + "\n"
+
+    headers['Cache-Control'] = 'no-cache'
+    return Response(events(), mimetype='text/event-stream', headers=headers)
+
+@api.route('/jobs/<job_id>/artifacts')
+@login_required
+def get_job_artifacts(job_id):
+    job = Job.query.filter_by(id=job_id, user_id=current_user.id).first()
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify([artifact.to_dict() for artifact in job.artifacts])
+
+@api.route('/jobs/<job_id>/artifacts/<name>')
+@login_required
+def download_job_artifact(job_id, name):
+    """
+    Serves an artifact by output name or filename. Range requests,
+    If-None-Match and If-Range are handled by send_file, with the content
+    hash as a strong ETag. The file is handed to the server as a file
+    wrapper (or X-Sendfile when USE_X_SENDFILE is set), so its bytes don't
+    go through Python.
+    """
+    artifact = (
+        Artifact.query.join(Job)
+        .filter(Job.id == job_id, Job.user_id == current_user.id)
+        .filter(db.or_(Artifact.filename == name, Artifact.name == name))
+        .order_by(Artifact.filename != name, Artifact.id)
+        .first()
+    )
+    if not artifact:
+        return jsonify({'error': 'Artifact not found'}), 404
+
+    response = send_file(
+        artifacts.host_path(artifact),
+        mimetype=artifact.mime_type,
+        as_attachment=True,
+        download_name=artifact.filename,
+        conditional=True,
+        etag=artifact.sha256,
+        max_age=0
+    )
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
 
 
 @api.route('/projects', methods=['GET'])
 def get_projects():
-    projects = Project.query.all()
-    return jsonify([project.to_dict() for project in projects])
+    return jsonify(serialize(Project.query, PROJECT_LIST))
 
 
 @api.route('/submit_project', methods=['POST'])
@@ -225,15 +455,13 @@ def submit_lab_member():
 
 @api.route('/members', methods=['GET'])
 def get_members():
-    members = LabMember.query.all()
-    return jsonify([member.to_dict() for member in members])
+    return jsonify(serialize(LabMember.query, MEMBER_LIST))
 
 
 @api.route('/submissions', methods=['GET'])
 @login_required
 def get_submissions():
-    submissions = DataSubmission.query.filter_by(user_id=current_user.id).all()
-    return jsonify([submission.to_dict() for submission in submissions])
+    return jsonify(serialize(DataSubmission.query.filter_by(user_id=current_user.id), SUBMISSION_LIST))
 
 @api.route('/submissions/<int:submission_id>/run-pipeline', methods=['POST'])
 @login_required
@@ -251,36 +479,90 @@ def run_pipeline_from_submission(submission_id):
     if submission.user_id != current_user.id:
         return jsonify({'error': 'Forbidden'}), 403
 
-    available_pipelines = current_app.config['AVAILABLE_PIPELINES']
-    pipeline = next((p for p in available_pipelines if p['id'] == pipeline_id), None)
-    if not pipeline:
+    if not pipeline_manager.get_pipeline(pipeline_id):
         return jsonify({'error': 'Pipeline not found'}), 404
 
     job_id = str(uuid.uuid4())
     new_job = Job(
         id=job_id,
-        _files=submission.uploaded_files,
+        files=submission.files,
         user_id=current_user.id,
         data_submission_id=submission.id,
-        pipeline=pipeline_id,
-        status='pending'
+        use_cache=not data.get('bypass_cache', False)
     )
+    scheduler.enqueue(new_job, pipeline_id)
+    # The job shares the submission's files; no bytes are copied.
+    blobs.add_refs(new_job.files)
     db.session.add(new_job)
     db.session.commit()
+    scheduler.wake()
 
-    filenames = [os.path.basename(f['filepath']) for f in new_job.files]
-    process = pipeline_manager.run_pipeline(pipeline, new_job.id, filenames)
+    return jsonify({'message': 'Job queued successfully', 'job_id': new_job.id, 'status': new_job.status}), 202
 
-    if process is None:
-        new_job.status = 'failed'
+@api.route('/jobs/batch', methods=['POST'])
+@login_required
+def run_pipelines_batch():
+    """
+    Queues many jobs in one request and one transaction. The body holds
+    either `items`, a list of {submission_id, pipeline_id}, or a `query`
+    selecting the user's submissions (optionally by `project_id`) and a
+    `pipeline_id` to run on each of them. The response has one result per
+    item, in order: the queued job, or an error and its status code.
+    """
+    data = request.get_json(silent=True) or {}
+    if isinstance(data.get('items'), list) and all(isinstance(item, dict) for item in data['items']):
+        pairs = [(item.get('submission_id'), item.get('pipeline_id')) for item in data['items']]
+    elif isinstance(data.get('query'), dict):
+        query = db.session.query(DataSubmission.id).filter_by(user_id=current_user.id)
+        if data['query'].get('project_id'):
+            query = query.filter_by(project_id=data['query']['project_id'])
+        pairs = [(submission_id, data.get('pipeline_id')) for (submission_id,) in query.order_by(DataSubmission.id)]
+    else:
+        return jsonify({'error': 'Provide a list of items or a query'}), 400
+
+    if len(pairs) > current_app.config['JOBS_BATCH_MAX_ITEMS']:
+        return jsonify({'error': f"At most {current_app.config['JOBS_BATCH_MAX_ITEMS']} jobs per batch"}), 400
+
+    # One query for every submission in the batch, loading only what is needed.
+    submission_ids = {submission_id for submission_id, _ in pairs if isinstance(submission_id, int)}
+    submissions = {}
+    if submission_ids:
+        rows = db.session.query(DataSubmission.id, DataSubmission.user_id, DataSubmission.uploaded_files) \
+            .filter(DataSubmission.id.in_(submission_ids))
+        submissions = {row.id: row for row in rows}
+
+    use_cache = not data.get('bypass_cache', False)
+    results = []
+    new_jobs = []
+    for submission_id, pipeline_id in pairs:
+        result = {'submission_id': submission_id, 'pipeline_id': pipeline_id}
+        submission = submissions.get(submission_id)
+        if submission is None:
+            result.update(error='Submission not found', code=404)
+        elif submission.user_id != current_user.id:
+            result.update(error='Forbidden', code=403)
+        elif not pipeline_id or not pipeline_manager.get_pipeline(pipeline_id):
+            result.update(error='Pipeline not found', code=404)
+        else:
+            job = Job(
+                id=str(uuid.uuid4()),
+                files=DataSubmission.parse_files(submission.uploaded_files),
+                user_id=current_user.id,
+                data_submission_id=submission_id,
+                use_cache=use_cache
+            )
+            scheduler.enqueue(job, pipeline_id)
+            new_jobs.append(job)
+            result.update(job_id=job.id, status=job.status)
+        results.append(result)
+
+    if new_jobs:
+        blobs.add_refs([info for job in new_jobs for info in job.files])
+        db.session.add_all(new_jobs)
         db.session.commit()
-        return jsonify({'error': 'Failed to start pipeline process'}), 500
-
-    new_job.status = 'running'
-    new_job.container_id = process.id
-    db.session.commit()
+        scheduler.wake()
 
-    return jsonify({'message': 'Job started successfully', 'job_id': new_job.id})
+    return jsonify({'queued': len(new_jobs), 'results': results}), 202
 
 @api.route('/submit_data', methods=['POST'])
 @login_required
@@ -288,17 +570,23 @@ def submit_data():
     extraction_date = datetime.strptime(request.form['extraction-date'], '%Y-%m-%d').date()
     submission_date = datetime.strptime(request.form['submission-date'], '%Y-%m-%d').date()
 
-    uploaded_files_info = []
+    try:
+        finished_uploads = uploads.completed_uploads(current_user.id, request.form.getlist('upload_ids'))
+    except uploads.UploadError as e:
+        return jsonify({'success': False, 'message': str(e)}), e.status
+
+    uploaded_files_info = [upload.file_info() for upload in finished_uploads]
     if 'uploaded_files' in request.files:
         files = request.files.getlist('uploaded_files')
         for file in files:
             if file:
                 filename = f"{uuid.uuid4()}_{file.filename}"
-                filepath = os.path.join(UPLOADS_DIR, filename)
-                file.save(filepath)
+                filepath = os.path.join(current_app.config['UPLOADS_DIR'], filename)
+                sha256 = blobs.save(file, filepath)
                 uploaded_files_info.append({
                     'original_filename': file.filename,
-                    'filepath': filepath
+                    'filepath': filepath,
+                    'sha256': sha256
                 })
 
     new_submission = DataSubmission(
@@ -317,6 +605,81 @@ def submit_data():
         user_id=current_user.id,
         uploaded_files=json.dumps(uploaded_files_info)
     )
+    blobs.add_refs(uploaded_files_info)
     db.session.add(new_submission)
     db.session.commit()
     return jsonify({'success': True, 'message': 'Data submission successful!'})
+
+
+# --- Resumable uploads ---
+# A client creates an upload, PATCHes its bytes in chunks at the offset
+# the server reports (asking again with HEAD after a dropped connection),
+# finalizes it, and then passes its id as `upload_ids` to submit_data or
+# create-job.
+
+def _get_upload(upload_id):
+    return Upload.query.filter_by(id=upload_id, user_id=current_user.id).first()
+
+def _upload_headers(upload):
+    headers = {'Upload-Offset': str(upload.offset), 'Cache-Control': 'no-store'}
+    if upload.length is not None:
+        headers['Upload-Length'] = str(upload.length)
+    return headers
+
+@api.route('/uploads', methods=['POST'])
+@login_required
+def create_upload():
+    data = request.get_json(silent=True) or {}
+    length = data.get('length', request.headers.get('Upload-Length'))
+    try:
+        upload = uploads.create_upload(
+            current_user.id,
+            data.get('filename'),
+            int(length) if length is not None else None
+        )
+    except (uploads.UploadError, ValueError) as e:
+        return jsonify({'error': str(e)}), getattr(e, 'status', 400)
+    db.session.commit()
+
+    headers = _upload_headers(upload)
+    headers['Location'] = f"{request.path}/{upload.id}"
+    return jsonify(upload.to_dict()), 201, headers
+
+@api.route('/uploads/<upload_id>', methods=['HEAD', 'GET'])
+@login_required
+def get_upload(upload_id):
+    upload = _get_upload(upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify(upload.to_dict()), 200, _upload_headers(upload)
+
+@api.route('/uploads/<upload_id>', methods=['PATCH'])
+@login_required
+def patch_upload(upload_id):
+    upload = _get_upload(upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    offset = request.headers.get('Upload-Offset', type=int)
+    if offset is None:
+        return jsonify({'error': 'Missing Upload-Offset header'}), 400
+
+    try:
+        uploads.write_chunk(upload, offset, request.stream)
+    except uploads.UploadError as e:
+        return jsonify({'error': str(e)}), e.status, _upload_headers(upload)
+    return '', 204, _upload_headers(upload)
+
+@api.route('/uploads/<upload_id>/finalize', methods=['POST'])
+@login_required
+def finalize_upload(upload_id):
+    upload = _get_upload(upload_id)
+    if not upload:
+        return jsonify({'error': 'Upload not found'}), 404
+    data = request.get_json(silent=True) or {}
+
+    try:
+        uploads.finalize_upload(upload, data.get('sha256'))
+    except uploads.UploadError as e:
+        return jsonify({'error': str(e)}), e.status, _upload_headers(upload)
+    db.session.commit()
+    return jsonify(upload.to_dict())
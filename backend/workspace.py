@@ -0,0 +1,101 @@
+"""
+Per-job workspaces.
+
+Each job gets `WORKSPACES_DIR/<job_id>/` with an `inputs` directory holding
+hardlinks to just that job's input files, mounted read-only, and an empty
+`outputs` directory the container can write to. When the job finishes, the
+files matching the `outputs` declared in its pipeline manifest are harvested
+as artifacts (see artifacts.py) and the input links are removed. Once the
+artifacts are stored, the whole workspace is removed.
+"""
+import os
+import shutil
+from flask import current_app
+from .config import BASE_DIR
+
+# Where the workspace directories are mounted inside the container.
+CONTAINER_INPUTS_PATH = '/uploads'
+CONTAINER_OUTPUTS_PATH = '/outputs'
+
+
+def workspace_path(job_id):
+    return os.path.join(BASE_DIR, current_app.config['WORKSPACES_DIR'], job_id)
+
+
+def unique_name(name, taken):
+    """Returns `name`, or `<n>_<name>` if it is already in `taken`, and adds it to `taken`."""
+    candidate, n = name, 1
+    while candidate in taken:
+        candidate = f"{n}_{name}"
+        n += 1
+    taken.add(candidate)
+    return candidate
+
+
+def input_names(filepaths):
+    """Returns the names the input files get inside a container, which are also its arguments."""
+    # Outputs of different jobs may share a name, so names are made unique.
+    taken = set()
+    return [unique_name(os.path.basename(filepath), taken) for filepath in filepaths]
+
+
+def build_workspace(job_id, filepaths):
+    """
+    Creates the workspace for a job whose inputs are `filepaths` (relative
+    to the project root, as in `Job.files`). The inputs may be uploads or
+    the outputs of other jobs. Returns the Docker volume mapping to run it
+    with and the paths of the inputs inside the container.
+    """
+    root = workspace_path(job_id)
+    inputs_path = os.path.join(root, 'inputs')
+    outputs_path = os.path.join(root, 'outputs')
+    os.makedirs(inputs_path, exist_ok=True)
+    os.makedirs(outputs_path, exist_ok=True)
+
+    volumes = {
+        inputs_path: {'bind': CONTAINER_INPUTS_PATH, 'mode': 'ro'},
+        outputs_path: {'bind': CONTAINER_OUTPUTS_PATH, 'mode': 'rw'},
+    }
+    filenames = input_names(filepaths)
+    for filepath, filename in zip(filepaths, filenames):
+        source = os.path.join(BASE_DIR, filepath)
+        target = os.path.join(inputs_path, filename)
+        if os.path.exists(target):
+            continue
+        try:
+            os.link(source, target)
+        except OSError:
+            # Hardlinks can't cross filesystems; bind the file on its own.
+            volumes[source] = {'bind': f"{CONTAINER_INPUTS_PATH}/{filename}", 'mode': 'ro'}
+
+    container_filepaths = [f"{CONTAINER_INPUTS_PATH}/{f}" for f in filenames]
+    return volumes, container_filepaths
+
+
+def collect_outputs(job, pipeline):
+    """
+    Returns the files in a job's outputs directory that match the file
+    outputs declared by its pipeline. An output named `result` matches
+    `result` and `result.<ext>`.
+    """
+    outputs_path = os.path.join(workspace_path(job.id), 'outputs')
+    if not pipeline or not os.path.isdir(outputs_path):
+        return []
+
+    declared = [o['name'] for o in pipeline.get('outputs', []) if o.get('type') == 'file']
+    collected = []
+    for filename in sorted(os.listdir(outputs_path)):
+        for name in declared:
+            if filename == name or filename.startswith(f"{name}."):
+                filepath = os.path.join(current_app.config['WORKSPACES_DIR'], job.id, 'outputs', filename)
+                collected.append({'name': name, 'filename': filename, 'filepath': filepath})
+                break
+    return collected
+
+
+def remove_inputs(job_id):
+    shutil.rmtree(os.path.join(workspace_path(job_id), 'inputs'), ignore_errors=True)
+
+
+def remove_workspace(job_id):
+    shutil.rmtree(workspace_path(job_id), ignore_errors=True)
@@ -1,29 +1,76 @@
-async function fetchJobs() {
+// Fetches one page of jobs, newest first. The server sends the cursor of
+// the next page, if there is one, in the X-Next-Cursor header.
+async function fetchJobs(cursor) {
     try {
-        const response = await fetch('/api/jobs');
+        const url = cursor ? `/api/jobs?cursor=${encodeURIComponent(cursor)}` : '/api/jobs';
+        const response = await fetch(url);
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
         const jobs = await response.json();
-        return jobs;
+        return {
+            jobs,
+            nextCursor: response.headers.get('X-Next-Cursor'),
+            eventsSince: response.headers.get('X-Events-Since')
+        };
     } catch (error) {
         console.error('Failed to fetch jobs:', error);
-        return [];
+        return { jobs: [], nextCursor: null, eventsSince: null };
     }
 }
 
+let jobEvents = null;
+
+// Keeps the listed jobs current with the changes the server pushes, instead
+// of re-fetching the list. The browser reconnects on its own and sends the
+// id of the last event, so changes made while disconnected are replayed.
+function listenForJobChanges(container, since) {
+    if (jobEvents) jobEvents.close();
+    jobEvents = new EventSource(`/api/jobs/events?since=${encodeURIComponent(since)}`);
+    jobEvents.addEventListener('job', (event) => {
+        const job = JSON.parse(event.data);
+        if (job.parent_id) return;
+        const card = container.querySelector(`[data-job-id="${job.id}"]`);
+        if (card) {
+            card.querySelector('.job-status').textContent = job.status;
+        } else if (isNewerThanList(container, job)) {
+            showNewJobs(container);
+        }
+        // Otherwise it is an older job on a page not loaded yet; "Load more" brings it current.
+    });
+    // We fell too far behind to catch up; start over from a fresh list.
+    jobEvents.addEventListener('reset', () => initializeAllJobsPage());
+}
+
+function isNewerThanList(container, job) {
+    const newest = container.querySelector('.job-card');
+    return !newest || Date.parse(job.created_at) > Date.parse(newest.dataset.createdAt);
+}
+
+// Events don't carry a job's files, so new jobs are taken from a fresh first page.
+async function showNewJobs(container) {
+    const { jobs } = await fetchJobs();
+    const newJobs = jobs.filter(job => !container.querySelector(`[data-job-id="${job.id}"]`)
+        && isNewerThanList(container, job));
+    if (newJobs.length === 0) return;
+    container.querySelector('.no-jobs')?.remove();
+    container.prepend(...newJobs.map(createJobCard));
+}
+
 function createJobCard(job) {
     const card = document.createElement('div');
     card.className = 'job-card';
+    card.dataset.jobId = job.id;
+    card.dataset.createdAt = job.created_at;
 
-    const jobId = job.jobId || 'N/A';
+    const jobId = job.id || 'N/A';
     const status = job.status || 'N/A';
     const pipeline = job.pipeline || 'N/A';
     const files = job.files ? job.files.map(f => f.original_filename).join(', ') : 'N/A';
 
     card.innerHTML = `
         <h3>Job ID: ${jobId}</h3>
-        <p><strong>Status:</strong> ${status}</p>
+        <p><strong>Status:</strong> <span class="job-status">${status}</span></p>
         <p><strong>Pipeline:</strong> ${pipeline}</p>
         <p><strong>Files:</strong> ${files}</p>
     `;
@@ -35,16 +82,31 @@ export async function initializeAllJobsPage() {
     if (!jobsListContainer) return;
 
     jobsListContainer.innerHTML = '<p>Loading jobs...</p>';
-    const jobs = await fetchJobs();
+    const { jobs, nextCursor, eventsSince } = await fetchJobs();
 
+    if (eventsSince) listenForJobChanges(jobsListContainer, eventsSince);
     if (jobs.length === 0) {
-        jobsListContainer.innerHTML = '<p>No jobs found.</p>';
+        jobsListContainer.innerHTML = '<p class="no-jobs">No jobs found.</p>';
         return;
     }
 
     jobsListContainer.innerHTML = '';
+    appendJobs(jobsListContainer, jobs, nextCursor);
+}
+
+function appendJobs(container, jobs, nextCursor) {
     jobs.forEach(job => {
         const card = createJobCard(job);
-        jobsListContainer.appendChild(card);
+        container.appendChild(card);
+    });
+    if (!nextCursor) return;
+
+    const loadMore = document.createElement('button');
+    loadMore.textContent = 'Load more';
+    loadMore.addEventListener('click', async () => {
+        loadMore.remove();
+        const page = await fetchJobs(nextCursor);
+        appendJobs(container, page.jobs, page.nextCursor);
     });
+    container.appendChild(loadMore);
 }
@@ -0,0 +1,55 @@
+"""
+Production server settings: `gunicorn -c gunicorn.conf.py`.
+
+A pre-fork server with WEB_CONCURRENCY worker processes of SERVER_THREADS
+threads each. Every open job status stream holds a thread, so leave room
+for them. The workers elect one of themselves to run the scheduler, the
+job tracker and the container pool (see backend/background.py).
+
+On SIGTERM a worker stops claiming jobs and ends its event streams, then
+gets up to GRACEFUL_TIMEOUT seconds to finish requests in progress, such
+as uploads, and job launches before it is killed.
+"""
+import multiprocessing
+import os
+import signal
+
+# Where to listen
+bind = os.environ.get('SERVER_BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+# Worker processes, and request threads in each
+workers = int(os.environ.get('WEB_CONCURRENCY', min(2 * multiprocessing.cpu_count() + 1, 8)))
+threads = int(os.environ.get('SERVER_THREADS', 8))
+worker_class = 'gthread'
+# Seconds a worker may go silent before it is replaced; uploads of large files stream for a while
+timeout = int(os.environ.get('SERVER_TIMEOUT', 120))
+# Seconds a stopping worker gets to finish what it is doing
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT', 60))
+# Seconds to hold an idle keep-alive connection open
+keepalive = int(os.environ.get('SERVER_KEEPALIVE', 5))
+
+wsgi_app = 'wsgi:app'
+# Each worker builds its own app. Loading it in the master would start
+# threads there and fork them into every worker.
+preload_app = False
+
+accesslog = os.environ.get('SERVER_ACCESS_LOG', '-')
+errorlog = '-'
+
+# The file the workers lock to elect who runs the background services; they inherit the environment
+os.environ.setdefault('BACKGROUND_LOCK_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'background.lock'))
+
+
+def post_worker_init(worker):
+    # The worker's own SIGTERM handler only stops it accepting connections.
+    stop_accepting = signal.getsignal(signal.SIGTERM)
+
+    def drain(signum, frame):
+        worker.wsgi.extensions['background'].drain()
+        stop_accepting(signum, frame)
+
+    signal.signal(signal.SIGTERM, drain)
+
+
+def worker_exit(server, worker):
+    # Requests are done by now; wait for the job launches.
+    worker.wsgi.extensions['background'].stop(timeout=server.cfg.graceful_timeout)
@@ -2,19 +2,26 @@ import json
 from datetime import date
 from backend.app import create_app, db
 from backend.models import User, Project, DataSubmission
-from backend.extensions import bcrypt
+from backend.extensions import passwords
+from backend import migrations
 
-app = create_app()
+# A one-off script: migrate below, and skip the warm-up and the background services.
+# It hashes one password, on this thread; a pool would re-run this script in each worker.
+app = create_app({
+    'DB_AUTO_MIGRATE': False,
+    'WARM_START': False,
+    'PASSWORD_HASH_WORKERS': 0
+})
 with app.app_context():
-    # Create all database tables
-    db.create_all()
+    # Create the database tables, or bring them up to date
+    migrations.upgrade()
 
     # Check if the test user already exists
     if not User.query.filter_by(username='testuser').first():
         print("Seeding database with test data...")
 
         # 1. Create a test user
-        hashed_password = bcrypt.generate_password_hash('password').decode('utf-8')
+        hashed_password = passwords.hash('password')
         test_user = User(
             username='testuser',
             full_name='Test User',
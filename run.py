@@ -1,14 +1,23 @@
 import argparse
+import os
 from backend.app import create_app
 
-app = create_app()
-
+# The app is only built when this is run as a script: the password hasher's
+# workers are spawned and import this module again (see passwords.py).
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Run the Flask application.")
     parser.add_argument('-t', '--testing', action='store_true', help='Enable testing mode.')
     args = parser.parse_args()
 
+    config = {}
     if args.testing:
-        app.config['TESTING'] = True
+        # Before the app is built, since testing mode changes what it sets up.
+        config['TESTING'] = True
+    if not os.environ.get('WERKZEUG_RUN_MAIN'):
+        # The reloader runs this script twice: here, where it only watches the files, and
+        # in the child it restarts on changes. Only the child serves and runs the background
+        # services, so they run once.
+        config['WARM_START'] = False
+    app = create_app(config)
 
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -11,4 +11,10 @@ setup(
         'Flask-SQLAlchemy',
         'docker',
     ],
+    extras_require={
+        # For DATABASE_URL=postgresql://...
+        'postgres': ['psycopg2-binary'],
+        # Brotli versions of the frontend's files, next to gzip
+        'brotli': ['brotli'],
+    },
 )
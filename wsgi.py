@@ -0,0 +1,10 @@
+"""
+Entry point for production WSGI servers, e.g.
+
+    gunicorn -c gunicorn.conf.py
+
+Each worker process imports this module and builds its own app.
+"""
+from backend.app import create_app
+
+app = create_app()